@@ -4,14 +4,15 @@ import regym
 
 from regym.environments import Task, EnvType
 from regym.rl_algorithms.agents import Agent
-from regym.util import play_multiple_matches, extract_cumulative_rewards
+from regym.util import play_multiple_matches, match_process_pool
 
 
 def benchmark_agents_on_tasks(tasks: List[Task],
                               agents: List[Agent],
                               num_episodes: int,
                               keep_cumulative_rewards=False,
-                              populate_all_agents=False) -> np.ndarray:
+                              populate_all_agents=False,
+                              num_workers: int = 1) -> np.ndarray:
     '''
     TODO: This function does too much. separate into smaller functions?
     Benchmark :param: agents in :param: tasks for :param: num_episodes.
@@ -38,25 +39,30 @@ def benchmark_agents_on_tasks(tasks: List[Task],
                                 this flag indicates whether that agent's policy
                                 will populate all other agents spots in the environment.
                                 A fresh copy is made for each required agent.
+    :param num_workers: Number of processes across which the episodes of each task are split
     '''
     check_input_validity(tasks, agents, num_episodes, populate_all_agents)
     # TODO: for single agent tasks we can't pass a vector, change naming
     winrates, cumulative_rewards = [], []
-    for t in tasks:
-        agent_vector = agents if not populate_all_agents else [agents[0].clone()
-                                                               for _ in range(t.num_agents)]
-        if keep_cumulative_rewards:
-            player_winrates, trajectories = play_multiple_matches(task=t,
-                                                                  agent_vector=agent_vector,
-                                                                  n_matches=num_episodes,
-                                                                  keep_trajectories=True)
-            avg_cumulative_reward = np.sum(np.array([extract_cumulative_rewards(t)[0] for t in trajectories])) / len(trajectories)
-            cumulative_rewards.append(avg_cumulative_reward)
-        else:
-            player_winrates = play_multiple_matches(task=t,
-                                                    agent_vector=agent_vector,
-                                                    n_matches=num_episodes)
-        winrates.append(player_winrates[0])
+    with match_process_pool(num_workers) as executor:
+        for t in tasks:
+            agent_vector = agents if not populate_all_agents else [agents[0].clone()
+                                                                   for _ in range(t.num_agents)]
+            if keep_cumulative_rewards:
+                player_winrates, avg_cumulative_rewards = play_multiple_matches(task=t,
+                                                                                agent_vector=agent_vector,
+                                                                                n_matches=num_episodes,
+                                                                                keep_cumulative_rewards=True,
+                                                                                num_workers=num_workers,
+                                                                                executor=executor)
+                cumulative_rewards.append(avg_cumulative_rewards[0])
+            else:
+                player_winrates = play_multiple_matches(task=t,
+                                                        agent_vector=agent_vector,
+                                                        n_matches=num_episodes,
+                                                        num_workers=num_workers,
+                                                        executor=executor)
+            winrates.append(player_winrates[0])
     if keep_cumulative_rewards:
         return winrates, cumulative_rewards
     else:
@@ -1,10 +1,6 @@
 import os
-import signal
-
-import time
-import logging
-import logging.handlers
 import random
+import multiprocessing
 import numpy as np
 import torch
 from collections import namedtuple
@@ -13,68 +9,94 @@ from concurrent.futures import as_completed
 from concurrent.futures import ProcessPoolExecutor
 
 from rl_algorithms import AgentHook
+from training_schemes import AgentCache
 from rl_loops.multiagent_loops.simultaneous_action_rl_loop import run_episode
 
 BenchMarkStatistics = namedtuple('BenchMarkStatistics', 'iteration recorded_agent_vector winrates')
 
 
-def benchmark_match_play_process(expected_benchmarking_matches, benchmarking_episodes, createNewEnvironment, benchmark_queue, matrix_queue, seed):
+class BenchmarkWorkerPool():
+
+    def __init__(self, createNewEnvironment, num_workers=None, seed=None, agent_cache_size=32):
+        """
+        Long lived pool of benchmarking worker processes, shared by all BenchmarkingJobs.
+        Each worker creates a single environment, reused for every episode it plays,
+        and keeps the agents it unhooked in an AgentCache indexed by agent id,
+        so that workers are spawned once per experiment and agents
+        are loaded once per worker instead of once per episode.
+
+        :param createNewEnvironment: OpenAI gym environment creation function
+        :param num_workers: Number of worker processes. Defaults to the number of CPUs
+        :param seed: Optional. The i-th worker started seeds its random number generators with seed + i
+        :param agent_cache_size: Maximum number of unhooked agents kept by each worker
+        """
+        self.num_workers = num_workers if num_workers is not None else os.cpu_count()
+        if not self.num_workers > 0:
+            raise ValueError('Parameter \'num_workers\' must be a strictly positive integer')
+        started_workers = multiprocessing.Value('i', 0)
+        self.executor = ProcessPoolExecutor(max_workers=self.num_workers,
+                                            initializer=initialize_benchmark_worker,
+                                            initargs=(createNewEnvironment, seed, started_workers, agent_cache_size))
+
+    def benchmark(self, agent_vector, agent_ids, episodes):
+        """
+        Splits :param: episodes matches between :param: agent_vector across workers
+
+        :param agent_vector: Vector of AgentHooks
+        :param agent_ids: Hashable identifier of each agent in :param: agent_vector,
+                          under which workers cache the unhooked agents
+        :returns: Number of episodes won by each agent
+        """
+        num_tasks = min(self.num_workers, episodes)
+        episodes_per_task = [episodes // num_tasks + int(i < episodes % num_tasks) for i in range(num_tasks)]
+        futures = [self.executor.submit(benchmark_worker_matches, agent_vector, agent_ids, n)
+                   for n in episodes_per_task]
+        return sum(future.result() for future in as_completed(futures))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+worker_environment = None
+worker_agent_cache = None
+
+
+def initialize_benchmark_worker(createNewEnvironment, seed, started_workers, agent_cache_size):
+    with started_workers.get_lock():
+        worker_index = started_workers.value
+        started_workers.value += 1
+    initialize_indexed_benchmark_worker(worker_index, createNewEnvironment, seed, agent_cache_size)
+
+
+def initialize_indexed_benchmark_worker(worker_index, createNewEnvironment, seed, agent_cache_size=32):
     """
-    :param expected_benchmarking_matches: Number of agents that the process will wait for before shuting itself down
-    :param benchmarking_episodes: Number of episodes that each benchmarking process will run for to collect statistics
-    :param createNewEnvironment OpenAI gym environment creation function
-    :param benchmark_queue: Queue from where BenchmarkingJob(s) will be recieved
-    :param matrix_queue: Queue to which submit stats
+    Creates the environment and agent cache used by benchmark_worker_matches
+    in the current process, seeding its random number generators with :param: seed + :param: worker_index
     """
-    logger = logging.getLogger('Benchmarking')
-    logger.setLevel(logging.DEBUG)
-    logger.addHandler(logging.handlers.SocketHandler(host='localhost', port=logging.handlers.DEFAULT_TCP_LOGGING_PORT))
-    logger.info('Started')
-
-    np.random.seed(seed)
-    torch.manual_seed(seed)
-
-    received_agents = 0
-    while True:
-        benchmark_job = benchmark_queue.get()
-        received_agents += 1
-        benchmark_queue.task_done()
-        logger.info('Received {}. {}/{} received. Started for {} episodes'.format(benchmark_job.name, received_agents, expected_benchmarking_matches, benchmarking_episodes))
-
-        agent_vector = [recorded_agent.agent for recorded_agent in benchmark_job.recorded_agent_vector]
-
-        winrates = benchmark_empirical_winrates(benchmarking_episodes, createNewEnvironment, agent_vector, logger)
-
-        matrix_queue.put(BenchMarkStatistics(benchmark_job.iteration,
-                                             benchmark_job.recorded_agent_vector,
-                                             winrates))
-        check_for_termination(received_agents, expected_benchmarking_matches, matrix_queue, logger)
-
+    global worker_environment, worker_agent_cache
+    if seed is not None:
+        random.seed(seed + worker_index)
+        np.random.seed(seed + worker_index)
+        torch.manual_seed(seed + worker_index)
+    worker_environment = createNewEnvironment()
+    worker_agent_cache = AgentCache(max_agents=agent_cache_size)
 
-def benchmark_empirical_winrates(benchmarking_episodes, createNewEnvironment, agent_vector, logger):
-    with ProcessPoolExecutor(max_workers=3) as executor:
-        benchmark_start = time.time()
-        futures = [executor.submit(single_match, *[createNewEnvironment(), agent_vector])
-                   for _ in range(benchmarking_episodes)]
 
-        wins_vector = np.zeros(len(agent_vector))
+def benchmark_worker_matches(agent_vector, agent_ids, episodes):
+    unhooked_agents = [worker_agent_cache.get(agent_id, lambda: AgentHook.unhook(agent_hook, use_cuda=False))
+                       for agent_id, agent_hook in zip(agent_ids, agent_vector)]
+    wins_vector = np.zeros(len(agent_vector))
+    for _ in range(episodes):
+        wins_vector[single_match(worker_environment, unhooked_agents)] += 1
+    return wins_vector
 
-        for future in as_completed(futures):
-            episode_winner = future.result()
-            wins_vector[episode_winner] += 1
-        benchmark_duration = time.time() - benchmark_start
-    logger.info('Benchmarking finished. Duration: {} seconds'.format(benchmark_duration))
-    winrates = wins_vector / benchmarking_episodes
-    return winrates
 
-
-def single_match(env, agent_vector):
+def single_match(env, unhooked_agents):
     # trajectory: [(s,a,r,s')]
-    unhooked_agents = [AgentHook.unhook(agent, use_cuda=False) for agent in agent_vector]
     trajectory = run_episode(env, unhooked_agents, training=False)
     reward_vector = lambda t: t[2]
     individal_agent_trajectory_reward = lambda t, agent_index: sum(map(lambda experience: reward_vector(experience)[agent_index], t))
-    cumulative_reward_vector = [individal_agent_trajectory_reward(trajectory, i) for i in range(len(agent_vector))]
+    cumulative_reward_vector = [individal_agent_trajectory_reward(trajectory, i) for i in range(len(unhooked_agents))]
     episode_winner = choose_winner(cumulative_reward_vector)
     return episode_winner
 
@@ -82,18 +104,3 @@ def single_match(env, agent_vector):
 def choose_winner(cumulative_reward_vector, break_ties=random.choice):
     indexes_max_score = np.argwhere(cumulative_reward_vector == np.amax(cumulative_reward_vector))
     return break_ties(indexes_max_score.flatten().tolist())
-
-
-def check_for_termination(received_agents, expected_number_of_agents, matrix_queue, logger):
-    """
-    Checks if process should be killed because all processing has been submitted.
-    That is, all expected agents have been received and all benchmarking
-    child processes have been created.
-
-    :param received_agents: Number of agents received so far
-    :param expected_number_of_agents: Number of agents that the process will wait for before shuting itself down
-    """
-    if received_agents >= expected_number_of_agents:
-        logger.info('All expected trained agents have been recieved. Shutting down')
-        matrix_queue.join()
-        os.kill(os.getpid(), signal.SIGTERM)
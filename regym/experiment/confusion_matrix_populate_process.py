@@ -1,6 +1,4 @@
 import os
-import logging
-import logging.handlers
 
 import numpy as np
 
@@ -12,39 +10,12 @@ How to read confusion matrix TODO:
 """
 
 
-def confusion_matrix_process(training_jobs, checkpoint_iteration_indices, matrix_queue, results_path):
-    """
-    :param training_jobs: Array of TrainingJob namedtuple used to calculate size of confusion matrices
-    :param checkpoint_iteration_indices: Array of indices used for choosing which matrix to add stats to
-    :param matrix_queue: Queue from which benchmarking stats will be polled
-    """
-    logger = logging.getLogger('ConfusionMatrixPopulate')
-    logger.setLevel(logging.INFO)
-    logger.addHandler(logging.handlers.SocketHandler(host='localhost', port=logging.handlers.DEFAULT_TCP_LOGGING_PORT))
-    logger.info('Started')
-
-    hashing_dictionary, confusion_matrix_dict = create_confusion_matrix_dictionary(training_jobs, checkpoint_iteration_indices)
-    while True:
-        # poll for new
-        benchmark_statistics = matrix_queue.get()
-        matrix_queue.task_done()
-
-        logger.info('Received: it:{} ({},{})-({},{})'.format(benchmark_statistics.iteration,
-                                                             benchmark_statistics.recorded_agent_vector[0].training_scheme.name,
-                                                             benchmark_statistics.recorded_agent_vector[0].agent.name,
-                                                             benchmark_statistics.recorded_agent_vector[1].training_scheme.name,
-                                                             benchmark_statistics.recorded_agent_vector[1].agent.name))
-        populate_new_statistics(benchmark_statistics, confusion_matrix_dict, hashing_dictionary)
-        if check_for_termination(confusion_matrix_dict):
-            logger.info('All confusion matrices completed. Writing to memory')
-
-            filled_matrices = {key: fill_winrate_diagonal(confusion_matrix, value='0.5') for key, confusion_matrix in confusion_matrix_dict.items()}
-            write_matrices(directory='{}/confusion_matrices'.format(results_path), matrix_dict=filled_matrices)
-            write_average_winrates(directory='{}/winrates'.format(results_path), matrix_dict=filled_matrices, hashing_dictionary=hashing_dictionary)
-
-            write_legend_file(hashing_dictionary, path='{}/confusion_matrices/legend.txt'.format(results_path))
-            logger.info('Writing completed')
-            break
+def write_results(confusion_matrix_dict, hashing_dictionary, results_path):
+    filled_matrices = {key: fill_winrate_diagonal(confusion_matrix, value='0.5') for key, confusion_matrix in confusion_matrix_dict.items()}
+    write_matrices(directory='{}/confusion_matrices'.format(results_path), matrix_dict=filled_matrices)
+    write_average_winrates(directory='{}/winrates'.format(results_path), matrix_dict=filled_matrices, hashing_dictionary=hashing_dictionary)
+
+    write_legend_file(hashing_dictionary, path='{}/confusion_matrices/legend.txt'.format(results_path))
 
 
 def fill_winrate_diagonal(matrix, value):
@@ -3,21 +3,23 @@ import sys
 sys.path.append(os.path.abspath('..'))
 
 from math import factorial
+import logging
+import logging.handlers
 import numpy as np
 import torch
-from torch.multiprocessing import Process, JoinableQueue
 import gym
 import gym_rock_paper_scissors
 
 import util
-from training_schemes import EmptySelfPlay, NaiveSelfPlay, HalfHistorySelfPlay, FullHistorySelfPlay, HalfHistoryLimitSelfPlay, HalfHistoryLimitSelfPlay
+from training_schemes import EmptySelfPlay
 
 from rl_algorithms import AgentHook
 
-from training_process import create_training_processes
-from match_making import match_making_process
-from benchmark_match_play import benchmark_match_play_process
-from confusion_matrix_populate_process import confusion_matrix_process
+from scheduler import WorkStealingScheduler
+from training_process import training_segment
+from match_making import RecordedAgent, calculate_new_benchmarking_jobs
+from benchmark_match_play import BenchMarkStatistics, initialize_indexed_benchmark_worker, benchmark_worker_matches
+from confusion_matrix_populate_process import create_confusion_matrix_dictionary, populate_new_statistics, check_for_termination, write_results
 
 from collections import namedtuple
 TrainingJob = namedtuple('TrainingJob', 'training_scheme agent name')
@@ -37,18 +39,79 @@ def preprocess_fixed_agents(existing_fixed_agents, checkpoint_at_iterations):
     return initial_fixed_agents_to_benchmark, fixed_agents_for_confusion
 
 
-def create_all_initial_processes(training_jobs, createNewEnvironment, checkpoint_at_iterations,
-                                 agent_queue, benchmark_queue, matrix_queue, benchmarking_episodes,
-                                 fixed_agents_for_confusion, results_path, seed):
-
-    total_agents = len(training_jobs) + len(fixed_agents_for_confusion)
-    expected_number_of_agents = total_agents * len(checkpoint_at_iterations)
-    expected_benchmarking_matches = (int((total_agents * (total_agents - 1)) / 2) + total_agents) * len(checkpoint_at_iterations)
-    training_processes = create_training_processes(training_jobs, createNewEnvironment, checkpoint_at_iterations=checkpoint_at_iterations, agent_queue=agent_queue, results_path=results_path, seed=seed)
-    mm_process = Process(target=match_making_process, args=(expected_number_of_agents, agent_queue, benchmark_queue))
-    benchmark_process = Process(target=benchmark_match_play_process, args=(expected_benchmarking_matches, benchmarking_episodes, createNewEnvironment, benchmark_queue, matrix_queue, seed))
-    cfm_process = Process(target=confusion_matrix_process, args=(training_jobs + fixed_agents_for_confusion, checkpoint_at_iterations, matrix_queue, results_path))
-    return training_processes, mm_process, benchmark_process, cfm_process
+def schedule_experiment(scheduler, training_jobs, initial_fixed_agents_to_benchmark, fixed_agents_for_confusion,
+                        checkpoint_at_iterations, benchmarking_episodes, createNewEnvironment, results_path, seed):
+    """
+    Runs all training and benchmarking of an experiment as tasks of :param: scheduler:
+        - Each training job is trained in segments, one per checkpoint iteration. A job's next segment
+          is submitted as soon as its previous one completes, continuing from the agent,
+          self play scheme and menagerie it returned.
+        - Each agent checkpointed at an iteration is benchmarked against all agents (including itself)
+          checkpointed at that same iteration so far. The episodes of each matchup are split
+          into one task per worker.
+        - Benchmark results populate the confusion matrices, which are written
+          to :param: results_path once complete.
+
+    :param scheduler: WorkStealingScheduler, whose workers were initialized with initialize_indexed_benchmark_worker
+    """
+    logger = logging.getLogger('Scheduler')
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(logging.handlers.SocketHandler(host='localhost', port=logging.handlers.DEFAULT_TCP_LOGGING_PORT))
+
+    hashing_dictionary, confusion_matrix_dict = create_confusion_matrix_dictionary(training_jobs + fixed_agents_for_confusion,
+                                                                                   checkpoint_at_iterations)
+    checkpoint_at_iterations = sorted(checkpoint_at_iterations)
+    recorded_agents, recorded_benchmarking_jobs = [], []
+    # Task id -> (training job, segment index) / matchup index. Matchup index -> [BenchmarkingJob, wins so far, remaining tasks]
+    training_segments, benchmark_tasks, benchmark_matchups = {}, {}, {}
+
+    def submit_training_segment(job, training_agent, training_scheme, menagerie, segment_index):
+        completed_iterations = checkpoint_at_iterations[segment_index - 1] if segment_index > 0 else 0
+        task_id = scheduler.submit(training_segment, createNewEnvironment, training_agent, training_scheme, menagerie,
+                                   completed_iterations, checkpoint_at_iterations[segment_index], job.name, results_path, seed)
+        training_segments[task_id] = (job, segment_index)
+
+    def record_agent(iteration, training_scheme, agent):
+        recorded_agents.append(RecordedAgent(iteration, training_scheme, agent))
+        for benchmark_job in calculate_new_benchmarking_jobs(recorded_agents, recorded_benchmarking_jobs, iteration):
+            agent_vector = [recorded_agent.agent for recorded_agent in benchmark_job.recorded_agent_vector]
+            # A RecordedAgent is identified by the iteration at which it was recorded, its training scheme and its name
+            agent_ids = [(recorded_agent.iteration, recorded_agent.training_scheme.name, recorded_agent.agent.name)
+                         for recorded_agent in benchmark_job.recorded_agent_vector]
+            num_tasks = min(scheduler.num_workers, benchmarking_episodes)
+            matchup_index = len(recorded_benchmarking_jobs) - 1
+            benchmark_matchups[matchup_index] = [benchmark_job, np.zeros(len(agent_vector)), num_tasks]
+            for i in range(num_tasks):
+                episodes = benchmarking_episodes // num_tasks + int(i < benchmarking_episodes % num_tasks)
+                benchmark_tasks[scheduler.submit(benchmark_worker_matches, agent_vector, agent_ids, episodes)] = matchup_index
+
+    for iteration, training_scheme, agent in initial_fixed_agents_to_benchmark: record_agent(iteration, training_scheme, agent)
+    for job in training_jobs: submit_training_segment(job, job.agent, job.training_scheme, None, segment_index=0)
+
+    while scheduler.pending > 0:
+        task_id, result = scheduler.next_result()
+        if task_id in training_segments:
+            job, segment_index = training_segments.pop(task_id)
+            trained_agent, training_scheme, menagerie, hooked_agent = result
+            logger.info(f'{job.name} reached iteration {checkpoint_at_iterations[segment_index]}')
+            record_agent(checkpoint_at_iterations[segment_index], job.training_scheme, hooked_agent)
+            if segment_index + 1 < len(checkpoint_at_iterations):
+                submit_training_segment(job, trained_agent, training_scheme, menagerie, segment_index + 1)
+        else:
+            matchup = benchmark_matchups[benchmark_tasks.pop(task_id)]
+            matchup[1] += result
+            matchup[2] -= 1
+            if matchup[2] == 0:
+                benchmark_job, wins_vector, _ = matchup
+                logger.info(f'{benchmark_job.name} finished')
+                populate_new_statistics(BenchMarkStatistics(benchmark_job.iteration, benchmark_job.recorded_agent_vector,
+                                                            wins_vector / benchmarking_episodes),
+                                        confusion_matrix_dict, hashing_dictionary)
+
+    if not check_for_termination(confusion_matrix_dict):
+        raise RuntimeError('All tasks completed, but some confusion matrix entries were not benchmarked')
+    write_results(confusion_matrix_dict, hashing_dictionary, results_path)
+    logger.info('All confusion matrices completed and written')
 
 
 class EnvironmentCreationFunction():
@@ -63,18 +126,6 @@ class EnvironmentCreationFunction():
         return gym.make(self.environment_name)
 
 
-def run_processes(training_processes, mm_process, benchmark_process, cfm_process):
-    [p.start() for p in training_processes]
-    mm_process.start()
-    benchmark_process.start()
-    cfm_process.start()
-
-    [p.join() for p in training_processes]
-    mm_process.join()
-    benchmark_process.join()
-    cfm_process.join()
-
-
 def run_experiment(experiment_id, experiment_directory, run_id, experiment_config, agents_config, seed):
     np.random.seed(seed)
     torch.manual_seed(seed)
@@ -96,14 +147,14 @@ def run_experiment(experiment_id, experiment_directory, run_id, experiment_confi
     training_jobs = enumerate_training_jobs(training_schemes, algorithms)
 
     (initial_fixed_agents_to_benchmark, fixed_agents_for_confusion) = preprocess_fixed_agents(fixed_agents, checkpoint_at_iterations)
-    agent_queue, benchmark_queue, matrix_queue = JoinableQueue(), JoinableQueue(), JoinableQueue()
-
-    for fixed_agent in initial_fixed_agents_to_benchmark: agent_queue.put(fixed_agent)
 
-    (training_processes,
-     mm_process, benchmark_process,
-     cfm_process) = create_all_initial_processes(training_jobs, createNewEnvironment, checkpoint_at_iterations,
-                                                 agent_queue, benchmark_queue, matrix_queue, benchmarking_episodes,
-                                                 fixed_agents_for_confusion, results_path, seed)
+    for directory in [f'{results_path}/episodic_rewards', f'{results_path}/menageries']:
+        if not os.path.exists(directory): os.mkdir(directory)
 
-    run_processes(training_processes, mm_process, benchmark_process, cfm_process)
+    # Training segments and benchmarking matchups are balanced across a single pool of workers
+    num_workers = experiment_config.get('num_workers', None)
+    with WorkStealingScheduler(num_workers=int(num_workers) if num_workers is not None else None,
+                               initializer=initialize_indexed_benchmark_worker,
+                               initargs=(createNewEnvironment, seed)) as scheduler:
+        schedule_experiment(scheduler, training_jobs, initial_fixed_agents_to_benchmark, fixed_agents_for_confusion,
+                            checkpoint_at_iterations, benchmarking_episodes, createNewEnvironment, results_path, seed)
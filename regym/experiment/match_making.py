@@ -1,8 +1,3 @@
-import os
-import signal
-import logging
-import logging.handlers
-
 from collections import namedtuple
 from collections import Counter
 
@@ -10,59 +5,6 @@ RecordedAgent = namedtuple('RecordedAgent', 'iteration training_scheme agent')
 BenchmarkingJob = namedtuple('BenchmarkingJob', 'iteration recorded_agent_vector name')
 
 
-def match_making_process(expected_number_of_agents, agent_queue, benchmark_queue):
-    """
-    Process in charge of keeping a record of the trained agents
-    received from the training processes through the agent queue.
-    This process creates a benchmarking processes for each combination
-    of RecordedAgents (iteration, training scheme, agent)
-    It shuts itself down once it doesn't expect any new recorded agents.
-
-    :param expected_number_of_agents: Number of agents that the process will wait for before shuting itself down
-    :param createNewEnvironment: OpenAI gym environment creation function
-    :param agent_queue: Queue reference shared among processes to submit agents that will be benchmarked
-    :param matrix_queue: Queue reference sent to benchmarking process, where it will put the bencharmking result
-    :param pool: ProcessPoolExecutor shared between benchmarking_jobs to carry out benchmarking matches
-    """
-    logger = logging.getLogger('MatchMaking')
-    logger.setLevel(logging.DEBUG)
-    logger.addHandler(logging.handlers.SocketHandler(host='localhost', port=logging.handlers.DEFAULT_TCP_LOGGING_PORT))
-    logger.info('Started')
-
-    received_agents = 0
-    recorded_agents = []
-    recorded_benchmarking_jobs = []
-
-    while True:
-        iteration, training_scheme, agent = agent_queue.get()
-        agent_queue.task_done()
-
-        received_agents += 1
-        logger.info('Received ({},{},{}). {}/{} received'.format(iteration, training_scheme.name, agent.name, received_agents, expected_number_of_agents))
-
-        recorded_agents.append(RecordedAgent(iteration, training_scheme, agent))
-
-        for benchmark_job in calculate_new_benchmarking_jobs(recorded_agents, recorded_benchmarking_jobs, iteration):
-            benchmark_queue.put(benchmark_job)
-
-        check_for_termination(received_agents, expected_number_of_agents, benchmark_queue, recorded_benchmarking_jobs, logger)
-
-
-def check_for_termination(received_agents, expected_number_of_agents, benchmark_queue, recorded_benchmarking_jobs, logger):
-    """
-    Checks if process should be killed because all processing has been submitted.
-    That is, all expected agents have been received and all benchmarking
-    child processes have been created.
-
-    :param received_agents: Number of agents received so far
-    :param expected_number_of_agents: Number of agents that the process will wait for before shuting itself down
-    """
-    if received_agents >= expected_number_of_agents:
-        logger.info('All expected trained agents have been recieved. Shutting down')
-        benchmark_queue.join()
-        os.kill(os.getpid(), signal.SIGTERM)
-
-
 def calculate_new_benchmarking_jobs(recorded_agents, recorded_benchmarking_jobs, iteration_filter):
     """
     Given the current set of recorded agents,
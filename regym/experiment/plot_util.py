@@ -1,4 +1,5 @@
 import os
+import json
 from os import listdir
 from os.path import isfile, join
 import shutil
@@ -299,9 +300,11 @@ def create_individual_episodic_reward_graph(source_dir, target_dir):
         file_name = get_file_name_from_full_path(f)
         training_scheme, algorithm = file_name.split('-')
 
-        file_content = np.loadtxt(open(f, 'rb'), delimiter=', ')
-        iterations   = file_content[:, 0]
-        avg_reward   = file_content[:, 1]
+        # Episode summaries written by regym.util.CSVEpisodeSummarySink
+        file_content = pd.read_csv(f)
+        iterations   = file_content['episode'].values
+        avg_reward   = np.array([json.loads(returns)[0] for returns in file_content['returns']]) \
+                       / file_content['length'].values # TODO find a way of not hardcoding indexes
 
         episodic_reward_dict[file_name] = avg_reward
 
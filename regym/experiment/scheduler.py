@@ -0,0 +1,135 @@
+import os
+import queue
+import traceback
+
+from torch.multiprocessing import Process, Queue, Event
+
+
+class WorkStealingScheduler():
+
+    def __init__(self, num_workers=None, initializer=None, initargs=(), poll_interval=1.0):
+        """
+        Pool of general purpose worker processes executing tasks (picklable
+        functions and their arguments) as they are submitted. Each worker has its
+        own task queue. Tasks are submitted to the queue of the worker with the fewest
+        outstanding tasks, and workers whose queue is empty steal tasks queued for
+        other workers, so that no worker idles while tasks are waiting.
+
+        :param num_workers: Number of worker processes. Defaults to the number of CPUs
+        :param initializer: Optional. Function called as initializer(worker_index, *initargs)
+                            when each worker starts (i.e to create per-worker environments)
+        :param initargs: Arguments passed to :param: initializer
+        :param poll_interval: Seconds between checks, while waiting for results,
+                              that no worker died without reporting (i.e killed by the OS)
+        """
+        self.num_workers = num_workers if num_workers is not None else os.cpu_count()
+        if not self.num_workers > 0:
+            raise ValueError('Parameter \'num_workers\' must be a strictly positive integer')
+        self.task_queues = [Queue() for _ in range(self.num_workers)]
+        self.result_queue = Queue()
+        self.stop_event = Event()
+        self.poll_interval = poll_interval
+        self.outstanding_tasks = [0] * self.num_workers  # Per task queue
+        self.next_task_id = 0
+        self.pending_task_ids = set()
+        self.workers = [Process(target=scheduler_worker,
+                                args=(i, self.task_queues, self.result_queue, self.stop_event, initializer, initargs))
+                        for i in range(self.num_workers)]
+        for worker in self.workers: worker.start()
+
+    def submit(self, function, *args) -> int:
+        """
+        Schedules function(*args) for execution on a worker
+
+        :returns: Task id, identifying the task's result in next_result
+        """
+        task_id = self.next_task_id
+        self.next_task_id += 1
+        owner = min(range(self.num_workers), key=lambda i: self.outstanding_tasks[i])
+        self.outstanding_tasks[owner] += 1
+        self.pending_task_ids.add(task_id)
+        self.task_queues[owner].put((task_id, owner, function, args))
+        return task_id
+
+    def next_result(self):
+        """
+        Blocks until any pending task completes
+
+        :returns: (task id, value returned by the task), in order of completion
+        :raises RuntimeError: If the task failed, or a worker failed to start or died
+        """
+        if self.pending == 0: raise ValueError('No tasks are pending')
+        message = self.wait_for_message()
+        if message[0] == 'worker_error':
+            raise RuntimeError(f'Worker {message[1]} failed to start:\n{message[2]}')
+        status, task_id, owner, worker_index, value = message
+        self.outstanding_tasks[owner] -= 1
+        self.pending_task_ids.remove(task_id)
+        if status == 'error': raise RuntimeError(f'Task {task_id} failed on worker {worker_index}:\n{value}')
+        return task_id, value
+
+    def wait_for_message(self):
+        while True:
+            try: return self.result_queue.get(timeout=self.poll_interval)
+            except queue.Empty: pass
+            # Workers only stop on shutdown, or after reporting that they failed to start
+            dead_workers = [(i, worker.exitcode) for i, worker in enumerate(self.workers) if not worker.is_alive()]
+            if len(dead_workers) > 0:
+                raise RuntimeError('Workers (index, exit code) {} died with {} tasks pending'.format(dead_workers, self.pending))
+
+    @property
+    def pending(self) -> int:
+        return len(self.pending_task_ids)
+
+    def shutdown(self):
+        """
+        Stops all workers once they finish the task they are running.
+        Tasks still queued are discarded.
+        """
+        self.stop_event.set()
+        while any(worker.is_alive() for worker in self.workers):
+            try: self.result_queue.get(timeout=0.1)  # Unblocks workers flushing results
+            except queue.Empty: pass
+        for worker in self.workers: worker.join()
+        # Discarded tasks must not block this process' exit
+        for task_queue in self.task_queues: task_queue.cancel_join_thread()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.shutdown()
+
+    def __repr__(self):
+        return f'WorkStealingScheduler: {self.num_workers} workers. {self.pending} pending tasks'
+
+
+def scheduler_worker(worker_index, task_queues, result_queue, stop_event, initializer, initargs):
+    try:
+        if initializer is not None: initializer(worker_index, *initargs)
+    except Exception:
+        result_queue.put(('worker_error', worker_index, traceback.format_exc()))
+        return
+    while not stop_event.is_set():
+        task = take_task(worker_index, task_queues)
+        if task is None: continue
+        task_id, owner, function, args = task
+        try:
+            result = ('result', task_id, owner, worker_index, function(*args))
+        except Exception:
+            result = ('error', task_id, owner, worker_index, traceback.format_exc())
+        result_queue.put(result)
+
+
+def take_task(worker_index, task_queues, timeout=0.05):
+    """
+    :returns: Next task from the queue of worker :param: worker_index or, if it stays
+              empty for :param: timeout seconds, a task stolen from another worker's queue.
+              None if all queues are empty.
+    """
+    try: return task_queues[worker_index].get(timeout=timeout)
+    except queue.Empty: pass
+    for offset in range(1, len(task_queues)):
+        try: return task_queues[(worker_index + offset) % len(task_queues)].get_nowait()
+        except queue.Empty: continue
+    return None
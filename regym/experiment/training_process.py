@@ -8,105 +8,70 @@ import logging
 import logging.handlers
 import numpy as np
 import torch
-from torch.multiprocessing import Process
 
 from rl_algorithms import AgentHook
+from rl_algorithms import AsyncCheckpointWriter
+from util import CSVEpisodeSummarySink
 
-from rl_loops.multiagent_loops.simultaneous_action_rl_loop import self_play_training
+# Same Menagerie class as the self-play loop, which would otherwise wrap menageries in a new one
+from regym.training_schemes import Menagerie
+from regym.environments import EnvType
+from regym.environments.gym_parser import parse_gym_environment
+from rl_loops.multiagent_loops.self_play_loop import self_play_training
 
 
-def training_process(env, training_agent, self_play_scheme, checkpoint_at_iterations, agent_queue, process_name, base_path, seed):
+def training_segment(createNewEnvironment, training_agent, self_play_scheme, menagerie,
+                     completed_iterations, target_iteration, process_name, base_path, seed):
     """
-    :param env: Environment where agents will be trained on
-    :param training_agent: agent representation + training algorithm which will be trained in this process
-    :param self_play_scheme: self play scheme used to meta train the param training_agent.
-    :param checkpoint_at_iterations: array containing the episodes at which the agents will be cloned for benchmarking against one another
-    :param agent_queue: queue shared among processes to submit agents that will be benchmarked
-    :param process_name: String name identifier
+    Trains :param: training_agent from :param: completed_iterations until :param: target_iteration,
+    run as a task by a WorkStealingScheduler. Training state is carried over between segments
+    by the returned agent, self play scheme and menagerie.
+
+    :param createNewEnvironment: OpenAI gym environment creation function
+    :param training_agent: AgentHook of the agent being trained
+    :param self_play_scheme: self play scheme used to meta train the param training_agent,
+                             as returned by the previous segment (stateful schemes keep their state)
+    :param menagerie: Menagerie returned by the previous segment, None for the first segment
+    :param process_name: String name identifier of the training job
     :param base_path: Base directory from where subdirectories will be accessed to reach menageries, save episodic rewards and save checkpoints of agents.
+    :param seed: Random number generators are seeded with seed + completed_iterations
+    :returns: AgentHook of the trained agent, to be passed to the next segment
+    :returns: Self play scheme, to be passed to the next segment
+    :returns: Menagerie, to be passed to the next segment
+    :returns: AgentHook of a copy of the trained agent, saved on disk, to be benchmarked
     """
     logger = logging.getLogger(process_name)
     logger.setLevel(logging.DEBUG)
-    logger.info('Started')
     logger.addHandler(logging.handlers.SocketHandler(host='localhost', port=logging.handlers.DEFAULT_TCP_LOGGING_PORT))
 
-    np.random.seed(seed)
-    torch.manual_seed(seed)
+    np.random.seed(seed + completed_iterations)
+    torch.manual_seed(seed + completed_iterations)
 
     trained_policy_save_directory = f'{base_path}/{process_name}'
     if not os.path.exists(trained_policy_save_directory):
-        os.mkdir(trained_policy_save_directory)
-
-    process_start_time = time.time()
+        os.makedirs(trained_policy_save_directory, exist_ok=True)
 
-    completed_iterations = 0
-    menagerie = []
+    checkpoint_writer = AsyncCheckpointWriter()
+    if menagerie is None: menagerie = Menagerie()
+    menagerie.checkpoint_writer = checkpoint_writer
     menagerie_path = f'{base_path}/menageries'
 
-    training_agent = AgentHook.unhook(training_agent)
-    for target_iteration in sorted(checkpoint_at_iterations):
-        next_training_iterations = target_iteration - completed_iterations
-
-        training_start = time.time()
-        (menagerie, trained_agent,
-         trajectories) = self_play_training(env=env, training_agent=training_agent, self_play_scheme=self_play_scheme,
-                                            target_episodes=next_training_iterations, iteration=completed_iterations,
-                                            menagerie=menagerie, menagerie_path=menagerie_path)
-
-        training_duration = time.time() - training_start
-
-        completed_iterations += next_training_iterations
-
-        save_path = f'{trained_policy_save_directory}/{target_iteration}_iterations.pt'
-        logger.info(f'Submitted agent at iteration {target_iteration} :: saving at {save_path}')
-        hooked_agent = AgentHook(trained_agent.clone(training=False), save_path=save_path)
-        agent_queue.put([target_iteration, self_play_scheme, hooked_agent])
-
-        logger.info('Training duration between iterations [{},{}]: {} (seconds)'.format(target_iteration - next_training_iterations, target_iteration, training_duration))
-
-        file_name = '{}-{}.txt'.format(self_play_scheme.name, training_agent.name)
-        enumerated_trajectories = zip(range(target_iteration - next_training_iterations, target_iteration), trajectories)
-        write_episodic_reward(enumerated_trajectories, target_file_path='{}/episodic_rewards/{}'.format(base_path, file_name))
-
-        # Updating:
-        training_agent = trained_agent
-    logger.info('All training completed. Total duration: {} seconds'.format(time.time() - process_start_time))
-    agent_queue.join()
-
-
-def write_episodic_reward(enumerated_trajectories, target_file_path):
-    with open(target_file_path, 'a') as f:
-        for iteration, trajectory in enumerated_trajectories:
-            player_1_average_reward = sum(map(lambda t: t[2][0], trajectory)) / len(trajectory) # TODO find a way of not hardcoding indexes
-            f.write('{}, {}\n'.format(iteration, player_1_average_reward))
-
-
-def create_training_processes(training_jobs, createNewEnvironment, checkpoint_at_iterations, agent_queue, results_path, seed):
-    """
-    :param training_jobs: Array of TrainingJob namedtuples containing a training-scheme, algorithm and name
-    :param createNewEnvironment: OpenAI gym environment creation function
-    :param checkpoint_at_iterations: array containing the episodes at which the agents will be cloned for benchmarking against one another
-    :param agent_queue: queue shared among processes to submit agents that will be benchmarked
-    :returns: array of process handlers, needed to join processes at the end of experiment computation
-    """
-    episodic_reward_directory = f'{results_path}/episodic_rewards'
-    if not os.path.exists(episodic_reward_directory):
-        os.mkdir(episodic_reward_directory)
-
-    logger = logging.getLogger('CreateTrainingProcesses')
-    logger.setLevel(logging.DEBUG)
-    logger.addHandler(logging.handlers.SocketHandler(host='localhost', port=logging.handlers.DEFAULT_TCP_LOGGING_PORT))
-    logger.info('Training {} jobs: [{}]. '.format(len(training_jobs), ', '.join(map(lambda job: job.name, training_jobs))))
-
-    menagerie_path = f'{results_path}/menageries'
-    if not os.path.exists(menagerie_path):
-        os.mkdir(menagerie_path)
-
-    ps = []
-    for job in training_jobs:
-        p = Process(target=training_process,
-                    args=(createNewEnvironment(), job.agent, job.training_scheme,
-                          checkpoint_at_iterations, agent_queue, job.name, results_path, seed))
-        ps.append(p)
-    logger.info("All training jobs submitted")
-    return ps
+    file_name = '{}-{}.csv'.format(self_play_scheme.name, training_agent.name)
+    episode_summary_sink = CSVEpisodeSummarySink('{}/episodic_rewards/{}'.format(base_path, file_name))
+
+    task = parse_gym_environment(createNewEnvironment(), EnvType.MULTIAGENT_SIMULTANEOUS_ACTION)
+    training_start = time.time()
+    (menagerie, trained_agent,
+     _) = self_play_training(task=task, training_agent=AgentHook.unhook(training_agent), self_play_scheme=self_play_scheme,
+                             target_episodes=target_iteration - completed_iterations, initial_episode=completed_iterations,
+                             menagerie=menagerie, menagerie_path=menagerie_path,
+                             episode_summary_sink=episode_summary_sink, keep_trajectories=False)
+    training_duration = time.time() - training_start
+
+    save_path = f'{trained_policy_save_directory}/{target_iteration}_iterations.pt'
+    hooked_agent = AgentHook(trained_agent.clone(training=False), save_path=save_path,
+                             checkpoint_writer=checkpoint_writer)
+    checkpoint_writer.close()
+    episode_summary_sink.close()
+    logger.info('Training duration between iterations [{},{}]: {} (seconds)'.format(completed_iterations, target_iteration, training_duration))
+    return AgentHook(trained_agent), self_play_scheme, menagerie, hooked_agent
@@ -6,7 +6,7 @@ import numpy as np
 
 from regym.rl_algorithms.agents import Agent
 from regym.environments import Task, EnvType
-from regym.util import play_multiple_matches
+from regym.util import play_multiple_matches, match_process_pool
 from regym.game_theory import solve_zero_sum_game
 
 
@@ -41,7 +41,7 @@ def compute_winrate_matrix_metagame(population: Iterable[Agent],
                                  empirical winrates. Higher values generate a more accurate
                                  metagame, at the expense of longer compute time.
     :param task: Multiagent Task for which the metagame is being computed
-    :param num_workers: Number of parallel threads to be spawned to carry out benchmarks in parallel
+    :param num_workers: Number of processes across which the matches of each matchup are split
     :returns: Empirical payoff matrix for player 1 representing the metagame for :param: task and
               :param: population
     '''
@@ -60,7 +60,8 @@ def compute_winrate_matrix_metagame(population: Iterable[Agent],
 
 def generate_evaluation_matrix_multi_population(populations: Iterable[Agent],
                                                 task: Task,
-                                                episodes_per_matchup: int) -> np.ndarray:
+                                                episodes_per_matchup: int,
+                                                num_workers: int = 1) -> np.ndarray:
     '''
     Generates an evaluation matrix (a metagame) for a multiagent :param: task
     given a set of :param: populations, each containing a (possibly uneven) number
@@ -82,6 +83,7 @@ def generate_evaluation_matrix_multi_population(populations: Iterable[Agent],
     :param episodes_per_matchup: Number of times each matchup will be repeated to compute
                                  empirical winrates. Higher values generate a more accurate
                                  metagame, at the expense of longer compute time.
+    :param num_workers: Number of processes across which the matches of each matchup are split
     :returns: Emprirical winrate matrix (aka evaluation matrix) representing
               the winrates of populations[0] against population[1]. That is:
               each row i represents the winrates of agent i from popuations[0]
@@ -95,20 +97,24 @@ def generate_evaluation_matrix_multi_population(populations: Iterable[Agent],
     population_1, population_2 = populations
     winrate_matrix = np.zeros((len(population_1), len(population_2)))
 
-    for i, j in product(range(len(population_1)), range(len(population_2))):
-        player_1_winrate = play_multiple_matches(task,
-                                                 agent_vector=(
-                                                     population_1[i],
-                                                     population_2[j]
-                                                     ),
-                                                 n_matches=episodes_per_matchup)[0]
-        winrate_matrix[i, j] = player_1_winrate
+    with match_process_pool(num_workers) as executor:
+        for i, j in product(range(len(population_1)), range(len(population_2))):
+            player_1_winrate = play_multiple_matches(task,
+                                                     agent_vector=(
+                                                         population_1[i],
+                                                         population_2[j]
+                                                         ),
+                                                     n_matches=episodes_per_matchup,
+                                                     num_workers=num_workers,
+                                                     executor=executor)[0]
+            winrate_matrix[i, j] = player_1_winrate
     return winrate_matrix
 
 
 def relative_population_performance(population_1: List[Agent],
                                     population_2: List[Agent],
-                                    task: Task, episodes_per_matchup: int) -> float:
+                                    task: Task, episodes_per_matchup: int,
+                                    num_workers: int = 1) -> float:
     '''
     From 'Open Ended Learning in Symmetric Zero-sum Games'
     https://arxiv.org/abs/1901.08106
@@ -128,19 +134,22 @@ def relative_population_performance(population_1: List[Agent],
     :param episodes_per_matchup: Number of times each matchup will be repeated to compute
                                  empirical winrates. Higher values generate a more accurate
                                  metagame, at the expense of longer compute time.
+    :param num_workers: Number of processes across which the matches of each matchup are split
     :returns: Population performance of :param: population_1 relative to
               :param: population_2.
     '''
     return evolution_relative_population_performance(population_1, population_2, task,
                                                      episodes_per_matchup,
-                                                     initial_index=(len(population_1) -1))[0]
+                                                     initial_index=(len(population_1) -1),
+                                                     num_workers=num_workers)[0]
 
 
 def evolution_relative_population_performance(population_1: List[Agent],
                                               population_2: List[Agent],
                                               task: Task,
                                               episodes_per_matchup: int,
-                                              initial_index: int=0) -> np.ndarray:
+                                              initial_index: int=0,
+                                              num_workers: int = 1) -> np.ndarray:
     '''
     Computes various relative population performances for :param: population_1
     and :param: population_2, where the first relative population performance
@@ -158,6 +167,7 @@ def evolution_relative_population_performance(population_1: List[Agent],
                                  metagame, at the expense of longer compute time.
     :param initial_index: Index for both populations at which the relative
                           population performance will be computed.
+    :param num_workers: Number of processes across which the matches of each matchup are split
     :returns: Vector containing the evolution of the population performance of
               :param: population_1 relative to :param: population_2 starting 
               at population_1 index :param: initial_index.
@@ -177,7 +187,8 @@ def evolution_relative_population_performance(population_1: List[Agent],
                                                                      population_2
                                                                      ],
                                                                  task=task,
-                                                                 episodes_per_matchup=episodes_per_matchup)
+                                                                 episodes_per_matchup=episodes_per_matchup,
+                                                                 num_workers=num_workers)
     # The antisymmetry refers to the operation performed to the winrates inside
     # of the matrix, NOT the matrix itself
     antisymmetric_form = winrate_matrix - 1/2
@@ -204,18 +215,21 @@ def generate_upper_triangular_symmetric_metagame(population: List[Agent],
                                  empirical winrates. Higher values generate a more accurate
                                  metagame, at the expense of longer compute time.
     :param task Multiagent Task for which the metagame is being computed
-    :param num_workers: Number of parallel threads to be spawned to carry out benchmarks in parallel
+    :param num_workers: Number of processes across which the matches of each matchup are split
     :returns: PARTIALLY filled in payoff matrix for metagame for :param: population in :param: task.
     '''
     winrate_matrix = np.zeros((len(population), len(population)))
     # k=1 below makes sure that the diagonal indices are not included
     matchups_agent_indices = zip(*np.triu_indices_from(winrate_matrix, k=1))
 
-    for i, j in matchups_agent_indices:
-        player_1_winrate = play_multiple_matches(task,
-                                                 agent_vector=(population[i], population[j]),
-                                                 n_matches=episodes_per_matchup)[0]
-        winrate_matrix[i, j] = player_1_winrate
+    with match_process_pool(num_workers) as executor:
+        for i, j in matchups_agent_indices:
+            player_1_winrate = play_multiple_matches(task,
+                                                     agent_vector=(population[i], population[j]),
+                                                     n_matches=episodes_per_matchup,
+                                                     num_workers=num_workers,
+                                                     executor=executor)[0]
+            winrate_matrix[i, j] = player_1_winrate
     return winrate_matrix
 
 
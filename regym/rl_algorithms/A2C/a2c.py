@@ -18,33 +18,69 @@ class A2CAlgorithm():
         self.n_steps = n_steps
         self.model = FullyConnectedFeedForward(policy_model_input_dim, policy_model_output_dim, hidden_units=(16,))
         self.optimizer = optim.Adam(self.model.parameters(), lr=learning_rate, eps=adam_eps)
+        self.policy_updates = 0  # Number of optimizer steps taken (see regym.training_schemes.menagerie.policy_version)
 
-    def train(self, samples, bootstrapped_reward):
-        rewards                  = np.array([reward for (s, a, log_a, reward, state_value, succ_s, done) in samples])
-        q_values                 = self.compute_temporal_differences_targets(rewards, bootstrapped_reward)
-        state_values             = torch.cat([state_value for (s, a, log_a, reward, state_value, succ_s, done) in samples])
-        log_action_probabilities = torch.cat([log_a for (s, a, log_a, reward, state_value, succ_s, done) in samples])
+    def train(self, states, actions, rewards, non_terminals, bootstrap_states):
+        '''
+        Computes a single synchronized update from a rollout of T timesteps
+        sampled from E environments in parallel (E = 1 for a single environment).
+        The policy and value function are evaluated on all T * E states
+        in a single forward pass.
+
+        :param states: Array of shape [T, E, observation_dim]
+        :param actions: Array of shape [T, E]
+        :param rewards: Array of shape [T, E]
+        :param non_terminals: Array of shape [T, E], 0 if the episode of an environment
+                              finished at a given timestep, 1 otherwise.
+        :param bootstrap_states: Array of shape [E, observation_dim]. States reached
+                                 after the last timestep, used to bootstrap the targets.
+        '''
+        num_timesteps, num_envs = np.shape(actions)
+        with torch.no_grad():
+            bootstrap_values = self.model(bootstrap_states)['state_value'].view(num_envs)
+        q_values = self.compute_temporal_differences_targets(torch.as_tensor(rewards, dtype=torch.float32),
+                                                             torch.as_tensor(non_terminals, dtype=torch.float32),
+                                                             bootstrap_values).view(-1)
+        flat_states = np.reshape(states, (num_timesteps * num_envs, -1))
+        flat_actions = torch.as_tensor(np.reshape(actions, -1), dtype=torch.int64)
 
         def closure():
             self.optimizer.zero_grad()
-            policy_loss = -1. * self.compute_policy_utility_gradient(log_action_probabilities, q_values, state_values)
-            value_loss  = nn.MSELoss()(state_values.squeeze(), q_values)
+            prediction = self.model(flat_states, flat_actions)
+            state_values = prediction['state_value'].view(-1)
+            policy_loss = -1. * self.compute_policy_utility_gradient(prediction['action_log_probability'], q_values, state_values)
+            value_loss  = nn.MSELoss()(state_values, q_values)
             (policy_loss + value_loss).backward()
-            torch.nn.utils.clip_grad_norm(self.model.parameters(), 0.5)
+            torch.nn.utils.clip_grad_norm_(self.model.parameters(), 0.5)
             return (policy_loss + value_loss)
         self.optimizer.step(closure)
+        self.policy_updates += 1
 
     def compute_policy_utility_gradient(self, log_action_probabilities, q_values, state_values):
-        advantages = (q_values - state_values.squeeze()).detach()
-        return torch.mean(log_action_probabilities.squeeze() * advantages)
+        advantages = (q_values - state_values).detach()
+        return torch.mean(log_action_probabilities * advantages)
+
+    def compute_temporal_differences_targets(self, rewards, non_terminals, bootstrap_values):
+        '''
+        Computes the n-step targets of all timesteps of all environments at once:
+            Q_t = r_t + discount_factor * non_terminal_t * Q_{t+1},  Q_T = V(bootstrap_state)
+        Unrolled, Q_t = sum_{k=t}^{T-1} w[t, k] * r_k + w[t, T] * V(bootstrap_state), where
+        w[t, k] = prod_{j=t}^{k-1} discount_factor * non_terminal_j
 
-    def compute_temporal_differences_targets(self, rewards, bootstrapped_reward):
-        discounted_rewards = np.zeros_like(rewards)
-        running_add = bootstrapped_reward
-        for t in reversed(range(0, len(rewards))):
-            running_add = rewards[t] + self.discount_factor * running_add
-            discounted_rewards[t] = running_add
-        return torch.from_numpy(discounted_rewards).type(torch.FloatTensor)
+        :param rewards: Tensor of shape [T, E]
+        :param non_terminals: Tensor of shape [T, E]
+        :param bootstrap_values: Tensor of shape [E]
+        :returns: Tensor of shape [T, E]
+        '''
+        num_timesteps = rewards.shape[0]
+        discounts = self.discount_factor * non_terminals
+        # factors[t, j] = discounts[j] if j >= t, else 1
+        upper_triangular = torch.triu(torch.ones(num_timesteps, num_timesteps)).unsqueeze(-1)
+        factors = upper_triangular * discounts.unsqueeze(0) + (1 - upper_triangular)
+        cumulative_discounts = torch.cumprod(factors, dim=1)  # [t, k] = prod_{j=t}^{k} discounts[j]
+        weights = torch.cat([torch.ones_like(cumulative_discounts[:, :1]), cumulative_discounts[:, :-1]], dim=1)
+        weights = weights * upper_triangular
+        return (weights * rewards.unsqueeze(0)).sum(dim=1) + cumulative_discounts[:, -1] * bootstrap_values
 
 
 class FullyConnectedFeedForward(nn.Module):
@@ -58,20 +94,26 @@ class FullyConnectedFeedForward(nn.Module):
         self.value_head_layer = layer_init(nn.Linear(hidden_units[-1], 1))
         self.gate = gate
 
-    def forward(self, x):
-        x = torch.Tensor(x).unsqueeze(0).type(torch.FloatTensor).cpu()
+    def forward(self, x, actions=None):
+        '''
+        :param x: Single observation, or batch of observations (one per row)
+        :param actions: If present, the log probabilities of these actions are computed,
+                        instead of those of newly sampled ones.
+        '''
+        x = torch.as_tensor(np.asarray(x), dtype=torch.float32)
+        if x.dim() == 1: x = x.unsqueeze(0)
         last_layer_output = reduce(lambda acc, layer: self.gate(layer(acc)), self.layers, x)
         # Policy head
-        action, log_probability = self.policy_head(self.gate(self.policy_head_layer(last_layer_output)))
+        action, log_probability = self.policy_head(self.gate(self.policy_head_layer(last_layer_output)), actions)
         # Value head
         state_value = self.value_head_layer(last_layer_output)
         return {'action': action,
                 'action_log_probability': log_probability,
                 'state_value': state_value}
 
-    def policy_head(self, last_layer_output):
-        action_probabilities = F.softmax(last_layer_output)
+    def policy_head(self, last_layer_output, actions=None):
+        action_probabilities = F.softmax(last_layer_output, dim=-1)
         distribution = torch.distributions.Categorical(probs=action_probabilities)
-        action = distribution.sample(sample_shape=(action_probabilities.size(0),))
+        action = distribution.sample() if actions is None else actions
         log_probability = distribution.log_prob(action)
         return action, log_probability
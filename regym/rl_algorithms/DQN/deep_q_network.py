@@ -75,6 +75,7 @@ class DeepQNetworkAlgorithm():
         self.lr = kwargs["lr"]
         self.GAMMA = kwargs["gamma"]
         self.optimizer: torch.optim = optim.Adam(self.model.parameters(), lr=self.lr)
+        self.policy_updates = 0  # Number of optimizer steps taken (see regym.training_schemes.menagerie.policy_version)
 
         # PreprocessFunction
         self.preprocess = kwargs["preprocess"]
@@ -144,6 +145,7 @@ class DeepQNetworkAlgorithm():
             torch.nn.utils.clip_grad_norm(self.model.parameters(), gradient_clamping_value)
 
         self.optimizer.step()
+        self.policy_updates += 1
 
         # TODO: Worry about this later
         #loss_per_item = dqn_loss
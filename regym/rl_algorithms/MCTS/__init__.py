@@ -1,2 +1,3 @@
 from . import sequential_mcts
 from . import simultaneous_mcts
+from . import neural_mcts
@@ -0,0 +1,198 @@
+'''
+Neural network guided MCTS for SEQUENTIAL multiagent environments,
+using the PUCT selection policy as introduced in AlphaGo Zero / AlphaZero:
+https://www.nature.com/articles/nature24270
+
+Instead of running (random) rollouts, leaf nodes are evaluated by an
+:param: evaluation_function (usually a neural network), which returns a prior
+over the legal moves of the leaf and a value estimate for each player.
+Leaf nodes are evaluated in batches: several leaf nodes are selected before
+being evaluated, using virtual losses to discourage the selection of the
+same leaf node more than once in a batch.
+
+An evaluation function has the following signature:
+
+    evaluation_function(observations: List[List], players: List[int], legal_moves: List[List])
+        -> (priors: List[List[float]], values: List[List[float]])
+
+Where, for each leaf node i:
+    - observations[i]: Observation vector (one observation per player) at leaf node i
+    - players[i]: Player who acts at leaf node i
+    - legal_moves[i]: Legal moves for players[i] at leaf node i
+    - priors[i][j]: Prior probability of players[i] taking legal_moves[i][j]
+    - values[i][p]: Value estimate of leaf node i for player p
+
+Rewards given by the environment on terminal states are used as the value
+of terminal nodes. Thus, values estimates should be on the same scale as
+the environment rewards. ASSUMPTION: Rewards are only given on terminal states.
+'''
+from typing import Callable, List, Tuple
+
+import numpy as np
+import torch
+
+from .util import PUCT, ComputationalBudget
+from .sequential_puct_node import SequentialPUCTNode
+
+
+def selection_phase(node: SequentialPUCTNode, state, num_agents: int,
+                    exploration_factor_puct: float, virtual_loss: float) -> Tuple:
+    '''
+    Descends the tree from :param: node, stepping :param: state, until
+    an unexpanded or terminal node is reached. A virtual loss is added
+    to every node along the way, to be reverted on backpropagation.
+
+    :returns: Leaf node, path of nodes from :param: node to the leaf node,
+              and the observations, reward vector and done flag of the
+              last environment step taken.
+    '''
+    path = [node]
+    node.add_virtual_loss()
+    observations, reward_vector, done = None, None, False
+    while node.is_expanded and not node.is_terminal:
+        child = sorted(node.child_nodes,
+                       key=lambda c: PUCT(node, c, exploration_factor_puct, virtual_loss))[-1]
+        observations, reward_vector, done, info = state.step(child.move)
+        if child.player is None:
+            # If environment provides information about next player, use it
+            # otherwise, assume that players' turn rotate circularly.
+            if 'current_player' in info: child.player = info['current_player']
+            else: child.player = (node.player + 1) % num_agents
+        child.add_virtual_loss()
+        path.append(child)
+        node = child
+    return node, path, observations, reward_vector, done
+
+
+def evaluation_phase(pending_evaluations: List[Tuple], evaluation_function: Callable) -> int:
+    '''
+    Evaluates all leaf nodes in :param: pending_evaluations with a single call
+    to :param: evaluation_function. Each leaf node is expanded using the
+    resulting priors and the value estimates are backpropagated.
+
+    :param pending_evaluations: List of (leaf node, path, observations, legal moves)
+    :returns: Number of nodes added to the tree
+    '''
+    if pending_evaluations == []: return 0
+    leaves, paths, observations, legal_moves = zip(*pending_evaluations)
+    priors, values = evaluation_function(list(observations),
+                                         [leaf.player for leaf in leaves],
+                                         list(legal_moves))
+    new_nodes = 0
+    for leaf, path, moves, leaf_priors, leaf_values in zip(leaves, paths, legal_moves, priors, values):
+        if not leaf.is_expanded:
+            leaf.expand(moves, leaf_priors)
+            new_nodes += len(leaf.child_nodes)
+        backpropagation_phase(path, leaf_values)
+    return new_nodes
+
+
+def backpropagation_phase(path: List[SequentialPUCTNode], values: List[float]):
+    '''
+    :param path: Nodes traversed during selection phase, starting at the root
+    :param values: Value of the leaf node at the end of :param: path for each player
+    '''
+    for n in path:
+        n.update(values[n.parent_node.player] if n.parent_node is not None else 0.)
+
+
+def action_selection_phase(node: SequentialPUCTNode):
+    return sorted(node.child_nodes, key=lambda c: c.visits)[-1].move
+
+
+def MCTS_PUCT(rootstate, budget: int, num_agents: int,
+              evaluation_function: Callable,
+              player_index: int = 0,
+              exploration_factor_puct: float = 1.,
+              evaluation_batch_size: int = 8,
+              virtual_loss: float = 1.,
+              time_budget: float = None,
+              node_budget: int = None,
+              return_statistics: bool = False):
+    '''
+    Conducts a game tree search using MCTS with the PUCT selection policy,
+    where leaf nodes are evaluated in batches of :param: evaluation_batch_size
+    by :param: evaluation_function, instead of using rollouts.
+
+    Because there is no observation available for :param: rootstate,
+    the root node is expanded using a uniform prior over its legal moves.
+
+    :param rootstate: The game state for which an action must be selected.
+    :param budget: number of MCTS iterations (leaf nodes evaluated) to be carried out.
+                   If None, only :param: time_budget and :param: node_budget bound the search.
+    :param num_agents: Number of agents in the environment
+    :param evaluation_function: Function used to compute priors and values of leaf nodes.
+    :param player_index: Player who acts at :param: rootstate
+    :param exploration_factor_puct: 'c' constant in PUCT equation.
+    :param evaluation_batch_size: Maximum number of leaf nodes evaluated at once
+    :param virtual_loss: Value subtracted from a node for each pending evaluation below it.
+    :param time_budget: Maximum wall-clock time (in seconds) to be spent searching
+    :param node_budget: Maximum number of nodes to be added to the search tree
+    :param return_statistics: Whether to also return the SearchStatistics of the search
+    :returns: Action to be taken by :param: player_index. If :param: return_statistics
+              is set, a tuple (action, SearchStatistics) is returned instead.
+    '''
+    computational_budget = ComputationalBudget(iteration_budget=budget,
+                                               time_budget=time_budget,
+                                               node_budget=node_budget)
+    rootnode = SequentialPUCTNode(player=player_index)
+    root_moves = rootstate.get_moves()
+    rootnode.expand(root_moves, [1. / len(root_moves) for _ in root_moves])
+
+    while not computational_budget.is_exhausted():
+        pending_evaluations = []
+        for _ in range(evaluation_batch_size):
+            if computational_budget.is_exhausted(): break
+            state = rootstate.clone()
+            leaf, path, observations, reward_vector, done = selection_phase(
+                    rootnode, state, num_agents, exploration_factor_puct, virtual_loss)
+            computational_budget.consume(iterations=1)
+            if done and not leaf.is_terminal: leaf.mark_terminal(reward_vector)
+            if leaf.is_terminal: backpropagation_phase(path, leaf.terminal_values)
+            else: pending_evaluations.append((leaf, path, observations, state.get_moves()))
+        new_nodes = evaluation_phase(pending_evaluations, evaluation_function)
+        computational_budget.consume(iterations=0, nodes=new_nodes)
+
+    action = action_selection_phase(rootnode)
+    if return_statistics: return action, computational_budget.statistics()
+    return action
+
+
+class NeuralNetworkEvaluation():
+
+    def __init__(self, model: torch.nn.Module, use_cuda: bool = False):
+        '''
+        Evaluation function for MCTS_PUCT backed by an actor critic neural
+        network with policy and value heads, such as
+        regym.rl_algorithms.networks.CategoricalActorCriticNet (used by PPO).
+        The observations of every player in all leaf nodes are evaluated
+        in a single forward pass. The policy of the acting player is used
+        as a prior, and the value of each player's observation as their value.
+        Recurrent networks are not supported.
+
+        :param model: Actor critic network, containing a `network` attribute
+                      with `phi_body`, `actor_body`, `critic_body`,
+                      `fc_action` and `fc_critic` modules.
+        :param use_cuda: Whether to move observations to GPU before the forward pass.
+        '''
+        self.model = model
+        self.use_cuda = use_cuda
+
+    def __call__(self, observations: List[List], players: List[int],
+                 legal_moves: List[List]) -> Tuple[List[List[float]], List[List[float]]]:
+        num_leaves, num_agents = len(observations), len(observations[0])
+        batch = np.stack([np.concatenate(player_observation, axis=None)
+                          for leaf_observations in observations
+                          for player_observation in leaf_observations])
+        batch = torch.from_numpy(batch).type(torch.FloatTensor)
+        if self.use_cuda: batch = batch.cuda()
+
+        network = self.model.network
+        with torch.no_grad():
+            phi = network.phi_body(batch)
+            logits = network.fc_action(network.actor_body(phi)).view(num_leaves, num_agents, -1).cpu()
+            values = network.fc_critic(network.critic_body(phi)).view(num_leaves, num_agents).cpu()
+
+        priors = [torch.softmax(logits[i, player, moves], dim=0).tolist()
+                  for i, (player, moves) in enumerate(zip(players, legal_moves))]
+        return priors, values.tolist()
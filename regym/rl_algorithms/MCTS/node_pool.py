@@ -0,0 +1,140 @@
+from typing import Dict, List
+from collections import namedtuple
+
+
+MemoryStatistics = namedtuple('MemoryStatistics',
+                              'capacity live_nodes peak_live_nodes allocated_nodes recycled_nodes pruned_nodes')
+
+
+class NodePool():
+
+    def __init__(self, capacity: int, prune_fraction: float = 0.1):
+        '''
+        Fixed capacity pool of MCTS nodes, used to bound the memory used
+        by MCTS searches. Instead of creating a new node on every expansion
+        (and having the garbage collector clean up entire trees after every
+        search), node objects released back to the pool are recycled.
+        A NodePool can (and should) be reused across searches, as long as
+        it is not used by two searches at the same time.
+
+        When the pool is full, the least visited subtrees of the tree(s) being
+        searched are pruned, freeing at least :param: prune_fraction of the
+        pool's capacity. Nodes involved in the ongoing MCTS iteration (the
+        ancestors of protected nodes, see NodePool.protect, and nodes which
+        have not yet been visited) are never pruned. If no node can be pruned,
+        the pool overflows its capacity. Pruned moves become untried moves
+        of their parent nodes, so they can be expanded again later on.
+
+        :param capacity: Maximum number of nodes alive at any given time.
+        :param prune_fraction: Fraction of :param: capacity to be freed
+                               every time the pool is full.
+        '''
+        if not capacity > 0:
+            raise ValueError('Parameter \'capacity\' must be a strictly positive integer')
+        if not 0 < prune_fraction <= 1:
+            raise ValueError('Parameter \'prune_fraction\' must lie in (0, 1]')
+        self.capacity = capacity
+        self.prune_fraction = prune_fraction
+        self.free_nodes: Dict[type, List] = {}
+        self.roots, self.protected_nodes = [], []
+
+        self.live_nodes, self.peak_live_nodes = 0, 0
+        self.allocated_nodes, self.recycled_nodes, self.pruned_nodes = 0, 0, 0
+
+    def set_roots(self, roots: List):
+        '''
+        :param roots: Root nodes of the trees being searched, which are
+                      traversed to find prunable subtrees. Never pruned.
+        '''
+        self.roots = roots
+
+    def protect(self, nodes: List):
+        '''
+        :param nodes: Nodes reached by the ongoing MCTS iteration. Neither
+                      these nodes nor their ancestors will be pruned.
+                      The list is referenced (not copied), so that it can
+                      be updated in place while trees are being descended.
+        '''
+        self.protected_nodes = nodes
+
+    def acquire(self, node_class: type, **node_kwargs):
+        '''
+        :param node_class: Class of the node to be acquired
+        :param node_kwargs: Arguments used to (re)initialize the node.
+        :returns: A recycled node if any is available, a new one otherwise.
+        '''
+        if self.live_nodes >= self.capacity:
+            self.prune(extra_protected_node=node_kwargs.get('parent'))
+        free_nodes = self.free_nodes.get(node_class)
+        if free_nodes:
+            node = free_nodes.pop()
+            node.__init__(**node_kwargs)
+            self.recycled_nodes += 1
+        else:
+            node = node_class(**node_kwargs)
+            self.allocated_nodes += 1
+        self.live_nodes += 1
+        self.peak_live_nodes = max(self.peak_live_nodes, self.live_nodes)
+        return node
+
+    def release_tree(self, node) -> int:
+        '''
+        Releases :param: node and all of its descendants back into the pool.
+        Released nodes must not be used anymore.
+        :returns: Number of nodes released
+        '''
+        released, stack = 0, [node]
+        while stack:
+            n = stack.pop()
+            stack.extend(n.child_nodes)
+            n.__dict__.clear()  # Drops references to other nodes and environment information
+            self.free_nodes.setdefault(type(n), []).append(n)
+            released += 1
+        self.live_nodes -= released
+        return released
+
+    def prune(self, extra_protected_node=None) -> int:
+        '''
+        Prunes the least visited, non protected, subtrees of the trees being searched.
+        :param extra_protected_node: Node which, alongside its ancestors, must not be pruned
+        :returns: Number of nodes pruned
+        '''
+        protected = set()
+        for n in self.protected_nodes + [extra_protected_node]:
+            while n is not None and id(n) not in protected:
+                protected.add(id(n))
+                n = n.parent_node
+
+        candidates, stack = [], [c for root in self.roots for c in root.child_nodes]
+        while stack:
+            n = stack.pop()
+            stack.extend(n.child_nodes)
+            if n.visits > 0 and id(n) not in protected: candidates.append(n)
+        candidates.sort(key=lambda n: n.visits)
+
+        target, pruned, pruned_ids = max(1, int(self.capacity * self.prune_fraction)), 0, set()
+        for n in candidates:
+            if pruned >= target: break
+            if id(n) in pruned_ids: continue  # Already pruned as part of an ancestor's subtree
+            stack = [n]
+            while stack:
+                descendant = stack.pop()
+                pruned_ids.add(id(descendant))
+                stack.extend(descendant.child_nodes)
+            n.parent_node.remove_child(n)
+            pruned += self.release_tree(n)
+        self.pruned_nodes += pruned
+        return pruned
+
+    def statistics(self) -> MemoryStatistics:
+        return MemoryStatistics(capacity=self.capacity, live_nodes=self.live_nodes,
+                                peak_live_nodes=self.peak_live_nodes,
+                                allocated_nodes=self.allocated_nodes,
+                                recycled_nodes=self.recycled_nodes,
+                                pruned_nodes=self.pruned_nodes)
+
+    def __len__(self):
+        return self.live_nodes
+
+    def __repr__(self):
+        return f'NodePool: {self.live_nodes}/{self.capacity} live nodes. Pruned: {self.pruned_nodes}. Recycled: {self.recycled_nodes}'
@@ -0,0 +1,67 @@
+from typing import Callable, Dict, List
+import random
+
+
+'''
+Rollout policies are used during the simulation (rollout) phase of MCTS.
+A rollout policy is any function with signature:
+
+    rollout_policy(state, legal_moves: List) -> move
+
+Where :param: legal_moves are the moves available to the acting player
+at :param: state, so that rollout policies don't need to query the
+environment for them again. In simultaneous environments, there is
+one rollout policy for each player.
+'''
+
+
+def uniform_random_rollout_policy(state, legal_moves: List):
+    '''
+    Default rollout policy. Samples a legal move uniformly at random.
+    '''
+    return random.choice(legal_moves)
+
+
+class PlayoutResults():
+
+    def __init__(self, states: List, terminal_flags: List[bool],
+                 value_function: Callable = None):
+        '''
+        Results of one or more playouts (rollouts) started from the same
+        MCTS leaf node. The result of the leaf node for a given player is
+        the average of the results of all playouts for that player.
+
+        Playouts which did not reach a terminal state (because their rollout
+        budget was exhausted), are evaluated using :param: value_function,
+        if present. Otherwise, the environment's `get_result` is used.
+
+        :param states: States at which each of the playouts finished
+        :param terminal_flags: Whether each state in :param: states is terminal
+        :param value_function: Function used to evaluate non terminal states,
+                               all non terminal states are evaluated in a single call.
+                               Signature: value_function(states: List, player_index: int) -> List[float]
+        '''
+        self.states = states
+        self.terminal_flags = terminal_flags
+        self.value_function = value_function
+        self.cached_results: Dict[int, float] = {}
+
+    def __call__(self, player_index: int) -> float:
+        '''
+        :param player_index: Player from whose perspective the results are computed
+        :returns: Average result of all playouts for player :param: player_index
+        '''
+        if player_index not in self.cached_results:
+            self.cached_results[player_index] = self.compute_result(player_index)
+        return self.cached_results[player_index]
+
+    def compute_result(self, player_index: int) -> float:
+        if self.value_function is None:
+            results = [s.get_result(player_index) for s in self.states]
+        else:
+            states_and_flags = list(zip(self.states, self.terminal_flags))
+            non_terminal_states = [s for s, terminal in states_and_flags if not terminal]
+            results = [s.get_result(player_index) for s, terminal in states_and_flags if terminal]
+            if non_terminal_states != []:
+                results += list(self.value_function(non_terminal_states, player_index))
+        return sum(results) / len(results)
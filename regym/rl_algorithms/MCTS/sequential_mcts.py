@@ -1,64 +1,198 @@
+from typing import Callable, List
 from math import sqrt
 import random
-from .util import UCB1
+from .util import UCB1, ComputationalBudget
 from .sequential_open_loop_node import SequentialOpenLoopNode
+from .transposition_table import TranspositionTable
+from .node_pool import NodePool
+from .rollout import uniform_random_rollout_policy, PlayoutResults
 
 
-def selection_phase(node, state, selection_policy=UCB1, selection_policy_args=[]):
+def selection_phase(node, state, selection_policy=UCB1, selection_policy_args=[], path: List = None):
     if not node.is_fully_expanded() or node.child_nodes == []:
         return node
-    selected_node = sorted(node.child_nodes, key=lambda child: selection_policy(node, child, *selection_policy_args))[-1]
-    state.step(selected_node.move)
-    return selection_phase(selected_node, state)
+    selected_index = sorted(range(len(node.child_nodes)),
+                            key=lambda i: selection_policy(node, node.child_nodes[i], *selection_policy_args))[-1]
+    selected_node = node.child_nodes[selected_index]
+    state.step(node.child_moves[selected_index])
+    if path is not None: path.append(selected_node)
+    return selection_phase(selected_node, state, selection_policy, selection_policy_args, path)
 
 
-def expansion_phase(node, state):
+def expansion_phase(node, state, transposition_table: TranspositionTable = None,
+                    state_hash_function: Callable = None, path: List = None,
+                    node_pool: NodePool = None):
     if node.untried_moves != []:  # if we can expand (i.e. state/node is non-terminal)
         move = random.choice(node.untried_moves)
-        state.step(move)
-        node = node.add_child(move, state)
+        observations, _, _, _ = state.step(move)
+        if transposition_table is None: node = node.add_child(move, state, node_pool)
+        else:
+            node = expand_into_transposition(node, move, state, observations,
+                                             transposition_table, state_hash_function, path)
+        if path is not None: path.append(node)
     return node
 
 
-def rollout_phase(state, rollout_budget: int):
-    for i in range(rollout_budget):
-        moves = state.get_moves()
-        if moves == []: return
-        state.step(random.choice(state.get_moves()))
+def expand_into_transposition(node, move, state, observations,
+                              transposition_table: TranspositionTable,
+                              state_hash_function: Callable, path: List):
+    '''
+    Expands :param: node with :param: move. If the resulting state has
+    already been reached via another sequence of moves (a transposition),
+    the already existing node is linked as a child of :param: node, instead
+    of creating a new one. Nodes already present in :param: path are never
+    linked, as this would introduce cycles in the search DAG.
 
+    ASSUMPTION: The observation of the player who just moved fully
+    identifies the environment state.
 
-def backpropagation_phase(node, state):
-    if node is not None:
-        node.update(state.get_result(node.player_just_moved))
-        backpropagation_phase(node.parent_node, state)
+    :returns: Child node of :param: node reached via :param: move
+    '''
+    key = (state.player_just_moved,
+           state_hash_function(observations[state.player_just_moved]))
+    transposed_node = transposition_table.lookup(key)
+    if transposed_node is not None and transposed_node not in path:
+        return node.add_transposition(move, transposed_node)
+    child = node.add_child(move, state)
+    transposition_table.store(key, child)
+    return child
+
+
+def rollout_phase(state, rollout_budget: int,
+                  rollout_policy: Callable = uniform_random_rollout_policy,
+                  value_function: Callable = None,
+                  num_playouts: int = 1) -> PlayoutResults:
+    '''
+    Simulates :param: num_playouts playouts of at most :param: rollout_budget
+    steps starting at :param: state, using :param: rollout_policy to select moves.
+    The first playout modifies :param: state, the rest are run on clones of it.
+    Playouts are stepped in lockstep, so that all playouts truncated by the
+    :param: rollout_budget can be evaluated in a single call to :param: value_function.
+
+    :param state: Environment state at the leaf node reached by the expansion phase
+    :param rollout_budget: Maximum number of environment steps taken on each playout
+    :param rollout_policy: Policy used to select moves, see regym.rl_algorithms.MCTS.rollout
+    :param value_function: Function used to evaluate truncated (non terminal) playouts.
+    :param num_playouts: Number of playouts to simulate
+    :returns: PlayoutResults of all playouts
+    '''
+    states = [state] + [state.clone() for _ in range(num_playouts - 1)]
+    terminal_flags = [False for _ in states]
+    for _ in range(rollout_budget):
+        for i, s in enumerate(states):
+            if terminal_flags[i]: continue
+            moves = s.get_moves()
+            if moves == []: terminal_flags[i] = True
+            else: s.step(rollout_policy(s, moves))
+        if all(terminal_flags): break
+    if value_function is not None:
+        terminal_flags = [terminal or s.get_moves() == []
+                          for s, terminal in zip(states, terminal_flags)]
+    return PlayoutResults(states, terminal_flags, value_function)
+
+
+def backpropagation_phase(node, results: PlayoutResults, path: List = None):
+    '''
+    Updates the statistics of the nodes traversed during the current
+    iteration. If :param: path is None, the tree is ascended from :param: node
+    following parent links. Otherwise, (i.e when searching over a DAG, where
+    nodes can have more than one parent) only the nodes in :param: path are updated.
+
+    :param results: Results of the rollout phase, for each player
+    '''
+    if path is not None:
+        for n in path: n.update(results(n.player_just_moved))
+    elif node is not None:
+        node.update(results(node.player_just_moved))
+        backpropagation_phase(node.parent_node, results)
 
 
 def action_selection_phase(node):
-    return sorted(node.child_nodes, key=lambda c: c.wins / c.visits)[-1].move
+    best_index = sorted(range(len(node.child_nodes)),
+                        key=lambda i: node.child_nodes[i].wins / node.child_nodes[i].visits)[-1]
+    return node.child_moves[best_index]
 
 
 def MCTS_UCT(rootstate, budget: int, num_agents: int,
              rollout_budget = 100000,
-             exploration_factor_ucb1: float = sqrt(2)):
+             exploration_factor_ucb1: float = sqrt(2),
+             time_budget: float = None,
+             node_budget: int = None,
+             transposition_table_size: int = None,
+             state_hash_function: Callable = None,
+             rollout_policy: Callable = uniform_random_rollout_policy,
+             value_function: Callable = None,
+             num_playouts: int = 1,
+             node_pool: NodePool = None,
+             return_statistics: bool = False):
     """
     Conducts a game tree search using the MCTS-UCT algorithm
     for a total of param itermax iterations. The search begins
     in the param rootstate. Assumes that 2 players are alternating
     with results being [0.0, 1.0].
 
+    The search can also be run in an anytime fashion, where it is carried out
+    until a wall-clock deadline (:param: time_budget) or a maximum tree size
+    (:param: node_budget) is reached, whichever comes first.
+
+    If :param: transposition_table_size is set, the search is carried out
+    over a Directed Acyclic Graph (DAG) instead of a tree: states reached via
+    different sequences of moves (transpositions) are identified using
+    :param: state_hash_function and share a single node, and thus, its statistics.
+
+    If :param: node_pool is set, nodes are acquired from (and, once the
+    search is over, released back into) this pool, which bounds the size
+    of the tree by pruning its least visited subtrees.
+
     :param rootstate: The game state for which an action must be selected.
     :param budget: number of MCTS iterations to be carried out. Also knwon as the computational budget.
+                   If None, only :param: time_budget and :param: node_budget bound the search.
     :param num_agents: UNUSED
-    :returns: (int) Action that will be taken by an agent.
+    :param time_budget: Maximum wall-clock time (in seconds) to be spent searching
+    :param node_budget: Maximum number of nodes to be added to the search tree
+    :param transposition_table_size: Maximum number of entries in the
+                                     (LRU evicted) transposition table. If None, a tree is searched.
+    :param state_hash_function: Function mapping an agent observation to a state hash.
+                                Usually, Task.hash_function. Required for DAG search.
+    :param rollout_policy: Policy used during the rollout phase. See regym.rl_algorithms.MCTS.rollout
+    :param value_function: Function used to evaluate playouts truncated by :param: rollout_budget.
+                           Signature: value_function(states: List, player_index: int) -> List[float]
+    :param num_playouts: Number of playouts simulated from each expanded node.
+    :param node_pool: NodePool used to bound the memory used by the search tree.
+                      Not supported alongside transposition tables.
+    :param return_statistics: Whether to also return the SearchStatistics of the search
+    :returns: (int) Action that will be taken by an agent. If :param: return_statistics
+              is set, a tuple (action, SearchStatistics) is returned instead.
     """
-    rootnode = SequentialOpenLoopNode(state=rootstate)
+    computational_budget = ComputationalBudget(iteration_budget=budget,
+                                               time_budget=time_budget,
+                                               node_budget=node_budget)
+    transposition_table = None
+    if transposition_table_size is not None:
+        if state_hash_function is None:
+            raise ValueError('A \'state_hash_function\' is required to search using a transposition table')
+        if node_pool is not None:
+            raise ValueError('Node pools are not supported when searching using a transposition table')
+        transposition_table = TranspositionTable(capacity=transposition_table_size)
+    if node_pool is None: rootnode = SequentialOpenLoopNode(state=rootstate)
+    else:
+        rootnode = node_pool.acquire(SequentialOpenLoopNode, state=rootstate)
+        node_pool.set_roots([rootnode])
 
-    for _ in range(budget):
+    while not computational_budget.is_exhausted():
         node  = rootnode
         state = rootstate.clone()
-        node  = selection_phase(node, state, selection_policy=UCB1, selection_policy_args=[exploration_factor_ucb1])
-        node  = expansion_phase(node, state)
-        rollout_phase(state, rollout_budget)
-        backpropagation_phase(node, state)
+        path  = [rootnode] if transposition_table is not None else None
+        node  = selection_phase(node, state, selection_policy=UCB1, selection_policy_args=[exploration_factor_ucb1], path=path)
+        if node_pool is not None: node_pool.protect([node])
+        node  = expansion_phase(node, state, transposition_table, state_hash_function, path=path, node_pool=node_pool)
+        new_nodes = int(node.visits == 0)
+        results = rollout_phase(state, rollout_budget, rollout_policy,
+                                value_function, num_playouts)
+        backpropagation_phase(node, results, path=path)
+        computational_budget.consume(iterations=1, nodes=new_nodes)
 
-    return action_selection_phase(rootnode)
+    action = action_selection_phase(rootnode)
+    if node_pool is not None: node_pool.release_tree(rootnode)
+    if return_statistics: return action, computational_budget.statistics()
+    return action
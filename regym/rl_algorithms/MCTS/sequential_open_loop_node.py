@@ -14,6 +14,12 @@ class SequentialOpenLoopNode:
 
     Note: self.wins is from the perspective of player_just_moved.
 
+    Nodes can be shared among multiple parents when MCTS is run over a
+    Directed Acyclic Graph (DAG) using a transposition table. Because of this,
+    the move leading to each child is stored on the parent (self.child_moves),
+    and self.move / self.parent_node only refer to the first parent to have
+    expanded this node.
+
     TODO: write assumptions made over the interface of the underlying
           OpenAIGym environment. THIS IS SUPER IMPORTANT
     """
@@ -21,6 +27,7 @@ class SequentialOpenLoopNode:
         self.move = move  # Move that was taken to reach this game state
         self.parent_node = parent  # "None" for the root node
         self.child_nodes = []
+        self.child_moves = []  # self.child_moves[i]: move leading to self.child_nodes[i]
 
         self.wins = 0
         self.visits = 0
@@ -30,18 +37,40 @@ class SequentialOpenLoopNode:
     def is_fully_expanded(self):
         return self.untried_moves == []
 
-    def add_child(self, move, state):
+    def add_child(self, move, state, node_pool=None):
         """
         Adds a new child node to this Node.
         :param move: (int) action taken by the player
         :param state: (GameState) state corresponding to new child node
+        :param node_pool: (NodePool) If present, pool from which the new node is acquired
         :returns: new expanded node added to the tree
         """
-        node = SequentialOpenLoopNode(move=move, parent=self, state=state)
+        if node_pool is None: node = SequentialOpenLoopNode(move=move, parent=self, state=state)
+        else: node = node_pool.acquire(SequentialOpenLoopNode, move=move, parent=self, state=state)
+        return self.add_transposition(move, node)
+
+    def add_transposition(self, move, node):
+        '''
+        Links an already existing :param: node as a child of this node,
+        reached by taking :param: move.
+        :param move: (int) action taken by the player
+        :param node: node representing the state reached after :param: move
+        :returns: :param: node, now a child of this node
+        '''
         self.untried_moves.remove(move)
         self.child_nodes.append(node)
+        self.child_moves.append(move)
         return node
 
+    def remove_child(self, node):
+        """
+        Removes :param: node (i.e when pruned) from this node's children.
+        The move leading to :param: node becomes untried again.
+        """
+        index = self.child_nodes.index(node)
+        self.child_nodes.pop(index)
+        self.untried_moves.append(self.child_moves.pop(index))
+
     def update(self, result):
         """
         Updates the node statistics saved in this node with the param result
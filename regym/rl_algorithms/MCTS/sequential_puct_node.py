@@ -0,0 +1,73 @@
+from typing import List
+
+
+class SequentialPUCTNode:
+    """
+    Open loop tree node used by the PUCT variant of MCTS (as popularized by AlphaZero)
+    for SEQUENTIAL tasks. As in SequentialOpenLoopNode, only the root of the
+    tree keeps a state representation, every other node stores which move was
+    taken from its parent node to reach it.
+
+    Unlike SequentialOpenLoopNode, nodes are fully expanded at once: all children
+    are created when a node is evaluated, each one holding the prior probability
+    of its move being selected, given by a policy (usually a neural network).
+
+    Note: self.total_value is from the perspective of the player who acted in
+          the parent node (i.e the player who chose self.move).
+    """
+
+    def __init__(self, player: int = None, move=None, parent=None, prior: float = 1.):
+        self.player = player  # Player who acts at this node. Found out upon visiting this node
+        self.move = move  # Move that was taken to reach this game state
+        self.parent_node = parent  # "None" for the root node
+        self.prior = prior
+        self.child_nodes = []
+
+        self.visits = 0
+        self.total_value = 0.
+        self.virtual_losses = 0  # Number of pending evaluations below this node
+
+        self.is_expanded = False
+        self.is_terminal = False
+        self.terminal_values = None  # Value for each player, if self.is_terminal
+
+    def expand(self, moves: List, priors: List[float]):
+        """
+        Adds a child node for each move in :param: moves.
+        :param moves: legal moves at this node
+        :param priors: prior probability of selecting each move in :param: moves
+        """
+        if self.is_expanded: return
+        self.child_nodes = [SequentialPUCTNode(move=m, parent=self, prior=p)
+                            for m, p in zip(moves, priors)]
+        self.is_expanded = True
+
+    def mark_terminal(self, values: List[float]):
+        """
+        :param values: Value of the terminal state reached at this node for each player
+        """
+        self.is_terminal, self.terminal_values = True, values
+
+    def q_value(self, virtual_loss: float) -> float:
+        """
+        Mean value of this node, where each pending evaluation below this
+        node is accounted for as a loss of magnitude :param: virtual_loss.
+        Unvisited nodes have a value of 0.
+        """
+        effective_visits = self.visits + self.virtual_losses
+        if effective_visits == 0: return 0.
+        return (self.total_value - virtual_loss * self.virtual_losses) / effective_visits
+
+    def add_virtual_loss(self):
+        self.virtual_losses += 1
+
+    def update(self, value: float):
+        """
+        Updates the node statistics with the evaluation of a leaf node below it,
+        reverting the virtual loss that was added when the leaf node was selected.
+        :param value: Value of the leaf node from the perspective of the player
+                      who acted at this node's parent.
+        """
+        self.virtual_losses -= 1
+        self.visits += 1
+        self.total_value += value
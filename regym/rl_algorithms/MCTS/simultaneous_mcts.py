@@ -4,14 +4,17 @@ from math import sqrt
 import random
 import gym
 
-from regym.rl_algorithms.MCTS.util import UCB1
+from regym.rl_algorithms.MCTS.util import UCB1, ComputationalBudget
 from regym.rl_algorithms.MCTS.simultaneous_open_loop_node import SimultaneousOpenLoopNode
+from regym.rl_algorithms.MCTS.rollout import uniform_random_rollout_policy, PlayoutResults
+from regym.rl_algorithms.MCTS.node_pool import NodePool
 
 
 
 def selection_phase(nodes: List, state: gym.Env,
                     selection_policy: Callable[[object], float] = UCB1,
-                    selection_policy_args: List = []) -> List:
+                    selection_policy_args: List = [],
+                    node_pool: NodePool = None) -> List:
     '''
     This function joins the selection and expansion phase of the vanilla
     MCTS algorithm. It begins by descending all trees in :param: nodes
@@ -27,14 +30,20 @@ def selection_phase(nodes: List, state: gym.Env,
     :param state: Environment state, which will be modified
     :param selection_policy: function used to select a node from a given set of child nodes
     :params selection_policy_args: Parameters for :param selection_policy function
+    :param node_pool: If present, NodePool from which new nodes are acquired
     :returns: List of nodes, where each node corresponds to the last
               expanded node on each player's tree.
     '''
     expanded = [False for _ in nodes]
+    nodes = list(nodes)
+    # Updated in place, so that the node pool never prunes the
+    # nodes reached so far on any of the trees being descended
+    if node_pool is not None: node_pool.protect(nodes)
     while not (all(expanded) or state.is_over()):
         moves, expanded = choose_moves(nodes, selection_policy, selection_policy_args)
         observations, _, _, _ = state.step(moves)
-        nodes = [n.descend_and_expand(moves, state) for n in nodes]
+        for i, n in enumerate(nodes):
+            nodes[i] = n.descend_and_expand(moves, state, node_pool)
     return nodes, observations
 
 
@@ -65,26 +74,38 @@ def choose_moves(nodes: List,
     return moves, expanded
 
 
-def rollout_phase(state: gym.Env, rollout_policies: List, observations, rollout_budget: int):
+def rollout_phase(state: gym.Env, rollout_policies: List[Callable], rollout_budget: int,
+                  value_function: Callable = None, num_playouts: int = 1) -> PlayoutResults:
     '''
     Exploration phase where :param rollout_policies: will act in
     until either :param rollout_budget steps have been taken or a terminal node is reached.
+    :param: num_playouts playouts are simulated in lockstep. The first one
+    modifies :param: state, the rest are run on clones of it. All playouts
+    truncated by :param: rollout_budget are evaluated in a single call
+    to :param: value_function.
+
     :param state: Environment where the :param: rollout_policies will act in
-    :param rollout_policies: Policies to be used to take action during rollout
+    :param rollout_policies: Policies to be used to take action during rollout, one for each player.
+                             See regym.rl_algorithms.MCTS.rollout
     :param rollout_budget: Maximum number of nodes to be explored (environment steps taken)
+    :param value_function: Function used to evaluate truncated (non terminal) playouts.
+    :param num_playouts: Number of playouts to simulate
+    :returns: PlayoutResults of all playouts
     '''
-    # TODO: Currently we just stop once we reach the end of the tree
-    # TODO: Implement random acting (adapt from sequential mcts)
-    for i in range(rollout_budget):
-        if state.is_over(): return state
-        action_vector = [policy.take_action(observations[i], state.get_moves(i))
-                         for policy, i in zip(
-                             rollout_policies, range(len(rollout_policies)))]
-        observations, _, _, _ = state.step(action_vector)
-    return state
-
-
-def backpropagation_phase(nodes: List, state: gym.Env) -> None:
+    states = [state] + [state.clone() for _ in range(num_playouts - 1)]
+    terminal_flags = [s.is_over() for s in states]
+    for _ in range(rollout_budget):
+        if all(terminal_flags): break
+        for i, s in enumerate(states):
+            if terminal_flags[i]: continue
+            action_vector = [policy(s, s.get_moves(player_index))
+                             for player_index, policy in enumerate(rollout_policies)]
+            s.step(action_vector)
+            terminal_flags[i] = s.is_over()
+    return PlayoutResults(states, terminal_flags, value_function)
+
+
+def backpropagation_phase(nodes: List, results: PlayoutResults) -> None:
     '''
     Updates the statistics of each player by propagating the results
     of the rollout_phase phase on each node in :params: node,
@@ -92,11 +113,11 @@ def backpropagation_phase(nodes: List, state: gym.Env) -> None:
     with respect to the perspective_player of each player.
 
     :param nodes: Nodes to be updated with the results of the rollout_phase
-    :param state: Environment state at the end of rollout_phase
+    :param results: Results of the rollout_phase, for each player
     '''
     for n in nodes:
         while n is not None:
-            n.update(state.get_result(n.perspective_player))
+            n.update(results(n.perspective_player))
             n = n.parent_node
 
 
@@ -115,8 +136,14 @@ def action_selection_phase(nodes: List) -> List[int]:
 
 def MCTS_UCT(rootstate, budget: int, num_agents: int,
              rollout_budget: int,
-             rollout_policies: List = [],
-             exploration_factor_ucb1: float = sqrt(2)):
+             rollout_policies: List[Callable] = None,
+             exploration_factor_ucb1: float = sqrt(2),
+             time_budget: float = None,
+             node_budget: int = None,
+             value_function: Callable = None,
+             num_playouts: int = 1,
+             node_pool: NodePool = None,
+             return_statistics: bool = False):
     '''
     Conducts a game tree search using the MCTS-UCT algorithm
     for a total of :param: itermax iterations using an open loop approach
@@ -131,27 +158,59 @@ def MCTS_UCT(rootstate, budget: int, num_agents: int,
     ASSUMPTION: All other agents use this version of MCTS. This could later
     be extended via opponent modelling.
 
+    The search can also be run in an anytime fashion, where it is carried out
+    until a wall-clock deadline (:param: time_budget) or a maximum tree size
+    (:param: node_budget) is reached, whichever comes first.
+
+    If :param: node_pool is set, nodes of all trees are acquired from (and,
+    once the search is over, released back into) this pool, which bounds the
+    size of the trees by pruning their least visited subtrees.
+
     :param rootstate: The game state for which an action must be selected.
     :param budget: number of MCTS iterations to be carried out.
-                    Also knwon as the computational budget.
+                    Also knwon as the computational budget. If None, only
+                    :param: time_budget and :param: node_budget bound the search.
     :param exploration_factor_ucb1: 'c' constant in UCB1 equation.
-    :param rollout_policies: Agent policies to be used during rollout phase
+    :param rollout_policies: Policies to be used during rollout phase, one for each player.
+                             Uniform random policies are used by default.
+                             See regym.rl_algorithms.MCTS.rollout
     :param rollout_budget: Maximum number of nodes to be explored (environment steps taken)
-    :returns: Action to be taken by player
+    :param time_budget: Maximum wall-clock time (in seconds) to be spent searching
+    :param node_budget: Maximum number of leaf nodes to be added across all players' trees
+    :param value_function: Function used to evaluate playouts truncated by :param: rollout_budget.
+                           Signature: value_function(states: List, player_index: int) -> List[float]
+    :param num_playouts: Number of playouts simulated from each expanded node.
+    :param node_pool: NodePool used to bound the memory used by the search trees.
+    :param return_statistics: Whether to also return the SearchStatistics of the search
+    :returns: Action to be taken by player. If :param: return_statistics
+              is set, a tuple (action, SearchStatistics) is returned instead.
     '''
-    from regym.rl_algorithms.agents import DeterministicAgent
-
-    rollout_policies = [DeterministicAgent(5, 'P1'), DeterministicAgent(5, 'P2')]
-    root_nodes = [SimultaneousOpenLoopNode(state=rootstate,
-                                           perspective_player=i)
-                  for i in range(num_agents)]
-
-    for i in range(budget):
+    computational_budget = ComputationalBudget(iteration_budget=budget,
+                                               time_budget=time_budget,
+                                               node_budget=node_budget)
+    if rollout_policies is None:
+        rollout_policies = [uniform_random_rollout_policy for _ in range(num_agents)]
+    if node_pool is None:
+        root_nodes = [SimultaneousOpenLoopNode(state=rootstate, perspective_player=i)
+                      for i in range(num_agents)]
+    else:
+        root_nodes = [node_pool.acquire(SimultaneousOpenLoopNode, state=rootstate, perspective_player=i)
+                      for i in range(num_agents)]
+        node_pool.set_roots(root_nodes)
+
+    while not computational_budget.is_exhausted():
         nodes = root_nodes
         state = rootstate.clone()
-        nodes, observations = selection_phase(nodes, state, selection_policy=UCB1, selection_policy_args=[exploration_factor_ucb1])
-        rollout_phase(state, rollout_policies, observations, rollout_budget)
-        backpropagation_phase(nodes, state)
+        nodes, _ = selection_phase(nodes, state, selection_policy=UCB1, selection_policy_args=[exploration_factor_ucb1],
+                                   node_pool=node_pool)
+        new_nodes = sum([int(n.visits == 0) for n in nodes])
+        results = rollout_phase(state, rollout_policies, rollout_budget,
+                                value_function, num_playouts)
+        backpropagation_phase(nodes, results)
+        computational_budget.consume(iterations=1, nodes=new_nodes)
 
     all_player_actions = action_selection_phase(root_nodes)
+    if node_pool is not None:
+        for n in root_nodes: node_pool.release_tree(n)
+    if return_statistics: return all_player_actions, computational_budget.statistics()
     return all_player_actions  # TODO: this might be problematic. Look into it.
@@ -39,7 +39,7 @@ class SimultaneousOpenLoopNode:
         assert not self.is_chance_node
         return self.untried_moves == []
 
-    def descend_and_expand(self, moves: List[int], state: gym.Env):
+    def descend_and_expand(self, moves: List[int], state: gym.Env, node_pool=None):
         '''
         Descends the tree, of which `self` is a node, according
         to :param: moves. If there are no deeper nodes containing
@@ -49,6 +49,7 @@ class SimultaneousOpenLoopNode:
         :params state: Game state
         :params moves: List of moves coming from selection phase,
                        one for each player
+        :params node_pool: If present, NodePool from which new nodes are acquired
         :returns: Child node, linked backwards to `self` by :param: moves
         '''
         # we iterate through actions and move to the next node
@@ -58,7 +59,8 @@ class SimultaneousOpenLoopNode:
             # Node must be expanded
             if matching_node == []: return node.add_child(
                                                       move_taken,
-                                                      state if not chance_node else None)
+                                                      state if not chance_node else None,
+                                                      node_pool)
             # Node exists
             else: return matching_node.pop(0)
 
@@ -72,18 +74,30 @@ class SimultaneousOpenLoopNode:
             node = descend_tree(node, m, chance_node=(last_node_index != i))
         return node  # Final node, after all players have acted
 
-    def add_child(self, move: int, state: gym.Env = None):
+    def add_child(self, move: int, state: gym.Env = None, node_pool=None):
         """
         Adds a new child node to this Node.
         :param move: action taken by the player
         :param state: state corresponding to new child node
+        :param node_pool: If present, NodePool from which the new node is acquired
         :returns: new expanded node added to the tree
         """
-        node = SimultaneousOpenLoopNode(self.perspective_player, move=move, parent=self, state=state)
+        node_kwargs = {'perspective_player': self.perspective_player,
+                       'move': move, 'parent': self, 'state': state}
+        if node_pool is None: node = SimultaneousOpenLoopNode(**node_kwargs)
+        else: node = node_pool.acquire(SimultaneousOpenLoopNode, **node_kwargs)
         if not self.is_chance_node: self.untried_moves.remove(move)
         self.child_nodes.append(node)
         return node
 
+    def remove_child(self, node):
+        """
+        Removes :param: node (i.e when pruned) from this node's children.
+        The move leading to :param: node becomes untried again.
+        """
+        self.child_nodes.remove(node)
+        if not self.is_chance_node: self.untried_moves.append(node.move)
+
     def update(self, result: float):
         """
         Updates the node statistics saved in this node with the param result
@@ -0,0 +1,59 @@
+from typing import Hashable
+from collections import OrderedDict
+
+
+class TranspositionTable():
+
+    def __init__(self, capacity: int):
+        '''
+        Bounded map from environment state hashes to MCTS nodes.
+        Used to turn the MCTS game tree into a Directed Acyclic Graph (DAG),
+        where positions that can be reached through different sequences of
+        moves (transpositions) share a single node, and thus its statistics.
+
+        Once :param: capacity entries are stored, the least recently
+        used (LRU) entry is evicted to make room for a new one. Evicting an
+        entry does not remove the corresponding node from the search DAG,
+        it only stops future transpositions into that node from being detected.
+
+        :param capacity: Maximum number of entries held by the table.
+        '''
+        if not capacity > 0:
+            raise ValueError('Parameter \'capacity\' must be a strictly positive integer')
+        self.capacity = capacity
+        self.table = OrderedDict()
+        self.hits, self.evictions = 0, 0
+
+    def lookup(self, key: Hashable):
+        '''
+        :param key: Hash of an environment state
+        :returns: Node stored under :param: key, None if there is no such node
+        '''
+        node = self.table.get(key)
+        if node is not None:
+            self.table.move_to_end(key)
+            self.hits += 1
+        return node
+
+    def store(self, key: Hashable, node):
+        '''
+        Stores :param: node under :param: key, evicting the least
+        recently used entry if the table is full.
+
+        :param key: Hash of the environment state represented by :param: node
+        :param node: MCTS node to be shared across transpositions
+        '''
+        self.table[key] = node
+        self.table.move_to_end(key)
+        if len(self.table) > self.capacity:
+            self.table.popitem(last=False)
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self.table)
+
+    def __contains__(self, key: Hashable):
+        return key in self.table
+
+    def __repr__(self):
+        return f'TranspositionTable: {len(self)}/{self.capacity} entries. Hits: {self.hits}. Evictions: {self.evictions}'
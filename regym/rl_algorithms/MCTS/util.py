@@ -1,4 +1,77 @@
+from collections import namedtuple
 from math import sqrt, log
+import time
+
+
+SearchStatistics = namedtuple('SearchStatistics', 'iterations nodes elapsed_time')
+
 
 def UCB1(node, child, exploration_constant=sqrt(2)):
     return child.wins / child.visits + exploration_constant * sqrt(log(node.visits) / child.visits)
+
+
+def PUCT(node, child, exploration_constant=1., virtual_loss=1.):
+    '''
+    Predictor + UCB selection policy, from AlphaZero. Pending (virtual) visits
+    count as visits, so that nodes with pending evaluations are less likely to be
+    selected again until said evaluations are backpropagated.
+    '''
+    parent_visits = max(1, node.visits + node.virtual_losses)
+    child_visits = child.visits + child.virtual_losses
+    return child.q_value(virtual_loss) \
+        + exploration_constant * child.prior * sqrt(parent_visits) / (1 + child_visits)
+
+
+class ComputationalBudget():
+
+    def __init__(self, iteration_budget: int = None, time_budget: float = None,
+                 node_budget: int = None):
+        '''
+        Computational budget of an MCTS search. The search is carried out
+        until ANY of the specified budgets is exhausted. Budgets set to None
+        are ignored. At least one budget must be specified, so that the
+        search is guaranteed to terminate.
+
+        Regardless of the budgets, at least one iteration is always
+        allowed, so that an action can be selected at the root node.
+
+        :param iteration_budget: Maximum number of MCTS iterations
+        :param time_budget: Maximum wall-clock time (in seconds) to be spent searching
+        :param node_budget: Maximum number of nodes to be added to the search tree(s)
+        '''
+        if iteration_budget is None and time_budget is None:
+            raise ValueError('Either an iteration budget or a time budget must be specified')
+        self.iteration_budget = iteration_budget
+        self.time_budget = time_budget
+        self.node_budget = node_budget
+        self.start()
+
+    def start(self):
+        '''
+        Resets the counters of this budget and starts its clock.
+        '''
+        self.start_time = time.perf_counter()
+        self.iterations = 0
+        self.nodes = 0
+
+    def consume(self, iterations: int = 1, nodes: int = 0):
+        '''
+        :param iterations: Number of MCTS iterations that have been completed
+        :param nodes: Number of nodes added to the search tree(s) by the completed iterations
+        '''
+        self.iterations += iterations
+        self.nodes += nodes
+
+    def elapsed_time(self) -> float:
+        return time.perf_counter() - self.start_time
+
+    def is_exhausted(self) -> bool:
+        if self.iterations == 0: return False
+        if self.iteration_budget is not None and self.iterations >= self.iteration_budget: return True
+        if self.node_budget is not None and self.nodes >= self.node_budget: return True
+        if self.time_budget is not None and self.elapsed_time() >= self.time_budget: return True
+        return False
+
+    def statistics(self) -> SearchStatistics:
+        return SearchStatistics(iterations=self.iterations, nodes=self.nodes,
+                                elapsed_time=self.elapsed_time())
@@ -33,6 +33,7 @@ class PPOAlgorithm():
             self.model = self.model.cuda()
 
         self.optimizer = optim.Adam(self.model.parameters(), lr=kwargs['learning_rate'], eps=kwargs['adam_eps'])
+        self.policy_updates = 0  # Number of optimizer steps taken (see regym.training_schemes.menagerie.policy_version)
         
         self.recurrent = False
         self.rnn_keys = [ key for key,value in self.kwargs.items() if isinstance(value, str) and 'RNN' in value]
@@ -136,3 +137,4 @@ class PPOAlgorithm():
             (policy_loss + value_loss).backward(retain_graph=False)
             nn.utils.clip_grad_norm_(self.model.parameters(), self.kwargs['gradient_clip'])
             self.optimizer.step()
+            self.policy_updates += 1
@@ -0,0 +1,179 @@
+from typing import Hashable, Sequence
+from collections import OrderedDict
+
+import numpy as np
+import torch
+
+
+class DenseQTable():
+
+    def __init__(self, state_space_size: int, action_space_size: int):
+        '''
+        Q-table backed by a dense [state_space_size, action_space_size] array,
+        allocated up front. Fastest backend for small state spaces.
+        States are expected to be (hashed) integers in [0, state_space_size).
+        '''
+        self.table = np.zeros((state_space_size, action_space_size), dtype=np.float64)
+
+    @property
+    def shape(self):
+        return self.table.shape
+
+    def row(self, state: int) -> np.ndarray:
+        '''
+        :returns: Q-values of all actions in :param: state. Must not be modified.
+        '''
+        return self.table[state]
+
+    def rows(self, states: Sequence[int]) -> np.ndarray:
+        return self.table[np.asarray(states)]
+
+    def get(self, state: int, action: int) -> float:
+        return self.table[state, action]
+
+    def set(self, state: int, action: int, value: float):
+        self.table[state, action] = value
+
+    def add(self, states: Sequence[int], actions: Sequence[int], deltas: Sequence[float]):
+        '''
+        Adds :param: deltas to the Q-values of (state, action) pairs.
+        Deltas of repeated pairs are accumulated.
+        '''
+        np.add.at(self.table, (np.asarray(states), np.asarray(actions)), deltas)
+
+    def __array__(self, dtype=None, copy=None):
+        return self.table if dtype is None else self.table.astype(dtype)
+
+    def __repr__(self):
+        return f'DenseQTable: {self.shape}'
+
+
+class SharedQTable(DenseQTable):
+
+    def __init__(self, state_space_size: int, action_space_size: int):
+        '''
+        Dense Q-table backed by a torch tensor in shared memory, so that multiple
+        processes (i.e parallel rollout workers) can read and update the same
+        Q-table in a lock free (Hogwild) fashion. The table is shared with
+        processes created via fork or which receive it through
+        torch.multiprocessing (i.e via a torch.multiprocessing.Queue).
+        Saving it to disk (torch.save / pickle) stores its values.
+
+        Copying a SharedQTable (copy.deepcopy, SharedQTable.snapshot) creates
+        a private DenseQTable snapshot of the current values, which is not
+        affected by further updates to the shared table. This is what agent
+        clones (i.e those added to a self-play menagerie) get.
+        '''
+        self.tensor = torch.zeros((state_space_size, action_space_size), dtype=torch.float64).share_memory_()
+        self.table = self.tensor.numpy()  # Shares memory with self.tensor
+
+    def snapshot(self) -> DenseQTable:
+        '''
+        :returns: Private (non shared) copy of the current Q-values
+        '''
+        snapshot = DenseQTable.__new__(DenseQTable)
+        snapshot.table = self.table.copy()
+        return snapshot
+
+    def __deepcopy__(self, memo):
+        return self.snapshot()
+
+    def __getstate__(self):
+        return {'tensor': self.tensor}
+
+    def __setstate__(self, state):
+        self.tensor = state['tensor']
+        self.table = self.tensor.numpy()
+
+    def __repr__(self):
+        return f'SharedQTable: {self.shape}'
+
+
+class SparseQTable():
+
+    def __init__(self, action_space_size: int, state_space_size: int = None, capacity: int = None):
+        '''
+        Q-table backed by a hash map from states to rows of Q-values, where rows
+        are only allocated once a state is updated. Unvisited states have a Q-value of 0.
+        Suited to environments whose (hashed) state space is huge, but sparsely visited.
+        States can be any hashable object.
+
+        If :param: capacity is set, at most :param: capacity rows are held in
+        memory, evicting the least recently used (LRU) row when a new one is needed.
+        Evicted states are reset to a Q-value of 0.
+
+        :param action_space_size: Number of actions
+        :param state_space_size: Only informative, reported by SparseQTable.shape
+        :param capacity: Maximum number of rows held in memory
+        '''
+        if capacity is not None and not capacity > 0:
+            raise ValueError('Parameter \'capacity\' must be a strictly positive integer')
+        self.state_space_size = state_space_size
+        self.action_space_size = action_space_size
+        self.capacity = capacity
+        self.table = OrderedDict()
+        self.unvisited_row = np.zeros(action_space_size, dtype=np.float64)
+        self.unvisited_row.setflags(write=False)
+        self.evictions = 0
+
+    @property
+    def shape(self):
+        return (self.state_space_size, self.action_space_size)
+
+    def row(self, state: Hashable) -> np.ndarray:
+        '''
+        :returns: Q-values of all actions in :param: state. Must not be modified.
+        '''
+        row = self.table.get(state)
+        if row is None: return self.unvisited_row
+        if self.capacity is not None: self.table.move_to_end(state)
+        return row
+
+    def rows(self, states: Sequence[Hashable]) -> np.ndarray:
+        return np.stack([self.row(s) for s in states])
+
+    def writable_row(self, state: Hashable) -> np.ndarray:
+        row = self.table.get(state)
+        if row is None:
+            row = np.zeros(self.action_space_size, dtype=np.float64)
+            self.table[state] = row
+            if self.capacity is not None and len(self.table) > self.capacity:
+                self.table.popitem(last=False)
+                self.evictions += 1
+        elif self.capacity is not None: self.table.move_to_end(state)
+        return row
+
+    def get(self, state: Hashable, action: int) -> float:
+        return self.row(state)[action]
+
+    def set(self, state: Hashable, action: int, value: float):
+        self.writable_row(state)[action] = value
+
+    def add(self, states: Sequence[Hashable], actions: Sequence[int], deltas: Sequence[float]):
+        '''
+        Adds :param: deltas to the Q-values of (state, action) pairs.
+        Deltas of repeated pairs are accumulated.
+        '''
+        for s, a, d in zip(states, actions, deltas):
+            self.writable_row(s)[a] += d
+
+    def __len__(self):
+        return len(self.table)
+
+    def __array__(self, dtype=None, copy=None):
+        '''
+        Dense representation of this table. Requires non negative integer states,
+        lower than state_space_size if it is set. If it is not, the table has
+        one row per state up to the highest visited state.
+        Only meant for inspecting small tables.
+        '''
+        if not all(isinstance(s, (int, np.integer)) and s >= 0 for s in self.table):
+            raise ValueError('Only SparseQTables whose states are non negative integers have a dense representation')
+        num_states = self.state_space_size if self.state_space_size is not None else max(self.table, default=-1) + 1
+        dense = np.zeros((num_states, self.action_space_size), dtype=np.float64 if dtype is None else dtype)
+        for s, row in self.table.items(): dense[s] = row
+        return dense
+
+    def __repr__(self):
+        capacity = self.capacity if self.capacity is not None else 'unbounded'
+        return f'SparseQTable: {len(self)}/{capacity} rows. Actions: {self.action_space_size}. Evictions: {self.evictions}'
@@ -1,34 +1,59 @@
 import numpy as np
 
+from .util import RandomStream, stable_softmax, sample_categorical, random_argmax
+from .q_table import DenseQTable
+
 
 class RepeatedUpdateQLearningAlgorithm():
     '''
     Repeated Update Q Learning (RUQL) as introduced in:
     "Addressing the Policy Bias of Q-Learning by Repeating Updates" - Sherief Abdallah, Michael Kaisers
     '''
-    def __init__(self, state_space_size, action_space_size, hashing_function, discount_factor, learning_rate, temperature):
-        self.Q_table = np.zeros((state_space_size, action_space_size), dtype=np.float64)
+    def __init__(self, state_space_size, action_space_size, hashing_function, discount_factor, learning_rate, temperature,
+                 seed=None, q_table=None):
+        '''
+        :param q_table: Q-table backend (see regym.rl_algorithms.TQL.q_table).
+                        Defaults to a DenseQTable of [state_space_size, action_space_size]
+        '''
+        self.Q_table = q_table if q_table is not None else DenseQTable(state_space_size, action_space_size)
         self.learning_rate = learning_rate
         self.hashing_function = hashing_function
         self.temperature = temperature
         self.discount_factor = discount_factor
+        self.random_stream = RandomStream(seed=seed)
 
     def update_q_table(self, s, a, r, succ_s):
         s, succ_s = self.hashing_function(s), self.hashing_function(succ_s)
         probability_taking_action_a = self.boltzman_exploratory_policy_from_state(s)[a]
         x = (1 - self.learning_rate)**(1 / probability_taking_action_a)
-        self.Q_table[s, a] = x * self.Q_table[s, a] + (1 - x) * (r + self.discount_factor * max(self.Q_table[succ_s, :]))
+        self.Q_table.set(s, a, x * self.Q_table.get(s, a) + (1 - x) * (r + self.discount_factor * self.Q_table.row(succ_s).max()))
+
+    def update_q_table_batch(self, states, actions, rewards, succ_states, hashed=False):
+        '''
+        Updates the Q-table with a batch of transitions at once. All targets
+        and Boltzmann policies are computed w.r.t the Q-table before the update,
+        and the updates of repeated (state, action) pairs are accumulated.
+
+        :param hashed: Whether :param: states and :param: succ_states
+                       have already been hashed with self.hashing_function
+        '''
+        if not hashed:
+            states = [self.hashing_function(s) for s in states]
+            succ_states = [self.hashing_function(s) for s in succ_states]
+        actions, batch_indices = np.asarray(actions), np.arange(len(actions))
+        state_q_values = self.Q_table.rows(states)
+        probabilities_taking_actions = stable_softmax(state_q_values, self.temperature)[batch_indices, actions]
+        x = (1 - self.learning_rate)**(1 / probabilities_taking_actions)
+        targets = np.asarray(rewards, dtype=np.float64) + self.discount_factor * self.Q_table.rows(succ_states).max(axis=1)
+        self.Q_table.add(states, actions, (1 - x) * (targets - state_q_values[batch_indices, actions]))
 
     def boltzman_exploratory_policy_from_state(self, s):
-        exp_q_values = np.exp([self.Q_table[s, i] / self.temperature for i in range(self.Q_table.shape[1])])
-        normalizing_constant = sum(exp_q_values)
-        return np.divide(exp_q_values, normalizing_constant)
+        return stable_softmax(self.Q_table.row(s), self.temperature)
 
     def find_moves(self, state, exploration):
         state = self.hashing_function(state)
         if exploration:
             p = self.boltzman_exploratory_policy_from_state(state)
-            return np.random.choice(range(self.Q_table.shape[1]), p=p)
+            return sample_categorical(p, self.random_stream.uniform())
         else:
-            optimal_moves = np.argwhere(self.Q_table[state, :] == np.amax(self.Q_table[state, :]))
-            return np.random.choice(optimal_moves.flatten().tolist())
+            return random_argmax(self.Q_table.row(state), self.random_stream.uniform())
@@ -1,28 +1,53 @@
 import numpy as np
 
+from .util import RandomStream, random_argmax
+from .q_table import DenseQTable
+
 
 class TabularQLearningAlgorithm():
 
-    def __init__(self, state_space_size, action_space_size, hashing_function, discount_factor, epsilon_greedy, learning_rate):
+    def __init__(self, state_space_size, action_space_size, hashing_function, discount_factor, epsilon_greedy, learning_rate,
+                 seed=None, q_table=None):
         """
         TODO: Document
+        :param q_table: Q-table backend (see regym.rl_algorithms.TQL.q_table).
+                        Defaults to a DenseQTable of [state_space_size, action_space_size]
         """
-        self.Q_table = np.zeros((state_space_size, action_space_size), dtype=np.float64)
+        self.Q_table = q_table if q_table is not None else DenseQTable(state_space_size, action_space_size)
         self.learning_rate = learning_rate
         self.hashing_function = hashing_function
         self.epsilon_greedy = epsilon_greedy
         self.discount_factor = discount_factor
+        self.random_stream = RandomStream(seed=seed)
         assert learning_rate >= 0 and learning_rate <= 1, 'Learning ratev alue should be between [0,1]'
         assert epsilon_greedy >= 0 and epsilon_greedy <= 1, 'Epsilon greedy value should be between [0,1]'
 
     def update_q_table(self, s, a, r, succ_s):
         s, succ_s = self.hashing_function(s), self.hashing_function(succ_s)
-        self.Q_table[s, a] += self.learning_rate * (r + self.discount_factor * max(self.Q_table[succ_s, :]) - self.Q_table[s, a])
+        td_error = r + self.discount_factor * self.Q_table.row(succ_s).max() - self.Q_table.get(s, a)
+        self.Q_table.set(s, a, self.Q_table.get(s, a) + self.learning_rate * td_error)
+
+    def update_q_table_batch(self, states, actions, rewards, succ_states, hashed=False):
+        '''
+        Updates the Q-table with a batch of transitions at once. All TD targets
+        are computed w.r.t the Q-table before the update, and the updates
+        of repeated (state, action) pairs are accumulated.
+
+        :param hashed: Whether :param: states and :param: succ_states
+                       have already been hashed with self.hashing_function
+        '''
+        if not hashed:
+            states = [self.hashing_function(s) for s in states]
+            succ_states = [self.hashing_function(s) for s in succ_states]
+        actions = np.asarray(actions)
+        td_errors = np.asarray(rewards, dtype=np.float64) \
+            + self.discount_factor * self.Q_table.rows(succ_states).max(axis=1) \
+            - self.Q_table.rows(states)[np.arange(len(actions)), actions]
+        self.Q_table.add(states, actions, self.learning_rate * td_errors)
 
     def find_moves(self, state, exploration):
-        if exploration and np.random.uniform() <= self.epsilon_greedy:
-            return np.random.choice(range(self.Q_table.shape[1]))
+        if exploration and self.random_stream.uniform() <= self.epsilon_greedy:
+            return int(self.random_stream.uniform() * self.Q_table.shape[1])
 
         state = self.hashing_function(state)
-        optimal_moves = np.argwhere(self.Q_table[state, :] == np.amax(self.Q_table[state, :]))
-        return np.random.choice(optimal_moves.flatten().tolist())
+        return random_argmax(self.Q_table.row(state), self.random_stream.uniform())
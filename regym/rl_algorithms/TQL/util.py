@@ -0,0 +1,75 @@
+import numpy as np
+
+
+class RandomStream():
+
+    def __init__(self, buffer_size: int = 4096, seed: int = None):
+        '''
+        Stream of uniform random samples in [0, 1), which are generated
+        in chunks of :param: buffer_size to amortize the cost of calling
+        the random number generator on every action selection.
+
+        :param buffer_size: Number of samples precomputed at once
+        :param seed: Seed of the underlying random number generator. If None,
+                     it is drawn from numpy's global random state, so that
+                     seeding numpy (i.e np.random.seed) keeps experiments reproducible.
+        '''
+        if seed is None: seed = np.random.randint(2**32)
+        self.rng = np.random.default_rng(seed)
+        self.buffer_size = buffer_size
+        self.refill()
+
+    def refill(self):
+        self.refill_state = self.rng.bit_generator.state
+        self.buffer = self.rng.random(self.buffer_size).tolist()
+        self.index = 0
+
+    def state_dict(self) -> dict:
+        '''
+        :returns: Json serializable state from which the stream can be resumed
+                  (see RandomStream.load_state_dict): the state of the random number
+                  generator before the current chunk was generated, and the position in it.
+        '''
+        return {'buffer_size': self.buffer_size, 'refill_state': self.refill_state, 'index': self.index}
+
+    def load_state_dict(self, state_dict: dict):
+        self.buffer_size = state_dict['buffer_size']
+        self.rng.bit_generator.state = state_dict['refill_state']
+        self.refill()
+        self.index = state_dict['index']
+
+    def uniform(self) -> float:
+        if self.index == self.buffer_size: self.refill()
+        u = self.buffer[self.index]
+        self.index += 1
+        return u
+
+
+def stable_softmax(values: np.ndarray, temperature: float = 1.) -> np.ndarray:
+    '''
+    Softmax of :param: values / :param: temperature along the last axis.
+    The maximum value is subtracted before exponentiating to avoid overflows.
+    '''
+    z = values / temperature
+    exp_z = np.exp(z - z.max(axis=-1, keepdims=True))
+    return exp_z / exp_z.sum(axis=-1, keepdims=True)
+
+
+def sample_categorical(probabilities: np.ndarray, u: float) -> int:
+    '''
+    Samples an index from the categorical distribution :param: probabilities
+    by inverting its cumulative distribution function at :param: u.
+    :param u: uniform random sample in [0, 1)
+    '''
+    cumulative = np.cumsum(probabilities)
+    index = int(np.searchsorted(cumulative, u * cumulative[-1], side='right'))
+    return min(index, len(probabilities) - 1)
+
+
+def random_argmax(values: np.ndarray, u: float) -> int:
+    '''
+    Index of the maximum of :param: values, where ties are broken
+    uniformly at random using :param: u, a uniform random sample in [0, 1)
+    '''
+    ties = np.flatnonzero(values == values.max())
+    return int(ties[int(u * len(ties))])
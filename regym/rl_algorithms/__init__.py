@@ -1,4 +1,9 @@
 from .agents import build_PPO_Agent, build_TabularQ_Agent, build_DQN_Agent, build_A2C_Agent, build_Reinforce_Agent, build_MCTS_Agent, build_Random_Agent, build_Human_Agent
+from .agents import FrozenPolicyAgent, freeze_agent
 from .agents import rockAgent, paperAgent, scissorsAgent, randomAgent
 from .agent_hook import AgentHook
-from .agent_hook import load_population_from_path
+from .agent_hook import load_population_from_path, load_agent
+from .checkpoint import save_checkpoint, load_checkpoint, read_checkpoint_config, weights_only_copy
+from .checkpoint_store import CheckpointStore, StoredAgent
+from .checkpoint_writer import AsyncCheckpointWriter
+from .weight_broadcast import WeightBroadcast
@@ -3,10 +3,11 @@ from os import listdir
 from os.path import isfile, join
 from typing import List, Callable, Tuple, Any
 import torch
-from .agents import TabularQLearningAgent, DeepQNetworkAgent, PPOAgent, MixedStrategyAgent
+from .agents import TabularQLearningAgent, DeepQNetworkAgent, PPOAgent, MixedStrategyAgent, FrozenPolicyAgent
+from .checkpoint import save_checkpoint, load_checkpoint, is_checkpoint
 from enum import Enum
 
-AgentType = Enum("AgentType", "DQN TQL PPO MixedStrategyAgent")
+AgentType = Enum("AgentType", "DQN TQL PPO MixedStrategyAgent FrozenPolicyAgent")
 
 
 # TODO: move elsewhere. Maybe utils?
@@ -18,6 +19,8 @@ def load_population_from_path(path: str, file_extension='pt',
     Agent files are recognized by the :param: file_extension.
     If :param: sort_fn is passed, all appropiate files in :param: path
     are sorted according to :param: sort_fn.
+    Agent files can either be structured checkpoints (see regym.rl_algorithms.checkpoint),
+    of which only the weights and configuration are loaded, or whole pickled agents.
 
     :param path: Relative path from which
     :param file_extension: 
@@ -26,26 +29,45 @@ def load_population_from_path(path: str, file_extension='pt',
     files = [os.path.abspath(f'{path}/{f}') for f in listdir(path)
              if isfile(join(path, f)) and f.endswith(file_extension)]
     if sort_fn is not None: files.sort(key=sort_fn)
-    return [torch.load(open(f, 'rb')) for f in files]
+    return [load_agent(f) for f in files]
+
+
+def load_agent(path: str):
+    '''
+    Loads the agent saved at :param: path, either as a structured
+    checkpoint or as a whole agent pickled via torch.save(agent, path).
+    Optimizer states and replay buffer contents are not loaded.
+    '''
+    if is_checkpoint(path): return load_checkpoint(path)
+    return torch.load(path, weights_only=False)
 
 
 class AgentHook():
-    def __init__(self, agent, save_path=None):
+    def __init__(self, agent, save_path=None, checkpoint_writer=None):
         """
         Creates an agent hook which allows to transport :param: agent:
         - Between processes if by making all Torch.Tensors be in CPU IF :param: save_path is None
-        - Written to disk if at path :param: save_path if it is not None
+        - Written to disk if at path :param: save_path if it is not None.
+          Only the agent's weights and configuration are written, as a
+          structured checkpoint (see regym.rl_algorithms.checkpoint).
+          Optimizer states and replay buffers are left out.
 
         :param agent: Agent to be hooked to be transported between processes
         :param save_path: path where to save the current agent.
+        :param checkpoint_writer: Optional. AsyncCheckpointWriter used to write the agent
+                                  at :param: save_path in the background. Unhooking, or
+                                  pickling, this hook waits for the write to complete.
         :returns: AgentHook agent whose type is that of :param: agent
         """
 
         self.name = agent.name
         self.save_path = save_path
+        self.checkpoint_writer = checkpoint_writer
 
         if isinstance(agent, MixedStrategyAgent):
             agent_type, model_list = AgentType.MixedStrategyAgent, []
+        elif isinstance(agent, FrozenPolicyAgent):
+            agent_type, model_list = AgentType.FrozenPolicyAgent, []
         elif isinstance(agent, TabularQLearningAgent):
             agent_type, model_list = AgentType.TQL, []
         elif isinstance(agent, DeepQNetworkAgent):
@@ -58,16 +80,31 @@ class AgentHook():
         self.type, self.model_list = agent_type, model_list
         for _, model in model_list: model.cpu()
         if not self.save_path: self.agent = agent
-        else: torch.save(agent, self.save_path)
+        elif self.checkpoint_writer is not None: self.checkpoint_writer.save(agent, self.save_path)
+        else: save_checkpoint(agent, self.save_path, save_optimizer=False, save_buffers=False)
+
+    def wait_until_saved(self):
+        '''
+        Blocks until the hooked agent has been written at self.save_path
+        '''
+        if getattr(self, 'checkpoint_writer', None) is not None:
+            self.checkpoint_writer.wait(self.save_path)
+
+    def __getstate__(self):
+        # Pending asynchronous writes are completed before hooks are sent elsewhere
+        self.wait_until_saved()
+        return {k: v for k, v in vars(self).items() if k != 'checkpoint_writer'}
 
     @staticmethod
     def unhook(agent_hook, use_cuda=None):
-        if hasattr(agent_hook, 'save_path') and agent_hook.save_path is not None: agent_hook.agent = torch.load(agent_hook.save_path)
-        if agent_hook.type == AgentType.TQL or agent_hook.type == AgentType.MixedStrategyAgent: return agent_hook.agent
+        if hasattr(agent_hook, 'save_path') and agent_hook.save_path is not None:
+            agent_hook.wait_until_saved()
+            agent_hook.agent = load_agent(agent_hook.save_path)
+        if agent_hook.type in [AgentType.TQL, AgentType.MixedStrategyAgent, AgentType.FrozenPolicyAgent]: return agent_hook.agent
         if 'use_cuda' in agent_hook.agent.algorithm.kwargs:
             if use_cuda is not None:
                 agent_hook.agent.algorithm.kwargs['use_cuda'] = use_cuda
                 if hasattr(agent_hook.agent, 'state_preprocessing'): agent_hook.agent.state_preprocessing.use_cuda = use_cuda
             if agent_hook.agent.algorithm.kwargs['use_cuda']:
-                for name, model in agent_hook.model_list: setattr(agent_hook.agent.algorithm, name, model.cuda())
+                for name, _ in agent_hook.model_list: setattr(agent_hook.agent.algorithm, name, getattr(agent_hook.agent.algorithm, name).cuda())
         return agent_hook.agent
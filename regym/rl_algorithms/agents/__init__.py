@@ -20,6 +20,9 @@ from .a2c_agent import build_A2C_Agent, A2CAgent
 # Search based agents
 from .mcts_agent import build_MCTS_Agent, MCTSAgent
 
+# Frozen copies of trainable agents
+from .frozen_policy_agent import FrozenPolicyAgent, freeze_agent
+
 from .deterministic_agent import build_Deterministic_Agent, DeterministicAgent
 from .random_agent import build_Random_Agent, RandomAgent
 from .mixed_strategy_agent import MixedStrategyAgent
@@ -1,4 +1,10 @@
+import copy
+
+import numpy as np
+import torch
+
 from regym.rl_algorithms.agents import Agent
+from regym.rl_algorithms.checkpoint import rebuildable
 from regym.rl_algorithms.A2C import A2CAlgorithm
 
 
@@ -7,34 +13,95 @@ class A2CAgent(Agent):
     def __init__(self, name: str, samples_before_update: int, algorithm):
         '''
         :param name: String identifier for the agent
-        :param samples_before_update: Number of actions the agent will take before updating
+        :param samples_before_update: Number of actions the agent will take (on each environment) before updating
         :param algorithm: Reinforcement Learning algorithm used to update the agent's policy.
                           Contains the agent's policy, represented as a neural network.
+
+        The agent can act on a single environment (A2CAgent.take_action, A2CAgent.handle_experience)
+        or on many environments in parallel, i.e a vectorized environment
+        (A2CAgent.take_multiple_actions, A2CAgent.handle_multiple_experiences).
+        In both cases, experiences are stored in preallocated [samples_before_update, num_envs]
+        buffers, and a single synchronized update is computed once they are full.
         '''
         super(A2CAgent, self).__init__(name=name)
         self.algorithm = algorithm
 
         self.samples_before_update = samples_before_update
-        self.samples = []
+        self.rollout = None
+        self.rollout_length = 0
 
     def handle_experience(self, s, a, r, succ_s, done=False):
         super(A2CAgent, self).handle_experience(s, a, r, succ_s, done)
         if not self.training: return
-        self.samples.append((s, a, self.current_prediction['action_log_probability'],
-                             r, self.current_prediction['state_value'], succ_s, done))
-        if done or len(self.samples) >= self.samples_before_update:
-            bootstrapped_reward = self.current_prediction['state_value'] if not done else 0
-            self.algorithm.train(self.samples, bootstrapped_reward)
-            self.samples = []
+        self.store_experiences([s], [a], [r], [succ_s], [done])
+        if done or self.rollout_length >= self.samples_before_update: self.train()
+
+    def handle_multiple_experiences(self, states, actions, rewards, succ_states, dones):
+        '''
+        Processes one experience from each of many environments (i.e a vectorized
+        environment), identified by their index in the parameters of this function.
+        NOTE: Unless this agent's 'training' flag is set to True, this function will not do anything.
+
+        :param states:      Environment states, one for each environment
+        :param actions:     Actions taken by this agent at :param states:
+        :param rewards:     Rewards obtained by this agent after taking :param actions:
+        :param succ_states: Environment states reached after taking :param actions:
+        :param dones:       Whether the episode of each environment has finished
+        '''
+        if not self.training: return
+        self.handled_experiences += len(states)
+        self.store_experiences(states, actions, rewards, succ_states, dones)
+        if self.rollout_length >= self.samples_before_update: self.train()
+
+    def store_experiences(self, states, actions, rewards, succ_states, dones):
+        states = np.reshape(states, (len(actions), -1))
+        if self.rollout is None or self.rollout['s'].shape[1:] != states.shape:
+            if self.rollout_length > 0:
+                raise ValueError(f'Experiences of shape {states.shape} (environments, observation_dim) were received '
+                                 f'in the middle of a rollout of shape {self.rollout["s"].shape[1:]}. The number of '
+                                 'environments and the observation dimension can only change between rollouts')
+            self.allocate_rollout(num_envs=states.shape[0], observation_dim=states.shape[1])
+        t = self.rollout_length
+        self.rollout['s'][t], self.rollout['a'][t], self.rollout['r'][t] = states, actions, rewards
+        self.rollout['non_terminal'][t] = 1. - np.asarray(dones, dtype=np.float32)
+        self.bootstrap_states = succ_states
+        self.rollout_length += 1
+
+    def allocate_rollout(self, num_envs: int, observation_dim: int):
+        self.rollout = {'s': np.zeros((self.samples_before_update, num_envs, observation_dim), dtype=np.float32),
+                        'a': np.zeros((self.samples_before_update, num_envs), dtype=np.int64),
+                        'r': np.zeros((self.samples_before_update, num_envs), dtype=np.float32),
+                        'non_terminal': np.zeros((self.samples_before_update, num_envs), dtype=np.float32)}
+        self.rollout_length = 0
+
+    def train(self):
+        t = self.rollout_length
+        self.algorithm.train(self.rollout['s'][:t], self.rollout['a'][:t], self.rollout['r'][:t],
+                             self.rollout['non_terminal'][:t],
+                             np.reshape(self.bootstrap_states, (self.rollout['s'].shape[1], -1)))
+        self.rollout_length = 0
 
     def take_action(self, state):
-        self.current_prediction = self.algorithm.model(state)
+        with torch.no_grad():  # Predictions are recomputed in a single batch during training
+            self.current_prediction = self.algorithm.model(state)
         return self.current_prediction['action'].item()
 
+    def take_multiple_actions(self, states):
+        '''
+        :param states: Environment states, one for each of many environments
+        :returns: Actions to be executed in each environment, computed in a single forward pass
+        '''
+        with torch.no_grad():
+            return self.algorithm.model(states)['action'].numpy()
+
     def clone(self, training=None):
-        pass
+        clone = A2CAgent(name=self.name, samples_before_update=self.samples_before_update,
+                         algorithm=copy.deepcopy(self.algorithm))
+        clone.training = training
+        return clone
 
 
+@rebuildable
 def build_A2C_Agent(task, config, agent_name):
     '''
     :param task: Environment specific configuration
@@ -44,7 +111,7 @@ def build_A2C_Agent(task, config, agent_name):
     :param config: Dictionary whose entries contain hyperparameters for the A2C agents:
         - 'discount_factor':       Discount factor (gamma in standard RL equations) used as a -variance / +bias tradeoff.
         - 'n_steps':               'Forward view' timesteps used to compute the Q_values used to approximate the advantage function
-        - 'samples_before_update': Number of actions the agent will take before updating
+        - 'samples_before_update': Number of actions the agent will take (on each environment) before updating
         - 'learning_rate':         Learning rate for the Neural Network optimizer. Recommended: 1.0e-4
         - 'adam_eps':              Epsilon value used in denominator of Adam update computation. Recommended: 1.0e-5
 
@@ -7,6 +7,7 @@ import torch as T
 import torch.nn as nn
 
 from regym.rl_algorithms.agents import Agent
+from regym.rl_algorithms.checkpoint import rebuildable
 from regym.rl_algorithms.replay_buffers import EXP
 from regym.rl_algorithms.networks import CategoricalDuelingDQNet, CategoricalDQNet
 from regym.rl_algorithms.networks import LeakyReLU, FCBody
@@ -37,6 +38,7 @@ class DeepQNetworkAgent(Agent):
         return self.algorithm.model
 
     def handle_experience(self, s, a, r, succ_s, done=False):
+        if not self.training: return
         hs = self.preprocessing_function(s)
         hsucc = self.preprocessing_function(succ_s)
         r = T.ones(1)*r
@@ -44,7 +46,7 @@ class DeepQNetworkAgent(Agent):
         experience = EXP(hs, a_tensor, hsucc, r, done)
         self.algorithm.handle_experience(experience=experience)
 
-        if self.training and self.algorithm.is_ready_to_train():
+        if self.algorithm.is_ready_to_train():
             self.algorithm.train(iterations=self.kwargs['nbrTrainIteration'])
 
     def take_action(self, state: np.ndarray, legal_actions: List[int]):
@@ -81,6 +83,7 @@ class DeepQNetworkAgent(Agent):
         return clone
 
 
+@rebuildable
 def build_DQN_Agent(task, config, agent_name):
     kwargs = dict()
     """
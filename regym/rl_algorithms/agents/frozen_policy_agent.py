@@ -0,0 +1,101 @@
+import copy
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from regym.rl_algorithms.agents import Agent
+from regym.rl_algorithms.checkpoint import weights_only_copy
+
+
+class FrozenPolicyAgent(Agent):
+
+    def __init__(self, name: str, policy_agent: Agent, half_precision: bool = False):
+        '''
+        Agent which acts following a frozen copy of the policy of a trainable agent
+        and never learns. Intended for self-play menageries, where opponents only act.
+        Use freeze_agent to create one from any trainable agent.
+
+        :param name: String identifier for the agent
+        :param policy_agent: Agent whose policy is used to act. It is expected to
+                             only hold its policy (i.e no optimizers nor replay buffers)
+        :param half_precision: Whether the neural networks / Q-tables of :param: policy_agent
+                               have been converted to half precision (float16)
+        '''
+        super(FrozenPolicyAgent, self).__init__(name=name, requires_environment_model=policy_agent.requires_environment_model)
+        self.policy_agent = policy_agent
+        self.half_precision = half_precision
+        self.training = False
+
+    def take_action(self, *args, **kwargs):
+        with torch.no_grad():
+            return self.policy_agent.take_action(*args, **kwargs)
+
+    def handle_experience(self, s, a, r, succ_s, done=False):
+        pass
+
+    def clone(self, training=None):
+        '''
+        Clones share (read only) neural network weights and Q-tables,
+        but not any other state (i.e recurrent states).
+        '''
+        memo = {id(component): component for component in _policy_components(self.policy_agent)}
+        return FrozenPolicyAgent(name=self.name, policy_agent=copy.deepcopy(self.policy_agent, memo),
+                                 half_precision=self.half_precision)
+
+    def __repr__(self):
+        precision = 'float16' if self.half_precision else 'full precision'
+        return f'FrozenPolicyAgent: {self.name}. Policy: {type(self.policy_agent).__name__} ({precision})'
+
+
+def freeze_agent(agent: Agent, half_precision: bool = False) -> FrozenPolicyAgent:
+    '''
+    Creates a FrozenPolicyAgent holding only the policy of :param: agent:
+    its neural networks and Q-tables are copied, but not its optimizers
+    nor the contents of its replay buffers / storages.
+
+    :param agent: Trainable agent whose current policy will be frozen
+    :param half_precision: Whether to store the neural networks / Q-tables in half precision (float16),
+                           halving their memory. Neural networks still receive and return
+                           float32 tensors, their inputs are cast to float16 on the fly.
+    :returns: FrozenPolicyAgent acting like :param: agent, with its training flag set to False
+    '''
+    if isinstance(agent, FrozenPolicyAgent):
+        if agent.half_precision or not half_precision: return agent.clone()
+        agent = agent.policy_agent
+    policy_agent = weights_only_copy(agent, training=False, trainable=False)
+    if half_precision: _convert_to_half_precision(policy_agent)
+    return FrozenPolicyAgent(name=agent.name, policy_agent=policy_agent, half_precision=half_precision)
+
+
+def _policy_components(agent):
+    if not hasattr(agent, 'algorithm'): return []
+    return [value for value in vars(agent.algorithm).values()
+            if isinstance(value, nn.Module) or isinstance(getattr(value, 'table', None), np.ndarray)]
+
+
+def _convert_to_half_precision(agent):
+    for value in _policy_components(agent):
+        if isinstance(value, nn.Module):
+            value.half()
+            for module in value.modules():
+                if len(list(module.parameters(recurse=False))) > 0:
+                    module.register_forward_pre_hook(_cast_inputs_to_half)
+            value.register_forward_hook(_cast_outputs_to_float)
+        else: value.table = value.table.astype(np.float16)
+
+
+def _cast_inputs_to_half(module, inputs):
+    return _cast_floating_tensors(inputs, torch.float16)
+
+
+def _cast_outputs_to_float(module, inputs, outputs):
+    return _cast_floating_tensors(outputs, torch.float32)
+
+
+def _cast_floating_tensors(x, dtype):
+    if isinstance(x, torch.Tensor): return x.to(dtype) if x.is_floating_point() else x
+    if isinstance(x, tuple): return tuple(_cast_floating_tensors(v, dtype) for v in x)
+    if isinstance(x, list): return [_cast_floating_tensors(v, dtype) for v in x]
+    if isinstance(x, dict): return {k: _cast_floating_tensors(v, dtype) for k, v in x.items()}
+    return x
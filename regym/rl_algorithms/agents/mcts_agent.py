@@ -1,4 +1,5 @@
 from typing import Dict
+from functools import partial
 from math import sqrt
 
 import numpy as np
@@ -8,13 +9,17 @@ import regym
 from regym.rl_algorithms.agents import Agent
 from regym.rl_algorithms.MCTS import sequential_mcts
 from regym.rl_algorithms.MCTS import simultaneous_mcts
+from regym.rl_algorithms.MCTS import neural_mcts
+from regym.rl_algorithms.MCTS.node_pool import NodePool
 
 
 class MCTSAgent(Agent):
 
     def __init__(self, name: str, algorithm,
                  iteration_budget: int, rollout_budget: int,
-                 exploration_constant: float, task_num_agents: int):
+                 exploration_constant: float, task_num_agents: int,
+                 time_budget: float = None, node_budget: int = None,
+                 neural_guided: bool = False, memory_capacity: int = None):
         '''
         Agent for various algorithms of the Monte Carlo Tree Search family (MCTS).
         MCTS algorithms are model based (aka, statistical forward planners). which will require
@@ -23,6 +28,24 @@ class MCTSAgent(Agent):
         Currently, MCTSAgent supports Multiagent environments. Refer to
         regym.rl_algorithms.MCTS for details on algorithmic implementations.
 
+        On top of a fixed number of iterations, the search can be bounded by
+        a wall-clock budget (in seconds) and / or by a maximum number of nodes.
+        This bounds the latency of MCTSAgent.take_action() regardless of how
+        expensive it is to step the environment. Statistics about the
+        latest search (i.e iterations completed) are stored in
+        MCTSAgent.search_statistics.
+
+        If :param: neural_guided is set, :param: algorithm is a PUCT variant
+        of MCTS (see regym.rl_algorithms.MCTS.neural_mcts), which evaluates
+        leaf nodes with a neural network instead of using rollouts.
+        In such case, :param: exploration_constant is PUCT's 'c' constant.
+
+        If :param: memory_capacity is set, the search tree(s) never hold more
+        than :param: memory_capacity nodes, which are recycled across calls to
+        MCTSAgent.take_action() via a NodePool (least visited subtrees are pruned
+        when the pool is full). Memory usage counters are available in
+        MCTSAgent.memory_statistics.
+
         A nice survey paper of MCTS approaches:
                 https://www.researchgate.net/publication/235985858_A_Survey_of_Monte_Carlo_Tree_Search_Methods
             '''
@@ -32,14 +55,36 @@ class MCTSAgent(Agent):
         self.rollout_budget = rollout_budget
         self.exploration_constant = exploration_constant
         self.task_num_agents = task_num_agents
+        self.time_budget = time_budget
+        self.node_budget = node_budget
+        self.neural_guided = neural_guided
+        self.memory_capacity = memory_capacity
+        self.node_pool = NodePool(memory_capacity) if memory_capacity is not None else None
+        self.search_statistics = None
+
+    @property
+    def memory_statistics(self):
+        '''
+        :returns: MemoryStatistics of this agent's node pool, None if its memory is not bounded
+        '''
+        return self.node_pool.statistics() if self.node_pool is not None else None
 
     def take_action(self, env: gym.Env, player_index: int):
-        player_actions = self.algorithm(
+        if self.neural_guided:
+            search_kwargs = {'player_index': player_index,
+                             'exploration_factor_puct': self.exploration_constant}
+        else:
+            search_kwargs = {'rollout_budget': self.rollout_budget,
+                             'exploration_factor_ucb1': self.exploration_constant}
+            if self.node_pool is not None: search_kwargs['node_pool'] = self.node_pool
+        player_actions, self.search_statistics = self.algorithm(
                 rootstate=env,
                 budget=self.budget,
-                rollout_budget=self.rollout_budget,
                 num_agents=self.task_num_agents,
-                exploration_factor_ucb1=self.exploration_constant)
+                time_budget=self.time_budget,
+                node_budget=self.node_budget,
+                return_statistics=True,
+                **search_kwargs)
         if isinstance(player_actions, list): return player_actions[player_index]
         return player_actions
 
@@ -51,11 +96,19 @@ class MCTSAgent(Agent):
                            iteration_budget=self.budget,
                            rollout_budget=self.rollout_budget,
                            exploration_constant=self.exploration_constant,
-                           task_num_agents=self.task_num_agents)
+                           task_num_agents=self.task_num_agents,
+                           time_budget=self.time_budget,
+                           node_budget=self.node_budget,
+                           neural_guided=self.neural_guided,
+                           memory_capacity=self.memory_capacity)
         return cloned
 
     def __repr__(self):
         s = f'MCTSAgent: {self.name}. Budget: {self.budget}'
+        if self.neural_guided: s += '. Neural guided (PUCT)'
+        if self.memory_capacity is not None: s += f'. Memory capacity: {self.memory_capacity} nodes'
+        if self.time_budget is not None: s += f'. Time budget: {self.time_budget}s'
+        if self.node_budget is not None: s += f'. Node budget: {self.node_budget}'
         return s
 
 
@@ -65,7 +118,38 @@ def build_MCTS_Agent(task: regym.environments.Task, config: Dict[str, object], a
     :param agent_name: String identifier for the agent
     :param config: Dictionary whose entries contain hyperparameters for the A2C agents:
         - 'budget': (Int) Number of iterations of the MCTS loop that will be carried
-                    out before an action is selected.
+                    out before an action is selected. Optional if 'time_budget' is given.
+        - 'rollout_budget': (Int) Maximum number of environment steps taken during rollouts.
+                            Not used (optional) by neural guided MCTS.
+        - 'time_budget': (Float) Optional. Wall-clock time (in seconds) after which
+                         the search is stopped and an action is selected.
+        - 'node_budget': (Int) Optional. Maximum number of nodes that can be added
+                         to the search tree(s) before an action is selected.
+        - 'transposition_table_size': (Int) Optional. Only for sequential tasks. If present,
+                         MCTS searches over a DAG, sharing nodes among transpositions,
+                         detected using :param: task's hash_function. Maximum number of
+                         entries in the transposition table (Least Recently Used eviction).
+        - 'num_playouts': (Int) Optional. Number of playouts (rollouts) simulated,
+                          in lockstep, from each expanded node. Default: 1.
+        - 'rollout_policy': (Callable) Optional. Policy used during rollouts, used by all players.
+                            See regym.rl_algorithms.MCTS.rollout. Default: uniform random.
+        - 'value_function': (Callable) Optional. Function used to evaluate rollouts truncated
+                            by 'rollout_budget' before reaching a terminal state.
+                            Signature: value_function(states: List, player_index: int) -> List[float]
+        - 'memory_capacity': (Int) Optional. Maximum number of nodes held in memory by
+                             the search tree(s). Nodes are recycled across searches, and the
+                             least visited subtrees are pruned once the capacity is reached.
+                             Not supported alongside 'transposition_table_size' nor neural guided MCTS.
+        - 'model': (CategoricalActorCriticNet) Optional. Only for sequential tasks. If present,
+                   rollouts are replaced by batched evaluations of leaf nodes by this
+                   network's policy and value heads, and nodes are selected using PUCT.
+                   See regym.rl_algorithms.MCTS.neural_mcts.
+        - 'evaluation_function': (Callable) Optional. Same as 'model', but with an arbitrary
+                   leaf evaluation function. See regym.rl_algorithms.MCTS.neural_mcts.
+        - 'evaluation_batch_size': (Int) Optional. Maximum number of leaf nodes evaluated
+                   at once by neural guided MCTS. Default: 8.
+        - 'virtual_loss': (Float) Optional. Virtual loss added to nodes with pending
+                   evaluations by neural guided MCTS. Default: 1.
     :returns: Agent using an MCTS algorithm to act the :param: tasks's environment
     '''
     if task.env_type == regym.environments.EnvType.SINGLE_AGENT:
@@ -77,21 +161,92 @@ def build_MCTS_Agent(task: regym.environments.Task, config: Dict[str, object], a
 
     check_config_validity(config)
 
-    budget = config['budget']
-    rollout_budget = config['rollout_budget']
-    exploration_constant = config['exploration_constant'] if 'exploration_constant' in config else sqrt(2)
+    neural_guided = 'model' in config or 'evaluation_function' in config
+    if 'memory_capacity' in config and (neural_guided or 'transposition_table_size' in config):
+        raise ValueError('\'memory_capacity\' is not supported alongside transposition tables nor neural guided MCTS')
+    if neural_guided:
+        if task.env_type != regym.environments.EnvType.MULTIAGENT_SEQUENTIAL_ACTION:
+            raise ValueError('Neural guided MCTS is only supported for sequential action tasks')
+        algorithm = build_neural_guided_algorithm(config)
+    elif 'transposition_table_size' in config:
+        if task.env_type != regym.environments.EnvType.MULTIAGENT_SEQUENTIAL_ACTION:
+            raise ValueError('Transposition tables are only supported for sequential action tasks')
+        if task.hash_function is None:
+            raise ValueError(f'Task {task.name} does not provide a hash_function, required by a transposition table')
+        algorithm = partial(algorithm,
+                            transposition_table_size=config['transposition_table_size'],
+                            state_hash_function=task.hash_function)
+
+    if not neural_guided:
+        algorithm = partial(algorithm, **parse_rollout_configuration(task, config))
+
+    budget = config['budget'] if 'budget' in config else None
+    rollout_budget = config['rollout_budget'] if 'rollout_budget' in config else None
+    default_exploration_constant = 1. if neural_guided else sqrt(2)
+    exploration_constant = config['exploration_constant'] if 'exploration_constant' in config else default_exploration_constant
+    time_budget = float(config['time_budget']) if 'time_budget' in config else None
+    node_budget = config['node_budget'] if 'node_budget' in config else None
+    memory_capacity = config['memory_capacity'] if 'memory_capacity' in config else None
 
     agent = MCTSAgent(name=agent_name, algorithm=algorithm,
                       iteration_budget=budget,
                       rollout_budget=rollout_budget,
                       exploration_constant=exploration_constant,
-                      task_num_agents=task.num_agents)
+                      task_num_agents=task.num_agents,
+                      time_budget=time_budget,
+                      node_budget=node_budget,
+                      neural_guided=neural_guided,
+                      memory_capacity=memory_capacity)
     return agent
 
 
+def build_neural_guided_algorithm(config: Dict):
+    '''
+    :returns: PUCT MCTS algorithm whose leaf nodes are evaluated by
+              either config['evaluation_function'] or config['model']
+    '''
+    if 'evaluation_function' in config: evaluation_function = config['evaluation_function']
+    else: evaluation_function = neural_mcts.NeuralNetworkEvaluation(config['model'])
+    return partial(neural_mcts.MCTS_PUCT,
+                   evaluation_function=evaluation_function,
+                   evaluation_batch_size=config['evaluation_batch_size'] if 'evaluation_batch_size' in config else 8,
+                   virtual_loss=config['virtual_loss'] if 'virtual_loss' in config else 1.)
+
+
+def parse_rollout_configuration(task: regym.environments.Task, config: Dict) -> Dict:
+    '''
+    :returns: Keyword arguments for the MCTS algorithm used by an MCTSAgent
+              acting in :param: task, which determine how rollouts are carried out.
+    '''
+    rollout_kwargs = {'num_playouts': config['num_playouts'] if 'num_playouts' in config else 1}
+    if 'value_function' in config: rollout_kwargs['value_function'] = config['value_function']
+    if 'rollout_policy' in config:
+        if task.env_type == regym.environments.EnvType.MULTIAGENT_SIMULTANEOUS_ACTION:
+            rollout_kwargs['rollout_policies'] = [config['rollout_policy'] for _ in range(task.num_agents)]
+        else: rollout_kwargs['rollout_policy'] = config['rollout_policy']
+    return rollout_kwargs
+
+
 def check_config_validity(config: Dict):
-    if not isinstance(config['budget'], (int, np.integer)):
+    if 'budget' not in config and 'time_budget' not in config:
+        raise ValueError('Either the hyperparameter \'budget\' or \'time_budget\' should be specified')
+    if 'budget' in config and not isinstance(config['budget'], (int, np.integer)):
         raise ValueError('The hyperparameter \'budget\' should be an integer')
-    if not isinstance(config['rollout_budget'], (int, np.integer)):
+    if 'time_budget' in config and not (isinstance(config['time_budget'], (int, float, np.number)) and config['time_budget'] > 0):
+        raise ValueError('The hyperparameter \'time_budget\' should be a strictly positive number (seconds)')
+    if 'node_budget' in config and not (isinstance(config['node_budget'], (int, np.integer)) and config['node_budget'] > 0):
+        raise ValueError('The hyperparameter \'node_budget\' should be a strictly positive integer')
+    if 'transposition_table_size' in config and not (isinstance(config['transposition_table_size'], (int, np.integer)) and config['transposition_table_size'] > 0):
+        raise ValueError('The hyperparameter \'transposition_table_size\' should be a strictly positive integer')
+    if 'memory_capacity' in config and not (isinstance(config['memory_capacity'], (int, np.integer)) and config['memory_capacity'] > 0):
+        raise ValueError('The hyperparameter \'memory_capacity\' should be a strictly positive integer')
+    if 'num_playouts' in config and not (isinstance(config['num_playouts'], (int, np.integer)) and config['num_playouts'] > 0):
+        raise ValueError('The hyperparameter \'num_playouts\' should be a strictly positive integer')
+    if 'evaluation_batch_size' in config and not (isinstance(config['evaluation_batch_size'], (int, np.integer)) and config['evaluation_batch_size'] > 0):
+        raise ValueError('The hyperparameter \'evaluation_batch_size\' should be a strictly positive integer')
+    neural_guided = 'model' in config or 'evaluation_function' in config
+    if not neural_guided and 'rollout_budget' not in config:
+        raise ValueError('The hyperparameter \'rollout_budget\' should be specified')
+    if 'rollout_budget' in config and not isinstance(config['rollout_budget'], (int, np.integer)):
         raise ValueError('The hyperparameter \'rollout_budget\' should be an integer')
     # TODO: Check if 'exploration_constant' is a float
@@ -4,6 +4,7 @@ import copy
 
 import regym
 from regym.rl_algorithms.agents import Agent
+from regym.rl_algorithms.checkpoint import rebuildable
 from regym.rl_algorithms.networks import CategoricalActorCriticNet, GaussianActorCriticNet
 from regym.rl_algorithms.networks import FCBody, LSTMBody
 from regym.rl_algorithms.networks import PreprocessFunction
@@ -68,6 +69,7 @@ class PPOAgent(Agent):
 
     def handle_experience(self, s, a, r, succ_s, done):
         super(PPOAgent, self).handle_experience(s, a, r, succ_s, done)
+        if not self.training: return
         non_terminal = torch.ones(1)*(1 - int(done))
         state = self.state_preprocessing(s)
         r = torch.ones(1)*r
@@ -75,7 +77,7 @@ class PPOAgent(Agent):
         self.algorithm.storage.add(self.current_prediction)
         self.algorithm.storage.add({'r': r, 'non_terminal': non_terminal, 's': state})
 
-        if self.training and (self.handled_experiences % self.algorithm.kwargs['horizon']) == 0:
+        if (self.handled_experiences % self.algorithm.kwargs['horizon']) == 0:
             next_state = self.state_preprocessing(succ_s)
 
             if self.recurrent:
@@ -100,10 +102,40 @@ class PPOAgent(Agent):
             self.current_prediction = self.algorithm.model(state,
                                                            legal_actions=legal_actions)
         self.current_prediction = self._post_process(self.current_prediction)
-
-        action = self.current_prediction['a'].numpy()
+        return self._action(self.current_prediction)
+
+    def take_actions(self, states: List, legal_actions: List[List[int]] = None) -> List:
+        '''
+        Batched version of PPOAgent.take_action, which takes an action for each
+        of :param: states (i.e observations of copies of an environment)
+        with a single forward pass of the policy. The prediction made for
+        each state is stored in self.current_predictions.
+        Recurrent agents, and states with different legal actions,
+        take their actions one state at a time.
+
+        :param states: Vector of states
+        :param legal_actions: Legal actions at each of :param: states
+        :returns: Vector of actions, one for each of :param: states
+        '''
+        if legal_actions is None: legal_actions = [None] * len(states)
+        if self.recurrent or any(legal != legal_actions[0] for legal in legal_actions):
+            actions, self.current_predictions = [], []
+            for state, legal in zip(states, legal_actions):
+                actions.append(self.take_action(state, legal))
+                self.current_predictions.append(self.current_prediction)
+            return actions
+
+        prediction = self.algorithm.model(torch.cat([self.state_preprocessing(state) for state in states]),
+                                          legal_actions=legal_actions[0])
+        prediction = self._post_process(prediction)
+        self.current_predictions = [{k: v[i:i + 1] for k, v in prediction.items()} for i in range(len(states))]
+        self.current_prediction = self.current_predictions[-1]
+        return [self._action(prediction) for prediction in self.current_predictions]
+
+    def _action(self, prediction):
+        action = prediction['a'].numpy()
         if action.shape == torch.Size([1, 1]): # If action is a single integer
-            action = np.int(action)
+            action = int(action.item())
         return action
 
     def clone(self, training=None):
@@ -113,6 +145,7 @@ class PPOAgent(Agent):
         return clone
 
 
+@rebuildable
 def build_PPO_Agent(task: regym.environments.Task, config: Dict[str, object], agent_name: str) -> PPOAgent:
     '''
     :param task: Environment specific configuration
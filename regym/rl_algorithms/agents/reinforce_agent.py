@@ -1,8 +1,11 @@
 from typing import Dict
 import copy
 
+import torch
+
 import regym
 from regym.rl_algorithms.agents import Agent
+from regym.rl_algorithms.checkpoint import rebuildable
 from regym.rl_algorithms.reinforce import ReinforceAlgorithm
 
 
@@ -22,6 +25,7 @@ class ReinforceAgent(Agent):
         self.episodes_before_update = episodes_before_update
         self.completed_episodes = 0
         self.trajectories = [[]]
+        self.ongoing_trajectories = {}  # Trajectories being sampled from vectorized environments, by env index
 
     def handle_experience(self, s, a, r, succ_s, done=False):
         '''
@@ -37,23 +41,59 @@ class ReinforceAgent(Agent):
         '''
         super(ReinforceAgent, self).handle_experience(s, a, r, succ_s, done)
         if not self.training: return
-        trajectory_index = self.completed_episodes % self.episodes_before_update
-        self.trajectories[trajectory_index].append((s, a, self.current_prediction['action_log_probability'], r, succ_s))
+        self.trajectories[-1].append((s, a, r, succ_s))
         if done:
-            self.completed_episodes += 1
-            if (self.completed_episodes % self.episodes_before_update) == 0:
-                self.algorithm.train(self.trajectories)
-                self.trajectories = []
             self.trajectories.append([])
+            self.complete_episodes(1)
+
+    def handle_multiple_experiences(self, states, actions, rewards, succ_states, dones):
+        '''
+        Processes one experience from each of many environments (i.e a vectorized
+        environment). A trajectory is kept for each environment, identified by its
+        index in the parameters of this function. An update is computed once
+        'episodes_before_update' trajectories have been completed across all environments,
+        in a single batched pass over all of them.
+        NOTE: Unless this agent's 'training' flag is set to True, this function will not do anything.
+
+        :param states:      Environment states, one for each environment
+        :param actions:     Actions taken by this agent at :param states:
+        :param rewards:     Rewards obtained by this agent after taking :param actions:
+        :param succ_states: Environment states reached after taking :param actions:
+        :param dones:       Whether the episode of each environment has finished
+        '''
+        if not self.training: return
+        self.handled_experiences += len(states)
+        completed_trajectories = []
+        for env_index, experience in enumerate(zip(states, actions, rewards, succ_states)):
+            self.ongoing_trajectories.setdefault(env_index, []).append(experience)
+            if dones[env_index]: completed_trajectories.append(self.ongoing_trajectories.pop(env_index))
+        if completed_trajectories != []:
+            self.trajectories[-1:-1] = completed_trajectories  # Keep the ongoing (sequential) trajectory last
+            self.complete_episodes(len(completed_trajectories))
+
+    def complete_episodes(self, num_episodes: int):
+        self.completed_episodes += num_episodes
+        if (len(self.trajectories) - 1) >= self.episodes_before_update:
+            self.algorithm.train(self.trajectories[:-1])
+            self.trajectories = self.trajectories[-1:]
 
     def take_action(self, state):
         '''
         :param state: Environment state
         :returns: Action to be executed by the environment conditioned on :param: state
         '''
-        self.current_prediction = self.algorithm.model(state)
+        with torch.no_grad():  # Log probabilities are recomputed in a single batch during training
+            self.current_prediction = self.algorithm.model(state)
         return self.current_prediction['action'].item()
 
+    def take_multiple_actions(self, states):
+        '''
+        :param states: Environment states, one for each of many environments
+        :returns: Actions to be executed in each environment, computed in a single forward pass
+        '''
+        with torch.no_grad():
+            return self.algorithm.model(states)['action'].numpy()
+
     def clone(self, training=True):
         '''
         :param training: Boolean specifying whether the newly cloned agent will be in training mode
@@ -66,6 +106,7 @@ class ReinforceAgent(Agent):
         return clone
 
 
+@rebuildable
 def build_Reinforce_Agent(task: regym.environments.Task, config: Dict[str, object], agent_name: str) -> ReinforceAgent:
     '''
     :param task: Task in which the agent will be able to act
@@ -76,10 +117,15 @@ def build_Reinforce_Agent(task: regym.environments.Task, config: Dict[str, objec
         - 'learning_rate':          Learning rate for the Neural Network optimizer. Recommended: 1.0e-4
         - 'episodes_before_update': Number of full environment episodes that will be sampled before computing a policy update. [1, infinity)
         - 'adam_eps':               Epsilon value used in denominator of Adam update computation. Recommended: 1.0e-5
+        - 'discount_factor':        (Optional) Discount factor used to compute returns. Default: 1.0
+        - 'use_baseline':           (Optional) Whether to subtract the mean return of each batch of trajectories
+                                    from all returns (variance reduction). Default: False
 
     :returns: Agent using Reinforce algorithm to act and learn in environments
     '''
     algorithm = ReinforceAlgorithm(policy_model_input_dim=task.observation_dim, policy_model_output_dim=task.action_dim,
-                                   learning_rate=config['learning_rate'], adam_eps=config['adam_eps'])
+                                   learning_rate=config['learning_rate'], adam_eps=config['adam_eps'],
+                                   discount_factor=config['discount_factor'] if 'discount_factor' in config else 1.,
+                                   use_baseline=config['use_baseline'] if 'use_baseline' in config else False)
     return ReinforceAgent(name=agent_name, episodes_before_update=config['episodes_before_update'],
                           algorithm=algorithm)
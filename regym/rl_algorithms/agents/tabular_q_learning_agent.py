@@ -1,8 +1,11 @@
 import copy
 from regym.rl_algorithms.TQL import TabularQLearningAlgorithm
 from regym.rl_algorithms.TQL import RepeatedUpdateQLearningAlgorithm
+from regym.rl_algorithms.TQL.util import RandomStream
+from regym.rl_algorithms.TQL.q_table import DenseQTable, SharedQTable, SparseQTable
 
 from regym.rl_algorithms.agents import Agent
+from regym.rl_algorithms.checkpoint import rebuildable
 
 class TabularQLearningAgent(Agent):
 
@@ -19,22 +22,63 @@ class TabularQLearningAgent(Agent):
         return self.algorithm.find_moves(state, exploration=self.training)
 
     def clone(self, training=None):
+        '''
+        If this agent's Q-table lives in shared memory (SharedQTable),
+        the clone gets a private snapshot of it, instead of sharing it.
+        '''
         clone = copy.deepcopy(self)
         clone.training = training
+        # Clones draw their own random numbers, instead of replaying the original's
+        clone.algorithm.random_stream = RandomStream()
         return clone
 
 
+@rebuildable
 def build_TabularQ_Agent(task, config, agent_name):
+    '''
+    :param task: Task in which the agent will be able to act
+    :param config: Dictionary whose entries contain hyperparameters for the tabular Q-learning agents:
+        - 'use_repeated_update_q_learning': (Bool) Whether to use Repeated Update Q-learning
+                                            (Boltzmann exploration) or Q-learning (epsilon greedy exploration)
+        - 'learning_rate': (Float in [0, 1])
+        - 'discount_factor': (Float in [0, 1])
+        - 'epsilon_greedy': (Float in [0, 1]) Only used by Q-learning
+        - 'temperature': (Float) Only used by Repeated Update Q-learning
+        - 'q_table_backend': (Str) Optional. Either 'dense' (default), which allocates a
+                             [state_space_size, action_space_size] array up front, 'sparse',
+                             which allocates Q-values lazily for visited states only, or 'shared',
+                             a dense table in shared memory, which can be updated by multiple
+                             worker processes at once (Hogwild). See regym.rl_algorithms.TQL.q_table
+        - 'q_table_capacity': (Int) Optional. Only for 'sparse' backend. Maximum number of
+                              states held in the Q-table (Least Recently Used eviction).
+    :param agent_name: String identifier for the agent
+    :returns: Tabular Q-learning agent
+    '''
     state_space_size, action_space_size = task.state_space_size, task.action_dim
     hash_state = task.hash_function
+    q_table = build_q_table(state_space_size, action_space_size, config)
     if config['use_repeated_update_q_learning']:
         algorithm = RepeatedUpdateQLearningAlgorithm(state_space_size, action_space_size, hash_state,
                                                      discount_factor=config['discount_factor'],
                                                      learning_rate=config['learning_rate'],
-                                                     temperature=config['temperature'])
+                                                     temperature=config['temperature'],
+                                                     q_table=q_table)
     else:
         algorithm = TabularQLearningAlgorithm(state_space_size, action_space_size, hash_state,
                                               discount_factor=config['discount_factor'],
                                               learning_rate=config['learning_rate'],
-                                              epsilon_greedy=config['epsilon_greedy'])
+                                              epsilon_greedy=config['epsilon_greedy'],
+                                              q_table=q_table)
     return TabularQLearningAgent(name=agent_name, algorithm=algorithm)
+
+
+def build_q_table(state_space_size, action_space_size, config):
+    backend = config['q_table_backend'] if 'q_table_backend' in config else 'dense'
+    if backend in ['dense', 'shared'] and 'q_table_capacity' in config:
+        raise ValueError('The hyperparameter \'q_table_capacity\' is only supported by the \'sparse\' Q-table backend')
+    if backend == 'dense': return DenseQTable(state_space_size, action_space_size)
+    if backend == 'shared': return SharedQTable(state_space_size, action_space_size)
+    if backend == 'sparse':
+        return SparseQTable(action_space_size, state_space_size=state_space_size,
+                            capacity=config['q_table_capacity'] if 'q_table_capacity' in config else None)
+    raise ValueError(f'Unknown Q-table backend \'{backend}\'. Choose between \'dense\', \'sparse\' and \'shared\'')
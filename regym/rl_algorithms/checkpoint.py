@@ -0,0 +1,577 @@
+'''
+Structured agent checkpoints. Instead of pickling whole agents
+(i.e torch.save(agent, path)), which stores optimizers, replay buffers
+and every other object reachable from an agent, a checkpoint is a single
+(uncompressed) zip archive holding separate members:
+
+    - config.json:  Small, human readable description of the agent
+                    (class, name, hyperparameters) and of the archive contents,
+                    including how to rebuild the agent: the build function, task and
+                    config it was built from (see rebuildable), and its scalar attributes.
+    - weights.pt:   state_dicts of the agent's neural networks and
+                    Q-tables. Loadable with torch.load(..., weights_only=True).
+    - optimizer.pt: (Optional) state_dicts of the agent's optimizers.
+    - buffers/*:    (Optional) Replay buffers / storages, split into shards.
+    - skeleton.pt:  Only for agents without a learning algorithm (i.e MixedStrategyAgent,
+                    MCTSAgent), which hold no state_dicts: the pickled agent.
+
+Loading a checkpoint rebuilds the agent from config.json and loads its weights,
+so that no algorithm object is ever unpickled. Only what is asked for is
+reconstructed: optimizer states and buffer contents are skipped by default,
+so that frozen agents (i.e self-play menagerie opponents) are cheap to store and to load.
+Checkpoints of format version 2 and earlier, which stored a pickled
+skeleton of every agent, can still be loaded.
+'''
+
+import io
+import os
+import copy
+import json
+import random
+import zipfile
+import inspect
+import functools
+import importlib
+from collections import OrderedDict
+from typing import Dict
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+from .replay_buffers import ReplayBuffer, PrioritizedReplayBuffer, Storage
+from .TQL.q_table import DenseQTable, SparseQTable
+from .TQL.util import RandomStream
+
+
+CHECKPOINT_FORMAT_VERSION = 3
+
+# Buffer attribute holding experiences, and attribute counting how many of them are valid
+_BUFFER_DATA_ATTRIBUTES = {ReplayBuffer: ('memory', 'current_size'),
+                           PrioritizedReplayBuffer: ('data', 'length')}
+_BUFFER_TYPES = (ReplayBuffer, PrioritizedReplayBuffer, Storage)
+# Fields of the Task an agent was built for which are stored in its checkpoints
+_TASK_FIELDS = ['name', 'state_space_size', 'action_space_size', 'observation_dim',
+                'observation_type', 'action_dim', 'action_type', 'num_agents']
+# Neural networks are loaded on CPU (see regym.rl_algorithms.AgentHook.unhook to move them)
+_UNRESTORED_ATTRIBUTES = ['use_cuda']
+
+
+def rebuildable(build_function):
+    '''
+    Decorator for agent build functions (build_X_Agent(task, config, agent_name)).
+    Records, on the algorithm of the agents they build, the build function,
+    task and config they were built from. Checkpoints store this record
+    instead of pickling the algorithm, and rebuild the agent from it when loaded.
+    '''
+    @functools.wraps(build_function)
+    def build(task, config, agent_name):
+        agent = build_function(task, config, agent_name)
+        agent.algorithm.build_spec = {'builder': [build_function.__module__, build_function.__qualname__],
+                                      'task': {**{field: getattr(task, field) for field in _TASK_FIELDS},
+                                               'env_type': task.env_type.value,
+                                               'has_hash_function': task.hash_function is not None},
+                                      'config': copy.deepcopy(config)}
+        return agent
+    return build
+
+
+def save_checkpoint(agent, path: str, save_optimizer: bool = True,
+                    save_buffers: bool = False, buffer_shard_size: int = 10000,
+                    fsync: bool = False):
+    '''
+    Saves :param: agent as a structured checkpoint at :param: path.
+    The checkpoint is first written to a temporary file, so that :param: path
+    never holds a partially written checkpoint.
+    See regym.rl_algorithms.AsyncCheckpointWriter to save checkpoints in the background.
+
+    :param agent: Agent to save. Neural networks, optimizers, replay buffers and
+                  dense Q-tables are looked for among the attributes of agent.algorithm
+                  (or agent.policy_agent.algorithm for agents wrapping another agent,
+                  i.e FrozenPolicyAgent)
+    :param path: File path where the checkpoint will be written
+    :param save_optimizer: Whether to store the state of the agent's optimizers
+    :param save_buffers: Whether to store the contents of the agent's replay buffers / storages
+    :param buffer_shard_size: Maximum number of experiences stored in each buffer shard
+    :param fsync: Whether to wait for the checkpoint to be physically written to disk
+    '''
+    config, members = _snapshot_checkpoint(agent, save_optimizer, save_buffers, buffer_shard_size)
+    _write_checkpoint(path, config, members, fsync)
+
+
+def _snapshot_checkpoint(agent, save_optimizer: bool, save_buffers: bool,
+                         buffer_shard_size: int, copy_tensors: bool = False):
+    '''
+    Gathers everything save_checkpoint writes to disk. Neural network weights and
+    optimizer states are kept as (CPU) tensors, serialized by _write_checkpoint,
+    while the rest of the members are serialized right away.
+
+    :param copy_tensors: Whether tensors have to be copied, so that the
+                         snapshot is unaffected by further updates to :param: agent
+    :returns: Checkpoint config, dictionary of archive member name to content
+    '''
+    if buffer_shard_size <= 0:
+        raise ValueError('Parameter \'buffer_shard_size\' must be a strictly positive integer')
+    modules, optimizers, buffers, q_tables = _agent_components(agent)
+    config = _checkpoint_config(agent, modules, optimizers, buffers, q_tables)
+    config['optimizer_states_saved'] = save_optimizer
+
+    members = {'weights.pt': _weights(modules, q_tables, _sparse_q_tables(agent), copy_tensors=copy_tensors)}
+    if save_optimizer:
+        optimizer_states = {name: optimizer.state_dict() for name, optimizer in optimizers.items()
+                            if config['optimizers'][name] is not None}
+        members['optimizer.pt'] = copy.deepcopy(optimizer_states) if copy_tensors else optimizer_states
+    if save_buffers:
+        for name, buffer in buffers.items():
+            buffer_members = _buffer_shards(name, buffer, buffer_shard_size)
+            config['buffers'][name]['shards'] = list(buffer_members)
+            members.update(buffer_members)
+    if config['build'] is None: members['skeleton.pt'] = _serialize(agent)
+    return config, members
+
+
+def _write_checkpoint(path: str, config: Dict, members: Dict, fsync: bool = False):
+    temporary_path = f'{path}.tmp'
+    with open(temporary_path, 'wb') as f:
+        with zipfile.ZipFile(f, 'w', compression=zipfile.ZIP_STORED) as archive:
+            archive.writestr('config.json', json.dumps(config, indent=2))
+            for member, content in members.items():
+                archive.writestr(member, content if isinstance(content, bytes) else _serialize(content))
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(temporary_path, path)
+
+
+def load_checkpoint(path: str, load_optimizer: bool = False, load_buffers: bool = False):
+    '''
+    Reconstructs the agent stored at :param: path, rebuilding it with the build function
+    it was built with (see rebuildable). Neural networks are loaded on CPU.
+    Optimizers are always recreated (empty), and replay buffers / storages are
+    recreated empty unless their contents are requested.
+    The environment of the agent's task must be registered (i.e its package imported)
+    to load agents whose task has a hash function (i.e Tabular Q-learning agents).
+
+    :param path: Path to a structured checkpoint (see save_checkpoint)
+    :param load_optimizer: Whether to restore the state of the agent's optimizers
+    :param load_buffers: Whether to restore the contents of the agent's replay buffers / storages
+    :returns: Agent stored in :param: path
+    '''
+    with zipfile.ZipFile(path, 'r') as archive:
+        config = json.loads(archive.read('config.json'))
+        agent = _rebuild_agent(config) if config.get('build') is not None else _deserialize(archive.read('skeleton.pt'))
+        if config['algorithm_class'] is None: return agent
+
+        weights = _deserialize(archive.read('weights.pt'), weights_only=True)
+        optimizer_states = _deserialize(archive.read('optimizer.pt'), weights_only=True) \
+                           if load_optimizer and config['optimizer_states_saved'] else {}
+        _restore_components(agent, config, weights, optimizer_states)
+
+        algorithm = _algorithm_owner(agent).algorithm
+        for name, spec in config['buffers'].items():
+            if load_buffers and len(spec['shards']) > 0:
+                _restore_buffer(getattr(algorithm, name), [_deserialize(archive.read(shard)) for shard in spec['shards']])
+    return agent
+
+
+def weights_only_copy(agent, training: bool = False, trainable: bool = True):
+    '''
+    Copies :param: agent without copying the state of its optimizers or the
+    contents of its replay buffers / storages, which are recreated empty.
+    The copy shares no state with :param: agent. Its neural networks live
+    on the same device as those of :param: agent.
+    Much cheaper than agent.clone() for agents with large replay buffers,
+    and sufficient for frozen agents (i.e self-play opponents).
+
+    :param training: Training flag of the copy
+    :param trainable: If False, optimizers and replay buffers / storages
+                      are not recreated (they are set to None), and the copy
+                      can only be used to act.
+    '''
+    modules, optimizers, buffers, q_tables = _agent_components(agent)
+    if not hasattr(_algorithm_owner(agent), 'algorithm'):
+        copied_agent = copy.deepcopy(agent)
+    else:
+        copied_agent = copy.deepcopy(_skeleton(agent, modules, optimizers, buffers, q_tables))
+        algorithm = _algorithm_owner(copied_agent).algorithm
+        for name, module in modules.items():
+            device = next(module.parameters()).device if len(list(module.parameters())) > 0 else 'cpu'
+            getattr(algorithm, name).to_empty(device=device).load_state_dict(module.state_dict())
+        for name, q_table in q_tables.items():
+            copied_q_table = DenseQTable.__new__(DenseQTable)
+            copied_q_table.table = np.array(q_table)
+            setattr(algorithm, name, copied_q_table)
+        for name, optimizer in optimizers.items():
+            if trainable: setattr(algorithm, name, _recreate_optimizer(_optimizer_spec(optimizer, modules), algorithm))
+        for name in buffers:
+            if trainable: _reset_buffer(getattr(algorithm, name))
+            else: setattr(algorithm, name, None)
+    copied_agent.training = training
+    return copied_agent
+
+
+def read_checkpoint_config(path: str) -> Dict:
+    '''
+    :returns: Configuration (config.json) of the checkpoint at :param: path,
+              without loading anything else
+    '''
+    with zipfile.ZipFile(path, 'r') as archive:
+        return json.loads(archive.read('config.json'))
+
+
+def is_checkpoint(path: str) -> bool:
+    '''
+    :returns: Whether :param: path holds a structured checkpoint,
+              as opposed to i.e a whole agent pickled with torch.save
+    '''
+    if not zipfile.is_zipfile(path): return False
+    with zipfile.ZipFile(path, 'r') as archive:
+        return 'config.json' in archive.namelist()
+
+
+def _agent_components(agent):
+    '''
+    :returns: Neural networks, optimizers, replay buffers / storages and dense
+              Q-tables of :param: agent, as dictionaries of attribute name of
+              agent.algorithm to object
+    '''
+    owner = _algorithm_owner(agent)
+    attributes = vars(owner.algorithm) if hasattr(owner, 'algorithm') else {}
+    modules = {name: value for name, value in attributes.items() if isinstance(value, nn.Module)}
+    optimizers = {name: value for name, value in attributes.items() if isinstance(value, torch.optim.Optimizer)}
+    buffers = {name: value for name, value in attributes.items() if isinstance(value, _BUFFER_TYPES)}
+    q_tables = {name: value for name, value in attributes.items() if isinstance(value, DenseQTable)}
+    return modules, optimizers, buffers, q_tables
+
+
+def _sparse_q_tables(agent) -> Dict:
+    '''
+    :returns: Sparse Q-tables of :param: agent, keyed by their attribute name of agent.algorithm
+    '''
+    owner = _algorithm_owner(agent)
+    attributes = vars(owner.algorithm) if hasattr(owner, 'algorithm') else {}
+    return {name: value for name, value in attributes.items() if isinstance(value, SparseQTable)}
+
+
+def _weights(modules, q_tables, sparse_q_tables=None, copy_tensors: bool = False) -> Dict:
+    '''
+    :returns: CPU state_dicts of :param: modules, copies of the tables of :param: q_tables
+              and the visited states and Q-values of :param: sparse_q_tables, in least
+              recently used order, keyed by their attribute name of agent.algorithm.
+              Tensors already on CPU are only copied if :param: copy_tensors is set.
+    :raises ValueError: If the states of a sparse Q-table are not integers
+    '''
+    weights = {name: {k: v.detach().to('cpu', copy=copy_tensors) for k, v in module.state_dict().items()}
+               for name, module in modules.items()}
+    weights.update({name: torch.from_numpy(np.array(q_table)) for name, q_table in q_tables.items()})
+    for name, q_table in (sparse_q_tables or {}).items():
+        if not all(isinstance(s, (int, np.integer)) for s in q_table.table):
+            raise ValueError(f'Sparse Q-table \'{name}\' can only be checkpointed if its states are integers')
+        values = np.array(list(q_table.table.values()), dtype=np.float64).reshape(-1, q_table.action_space_size)
+        weights[name] = {'states': torch.tensor(list(q_table.table), dtype=torch.int64),
+                         'values': torch.from_numpy(values)}
+    return weights
+
+
+def _checkpoint_config(agent, modules, optimizers, buffers, q_tables) -> Dict:
+    algorithm = _algorithm_owner(agent).algorithm if hasattr(_algorithm_owner(agent), 'algorithm') else None
+    sparse_q_tables = _sparse_q_tables(agent)
+    build = _build_spec(algorithm, stateful=any([modules, optimizers, buffers, q_tables, sparse_q_tables]))
+    return {'format_version': CHECKPOINT_FORMAT_VERSION,
+            'agent_class': type(agent).__name__,
+            'algorithm_class': type(algorithm).__name__ if algorithm is not None else None,
+            'name': agent.name,
+            'training': agent.training,
+            'hyperparameters': _json_hyperparameters(algorithm),
+            'build': build,
+            'agent_state': _scalar_attributes(_algorithm_owner(agent)) if build is not None else {},
+            'algorithm_state': _scalar_attributes(algorithm) if build is not None else {},
+            'wrapper': _wrapper_spec(agent) if build is not None else None,
+            'modules': list(modules),
+            'q_tables': list(q_tables),
+            'sparse_q_tables': list(sparse_q_tables),
+            'random_streams': {name: value.state_dict() for name, value in vars(algorithm).items()
+                               if isinstance(value, RandomStream)} if build is not None else {},
+            'optimizers': {name: _optimizer_spec(optimizer, modules) for name, optimizer in optimizers.items()},
+            'optimizer_states_saved': False,
+            'buffers': {name: {'class': type(buffer).__name__, 'shards': []} for name, buffer in buffers.items()}}
+
+
+def _build_spec(algorithm, stateful: bool) -> Dict:
+    '''
+    :param stateful: Whether :param: algorithm holds neural networks, optimizers, buffers or Q-tables
+    :returns: Build function, task and config :param: algorithm was built from (see rebuildable),
+              None for agents without a learning algorithm (i.e MCTS search functions)
+    :raises ValueError: If they were not recorded for a stateful algorithm, or the config cannot be stored as json
+    '''
+    if algorithm is None or (not stateful and not hasattr(algorithm, 'build_spec')): return None
+    if not hasattr(algorithm, 'build_spec'):
+        raise ValueError(f'{type(algorithm).__name__} was not built by a build function decorated with rebuildable, '
+                         'so it cannot be rebuilt from a checkpoint')
+    try: json.dumps(algorithm.build_spec)
+    except TypeError as e:
+        raise ValueError(f'The config {type(algorithm).__name__} was built from cannot be stored as json: {e}')
+    return algorithm.build_spec
+
+
+def _scalar_attributes(obj) -> Dict:
+    '''
+    :returns: Attributes of :param: obj holding scalars (i.e counters, flags, hyperparameters)
+    '''
+    return {k: v for k, v in vars(obj).items() if v is None or isinstance(v, (bool, int, float, str))}
+
+
+def _wrapper_spec(agent) -> Dict:
+    '''
+    :returns: For agents wrapping another agent (i.e FrozenPolicyAgent), their class
+              and the arguments, other than the name and wrapped agent, they were created with
+    '''
+    if not hasattr(agent, 'policy_agent'): return None
+    parameters = inspect.signature(type(agent).__init__).parameters
+    return {'class': [type(agent).__module__, type(agent).__qualname__],
+            'kwargs': {k: getattr(agent, k) for k in parameters
+                       if k not in ['self', 'name', 'policy_agent'] and hasattr(agent, k)}}
+
+
+def _rebuild_agent(config: Dict):
+    '''
+    Builds an agent like the one described by :param: config, with the build function,
+    task and config it was built from, on CPU, and restores its scalar attributes.
+    Its neural networks and Q-tables are then loaded with _restore_components.
+    Building (i.e initializing neural networks) does not affect the global random states.
+    '''
+    build = config['build']
+    builder = _import_class(*build['builder'])
+    if builder is None: raise ValueError(f'Build function {".".join(build["builder"])} cannot be imported')
+    build_config = copy.deepcopy(build['config'])
+    if 'use_cuda' in build_config: build_config['use_cuda'] = False
+
+    numpy_state, python_state = np.random.get_state(), random.getstate()
+    with torch.random.fork_rng(devices=[]):
+        agent = builder(_rebuild_task(build['task']), build_config, config['name'])
+    np.random.set_state(numpy_state)
+    random.setstate(python_state)
+
+    for obj, state in [(agent, config['agent_state']), (agent.algorithm, config['algorithm_state'])]:
+        for k, v in state.items():
+            if k not in _UNRESTORED_ATTRIBUTES: setattr(obj, k, v)
+    if config['wrapper'] is not None:
+        if config['wrapper']['kwargs'].get('half_precision', False):
+            from .agents.frozen_policy_agent import _convert_to_half_precision
+            _convert_to_half_precision(agent)
+        wrapper_class = _import_class(*config['wrapper']['class'])
+        if wrapper_class is None: raise ValueError(f'Agent class {".".join(config["wrapper"]["class"])} cannot be imported')
+        agent = wrapper_class(name=config['name'], policy_agent=agent, **config['wrapper']['kwargs'])
+    agent.training = config['training']
+    return agent
+
+
+def _rebuild_task(spec: Dict):
+    '''
+    :returns: Task described by :param: spec (see rebuildable). Its environment is only
+              created if the task has a hash function, which it takes from its environment.
+    '''
+    from regym.environments import Task, EnvType
+    if spec['has_hash_function']: return _generate_task(spec['name'], spec['env_type'])
+    return Task(env=None, env_type=EnvType(spec['env_type']), hash_function=None,
+                **{field: spec[field] for field in _TASK_FIELDS})
+
+
+@functools.lru_cache(maxsize=None)
+def _generate_task(name: str, env_type: str):
+    from regym.environments import generate_task, EnvType
+    return generate_task(name, EnvType(env_type))
+
+
+def _restore_components(agent, config, weights, optimizer_states):
+    '''
+    Materializes, on CPU, the neural networks and Q-tables of the (rebuilt
+    or skeleton) :param: agent from :param: weights, recreates its optimizers
+    (restoring those present in :param: optimizer_states) and empties its
+    replay buffers / storages.
+    '''
+    algorithm = _algorithm_owner(agent).algorithm
+    for name in config['modules']:
+        module = getattr(algorithm, name).to_empty(device='cpu')
+        module.load_state_dict(weights[name])
+    for name in config['q_tables']:
+        q_table = DenseQTable.__new__(DenseQTable)
+        q_table.table = weights[name].numpy()
+        setattr(algorithm, name, q_table)
+    # Sparse Q-tables and random streams were pickled before format version 3
+    for name in config.get('sparse_q_tables', []):
+        getattr(algorithm, name).table = OrderedDict(zip(weights[name]['states'].tolist(), weights[name]['values'].numpy().copy()))
+    for name, state_dict in config.get('random_streams', {}).items():
+        getattr(algorithm, name).load_state_dict(state_dict)
+    for name, spec in config['optimizers'].items():
+        if spec is None: continue  # Optimizers that could not be recreated before format version 2
+        optimizer = _recreate_optimizer(spec, algorithm)
+        if name in optimizer_states: optimizer.load_state_dict(optimizer_states[name])
+        setattr(algorithm, name, optimizer)
+    for name in config['buffers']:
+        _reset_buffer(getattr(algorithm, name))
+
+
+def _skeleton(agent, modules, optimizers, buffers, q_tables):
+    '''
+    Shallow copy of :param: agent (and of its algorithm) whose neural networks
+    hold no data ('meta' device) and whose optimizers, buffers and Q-tables
+    are left out, to be copied separately (see weights_only_copy).
+    '''
+    if not hasattr(_algorithm_owner(agent), 'algorithm'): return agent
+    skeleton = copy.copy(agent)
+    if hasattr(agent, 'policy_agent'): skeleton.policy_agent = copy.copy(agent.policy_agent)
+    owner = _algorithm_owner(skeleton)
+    owner.algorithm = copy.copy(owner.algorithm)
+    for name, module in modules.items():
+        setattr(owner.algorithm, name, _meta_copy(module))
+    for name in list(optimizers) + list(q_tables):
+        setattr(owner.algorithm, name, None)
+    for name, buffer in buffers.items():
+        setattr(owner.algorithm, name, _empty_copy(buffer))
+    return skeleton
+
+
+def _algorithm_owner(agent):
+    '''
+    :returns: Agent holding the algorithm of :param: agent,
+              which is wrapped by agents such as FrozenPolicyAgent
+    '''
+    return agent.policy_agent if hasattr(agent, 'policy_agent') else agent
+
+
+def _meta_copy(module: nn.Module) -> nn.Module:
+    '''
+    Copies :param: module without copying the data of its tensors, which are
+    replaced by tensors on the 'meta' device. This preserves the architecture of
+    the module, which can be materialized again with nn.Module.to_empty
+    '''
+    memo = {}
+    for parameter in module.parameters():
+        memo[id(parameter)] = nn.Parameter(torch.empty_like(parameter, device='meta'),
+                                           requires_grad=parameter.requires_grad)
+    for buffer in module.buffers():
+        memo[id(buffer)] = torch.empty_like(buffer, device='meta')
+    return copy.deepcopy(module, memo)
+
+
+def _empty_copy(buffer):
+    empty = copy.copy(buffer)
+    if isinstance(buffer, Storage): empty.reset()
+    elif type(buffer) in _BUFFER_DATA_ATTRIBUTES:
+        empty.__dict__ = {k: v for k, v in vars(buffer).items() if not isinstance(v, np.ndarray)}
+    return empty
+
+
+def _reset_buffer(buffer):
+    if isinstance(buffer, Storage): buffer.reset()
+    elif isinstance(buffer, PrioritizedReplayBuffer): buffer.__init__(capacity=buffer.capacity, alpha=buffer.alpha, beta=buffer.beta)
+    elif isinstance(buffer, ReplayBuffer): buffer.__init__(capacity=buffer.capacity)
+
+
+def _buffer_shards(name, buffer, shard_size) -> Dict[str, bytes]:
+    '''
+    Splits :param: buffer into shards of at most :param: shard_size experiences.
+    The first shard holds the buffer's bookkeeping state.
+    '''
+    if type(buffer) not in _BUFFER_DATA_ATTRIBUTES:
+        return {f'buffers/{name}/shard_00000.pt': _serialize(dict(vars(buffer)))}
+    data_attribute, size_attribute = _BUFFER_DATA_ATTRIBUTES[type(buffer)]
+    state = {k: v for k, v in vars(buffer).items() if k != data_attribute}
+    data = getattr(buffer, data_attribute)[:getattr(buffer, size_attribute)]
+    chunks = [data[i:i + shard_size] for i in range(0, len(data), shard_size)]
+    shards = [state] + [list(chunk) for chunk in chunks]
+    return {f'buffers/{name}/shard_{i:05d}.pt': _serialize(shard) for i, shard in enumerate(shards)}
+
+
+def _restore_buffer(buffer, shards):
+    state, chunks = shards[0], shards[1:]
+    if type(buffer) not in _BUFFER_DATA_ATTRIBUTES:
+        buffer.__dict__.update(state)
+        return
+    data_attribute, _ = _BUFFER_DATA_ATTRIBUTES[type(buffer)]
+    buffer.__dict__.update(state)
+    data = np.zeros(buffer.capacity, dtype=object)
+    experiences = (experience for chunk in chunks for experience in chunk)
+    for i, experience in enumerate(experiences): data[i] = experience  # Experiences are tuples, which numpy would unpack
+    setattr(buffer, data_attribute, data)
+
+
+def _optimizer_spec(optimizer, modules):
+    '''
+    :returns: Information required to recreate :param: optimizer: the module
+              and qualified name of its class, its defaults and, for each of its parameter groups,
+              its hyperparameters and the (module name, parameter name)
+              of each of its parameters, in order.
+    :raises ValueError: If :param: optimizer cannot be recreated, because its class
+                        cannot be imported by name (i.e it is defined inside a function)
+                        or it optimizes tensors which are not parameters of :param: modules
+    '''
+    optimizer_class = type(optimizer)
+    class_path = f'{optimizer_class.__module__}.{optimizer_class.__qualname__}'
+    if _import_class(optimizer_class.__module__, optimizer_class.__qualname__) is not optimizer_class:
+        raise ValueError(f'Optimizer class {class_path} cannot be imported by name, so it cannot be recreated from a checkpoint')
+    parameter_names = {id(p): [module_name, parameter_name]
+                       for module_name, module in modules.items()
+                       for parameter_name, p in module.named_parameters()}
+    param_groups = []
+    for group in optimizer.param_groups:
+        if not all(id(p) in parameter_names for p in group['params']):
+            raise ValueError(f'Optimizer {class_path} optimizes tensors which are not parameters of the agent\'s neural networks {list(modules)}')
+        param_groups.append({**{k: v for k, v in group.items() if k != 'params' and _is_json_serializable(v)},
+                             'params': [parameter_names[id(p)] for p in group['params']]})
+    return {'class_module': optimizer_class.__module__, 'class': optimizer_class.__qualname__,
+            'param_groups': param_groups,
+            'defaults': {k: v for k, v in optimizer.defaults.items() if _is_json_serializable(v)}}
+
+
+def _recreate_optimizer(spec, algorithm) -> torch.optim.Optimizer:
+    '''
+    :returns: Empty optimizer described by :param: spec (see _optimizer_spec),
+              over the parameters of the neural networks of :param: algorithm
+    '''
+    if 'module' in spec:  # Format version 1: torch.optim class over a single module
+        return getattr(torch.optim, spec['class'])(getattr(algorithm, spec['module']).parameters(), **spec['defaults'])
+    module_names = {module_name for group in spec['param_groups'] for module_name, _ in group['params']}
+    parameters = {(module_name, parameter_name): p
+                  for module_name in module_names
+                  for parameter_name, p in getattr(algorithm, module_name).named_parameters()}
+    param_groups = [{**{k: v for k, v in group.items() if k != 'params'},
+                     'params': [parameters[tuple(name)] for name in group['params']]}
+                    for group in spec['param_groups']]
+    return _import_class(spec['class_module'], spec['class'])(param_groups, **spec['defaults'])
+
+
+def _import_class(module_path: str, qualified_name: str):
+    '''
+    :returns: Class (or function) named :param: qualified_name in module :param: module_path,
+              None if it cannot be imported
+    '''
+    try: obj = importlib.import_module(module_path)
+    except ImportError: return None
+    for attribute in qualified_name.split('.'):
+        obj = getattr(obj, attribute, None)
+    return obj
+
+
+def _json_hyperparameters(algorithm):
+    if algorithm is None: return {}
+    candidates = {k: v for k, v in vars(algorithm).items() if k != 'build_spec'}
+    if isinstance(candidates.get('kwargs'), dict): candidates.update(candidates['kwargs'])
+    return {k: v for k, v in candidates.items() if _is_json_serializable(v)}
+
+
+def _is_json_serializable(value):
+    if value is None or isinstance(value, (bool, int, float, str)): return True
+    if isinstance(value, (tuple, list)): return all(map(_is_json_serializable, value))
+    return False
+
+
+def _serialize(obj) -> bytes:
+    buffer = io.BytesIO()
+    torch.save(obj, buffer)
+    return buffer.getvalue()
+
+
+def _deserialize(content: bytes, weights_only=False):
+    return torch.load(io.BytesIO(content), map_location='cpu', weights_only=weights_only)
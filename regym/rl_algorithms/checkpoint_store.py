@@ -0,0 +1,366 @@
+'''
+Deduplicated, delta-compressed store of agent checkpoints, meant for
+self-play menageries, where consecutive snapshots of the agent being
+trained differ only slightly. A store is a directory holding:
+
+    - objects/*:    Content addressed blobs (named after the SHA-256 of their
+                    content). Each tensor is stored once, no matter
+                    how many snapshots it belongs to.
+    - snapshots/*:  One small json manifest per stored agent, holding the config
+                    its agent is rebuilt from (see regym.rl_algorithms.checkpoint)
+                    and listing the blobs needed to reconstruct each of its tensors.
+
+Tensors which changed since the last base snapshot can optionally be
+stored as a difference against the same tensor of that base snapshot:
+
+    - 'xor':        Lossless. Bitwise XOR against the base tensor, zlib compressed.
+                    Slightly updated floats share their sign, exponent and
+                    leading mantissa bits with the base, which XOR to zero.
+    - 'quantized':  Lossy. Difference against the base tensor, quantized to
+                    :param: quantization_bits bits per element and zlib compressed.
+
+Differences are always taken against a full (base) snapshot, never against
+another difference, so reconstructing any snapshot reads at most two blobs
+per tensor, regardless of the number of snapshots in the store.
+
+Objects are shared between snapshots, so overwriting or deleting a snapshot
+does not remove the objects it pointed to. CheckpointStore.gc removes the
+objects which no snapshot (nor the current base snapshot) points to anymore.
+'''
+
+import os
+import json
+import zlib
+import hashlib
+import threading
+from typing import Dict, List
+
+import numpy as np
+import torch
+
+from .checkpoint import _agent_components, _sparse_q_tables, _weights, _rebuild_agent
+from .checkpoint import _checkpoint_config, _restore_components, _serialize, _deserialize
+
+STORE_FORMAT_VERSION = 2
+DELTA_ENCODINGS = [None, 'xor', 'quantized']
+
+
+class CheckpointStore():
+
+    def __init__(self, path: str, delta_encoding: str = None,
+                 base_interval: int = 10, quantization_bits: int = 8,
+                 compression_level: int = 6):
+        '''
+        :param path: Directory holding the store. Created if it does not exist.
+                     Snapshots already in it can be loaded and are deduplicated against.
+        :param delta_encoding: How tensors which differ from those of the base snapshot
+                               are stored. One of:
+                                   - None: Whole tensors (only unchanged tensors are deduplicated)
+                                   - 'xor': Lossless, compressed bitwise difference against the base snapshot
+                                   - 'quantized': Lossy, quantized difference against the base snapshot
+        :param base_interval: Number of snapshots stored as differences against a base snapshot
+                              before the next snapshot is stored whole, becoming the new base
+        :param quantization_bits: Bits per element used by the 'quantized' encoding (2-16)
+        :param compression_level: zlib compression level (0-9) used to compress differences
+        '''
+        if delta_encoding not in DELTA_ENCODINGS:
+            raise ValueError(f'Parameter \'delta_encoding\' should be one of {DELTA_ENCODINGS}')
+        if not base_interval > 0:
+            raise ValueError('Parameter \'base_interval\' must be a strictly positive integer')
+        if not 2 <= quantization_bits <= 16:
+            raise ValueError('Parameter \'quantization_bits\' must lie in [2, 16]')
+        self.path = path
+        self.delta_encoding = delta_encoding
+        self.base_interval = base_interval
+        self.quantization_bits = quantization_bits
+        self.compression_level = compression_level
+        self.lock = threading.Lock()
+
+        self.base_tensors = {}              # tensor name -> (tensor, entry) of the current base snapshot
+        self.snapshots_since_base = None    # None until a base snapshot is written
+        self.bytes_written = 0
+        os.makedirs(f'{path}/objects', exist_ok=True)
+        os.makedirs(f'{path}/snapshots', exist_ok=True)
+        self.entries = self._read_entries()  # tensor content hash -> entry, for deduplication
+
+    def save(self, agent, key: str) -> str:
+        '''
+        Stores the neural networks, Q-tables and config of :param: agent
+        under :param: key, overwriting any snapshot previously stored under it.
+        Optimizer states and replay buffers are not stored.
+
+        :param agent: Agent to store
+        :param key: Identifier of the snapshot (i.e 'checkpoint_episode_10').
+                    Must be usable as a file name.
+        :returns: :param: key
+        '''
+        if not key or os.sep in key:
+            raise ValueError(f'Parameter \'key\' must be a non empty file name. Got: \'{key}\'')
+        modules, optimizers, buffers, q_tables = _agent_components(agent)
+        with self.lock:
+            new_base = self.delta_encoding is None or self.snapshots_since_base is None \
+                       or self.snapshots_since_base >= self.base_interval
+            if new_base: self.base_tensors = {}
+
+            manifest_weights = {}
+            for name, weights in _weights(modules, q_tables, _sparse_q_tables(agent)).items():
+                if isinstance(weights, torch.Tensor):
+                    manifest_weights[name] = self._store_tensor(name, weights, new_base)
+                else:
+                    manifest_weights[name] = {k: self._store_tensor(f'{name}.{k}', v, new_base) for k, v in weights.items()}
+
+            config = _checkpoint_config(agent, modules, optimizers, buffers, q_tables)
+            manifest = {'format_version': STORE_FORMAT_VERSION,
+                        'config': config,
+                        'weights': manifest_weights,
+                        'base': new_base}
+            # Only agents without a learning algorithm are pickled (see regym.rl_algorithms.checkpoint)
+            if config['build'] is None: manifest['skeleton'] = self._store_blob(_serialize(agent))
+            self._write_atomically(self._manifest_path(key), json.dumps(manifest).encode())
+            self.snapshots_since_base = 0 if new_base else self.snapshots_since_base + 1
+        return key
+
+    def load(self, key: str):
+        '''
+        Reconstructs the agent stored under :param: key. Neural networks are
+        loaded on CPU, optimizers are recreated (empty) and replay buffers /
+        storages are empty. Thread safe, and independent of how many
+        snapshots the store holds.
+
+        :param key: Identifier of the snapshot, as passed to CheckpointStore.save
+        :returns: Agent stored under :param: key
+        '''
+        with open(self._manifest_path(key), 'r') as f: manifest = json.load(f)
+        config = manifest['config']
+        agent = _rebuild_agent(config) if config.get('build') is not None else _deserialize(self._read_blob(manifest['skeleton']))
+        if config['algorithm_class'] is None: return agent
+
+        weights = {}
+        for name, entries in manifest['weights'].items():
+            if name in config['q_tables']: weights[name] = self._load_tensor(entries)
+            else: weights[name] = {k: self._load_tensor(entry) for k, entry in entries.items()}
+        _restore_components(agent, config, weights, optimizer_states={})
+        return agent
+
+    def hook(self, agent, key: str):
+        '''
+        Stores :param: agent under :param: key.
+
+        :returns: StoredAgent handle, which menageries (see regym.training_schemes.Menagerie)
+                  use to load the agent back lazily
+        '''
+        return StoredAgent(self, self.save(agent, key), agent.name)
+
+    def delete(self, key: str):
+        '''
+        Removes the snapshot stored under :param: key. The objects it pointed
+        to are only removed from disk by CheckpointStore.gc.
+        '''
+        with self.lock: os.remove(self._manifest_path(key))
+
+    def gc(self) -> int:
+        '''
+        Removes the objects which are not needed to reconstruct any snapshot
+        of the store, i.e those only pointed to by overwritten or deleted snapshots.
+        Objects of the current base snapshot are kept, as later snapshots
+        may be stored as differences against them.
+
+        :returns: Number of bytes freed on disk
+        '''
+        with self.lock:
+            referenced = {entry['object'] for _, entry in self.base_tensors.values()}
+            for key in self.keys():
+                with open(self._manifest_path(key), 'r') as f: manifest = json.load(f)
+                if 'skeleton' in manifest: referenced.add(manifest['skeleton'])
+                for entry in _manifest_entries(manifest):
+                    referenced.update(entry[k] for k in ['object', 'base'] if k in entry)
+
+            freed_bytes = 0
+            for content_hash in os.listdir(f'{self.path}/objects'):
+                # Temporary files belong to objects still being written
+                if content_hash in referenced or content_hash.endswith('.tmp'): continue
+                freed_bytes += os.path.getsize(self._object_path(content_hash))
+                os.remove(self._object_path(content_hash))
+            # Removed objects can't be used to deduplicate tensors anymore
+            self.entries = {content_hash: entry for content_hash, entry in self.entries.items()
+                            if all(entry[k] in referenced for k in ['object', 'base'] if k in entry)}
+        return freed_bytes
+
+    def keys(self) -> List[str]:
+        return sorted(f[:-len('.json')] for f in os.listdir(f'{self.path}/snapshots') if f.endswith('.json'))
+
+    def disk_usage(self) -> int:
+        '''
+        :returns: Bytes used on disk by all objects and snapshot manifests in the store
+        '''
+        return sum(os.path.getsize(f'{self.path}/{directory}/{f}')
+                   for directory in ['objects', 'snapshots'] for f in os.listdir(f'{self.path}/{directory}'))
+
+    def _store_tensor(self, name: str, tensor: torch.Tensor, new_base: bool) -> Dict:
+        '''
+        Stores :param: tensor, unless an identical tensor is already stored.
+        Unless :param: new_base is set, changed tensors are stored as a difference
+        against the tensor named :param: name of the current base snapshot.
+
+        :returns: Manifest entry describing how to reconstruct :param: tensor
+        '''
+        raw = _tensor_bytes(tensor)
+        content_hash = _hash(raw, _dtype_name(tensor), list(tensor.shape))
+        base = self.base_tensors.get(name)
+
+        if content_hash in self.entries and (not new_base or self.entries[content_hash]['encoding'] == 'raw'):
+            entry = self.entries[content_hash]
+        elif new_base or base is None or base[0].shape != tensor.shape or base[0].dtype != tensor.dtype:
+            entry = self._raw_entry(raw, tensor, content_hash)
+        else:
+            entry = self._delta_entry(raw, tensor, content_hash, *base)
+        # Copied, as CPU tensors share memory with the parameters being trained
+        if new_base: self.base_tensors[name] = (tensor.clone(), entry)
+        self.entries.setdefault(content_hash, entry)
+        return entry
+
+    def _raw_entry(self, raw: bytes, tensor: torch.Tensor, content_hash: str) -> Dict:
+        return {'encoding': 'raw', 'object': self._store_blob(raw), 'hash': content_hash,
+                'dtype': _dtype_name(tensor), 'shape': list(tensor.shape)}
+
+    def _delta_entry(self, raw: bytes, tensor: torch.Tensor, content_hash: str,
+                     base_tensor: torch.Tensor, base_entry: Dict) -> Dict:
+        entry = {'hash': content_hash, 'dtype': _dtype_name(tensor), 'shape': list(tensor.shape), 'base': base_entry['object']}
+        if self.delta_encoding == 'quantized' and tensor.is_floating_point():
+            difference = tensor.double() - base_tensor.double()
+            levels = 2 ** (self.quantization_bits - 1) - 1
+            scale = difference.abs().max().item() / levels
+            quantized = torch.round(difference / scale) if scale > 0 else torch.zeros_like(difference)
+            delta = quantized.to(torch.int8 if self.quantization_bits <= 8 else torch.int16)
+            entry.update({'encoding': 'quantized', 'scale': scale, 'delta_dtype': _dtype_name(delta)})
+            delta_bytes = _tensor_bytes(delta)
+        else:
+            entry['encoding'] = 'xor'
+            delta_bytes = np.bitwise_xor(np.frombuffer(raw, dtype=np.uint8),
+                                         np.frombuffer(_tensor_bytes(base_tensor), dtype=np.uint8)).tobytes()
+        compressed = zlib.compress(delta_bytes, self.compression_level)
+        if entry['encoding'] == 'xor' and len(compressed) >= len(raw): return self._raw_entry(raw, tensor, content_hash)
+        entry['object'] = self._store_blob(compressed)
+        return entry
+
+    def _load_tensor(self, entry: Dict) -> torch.Tensor:
+        dtype, shape = getattr(torch, entry['dtype']), entry['shape']
+        if entry['encoding'] == 'raw':
+            return _tensor_from_bytes(self._read_blob(entry['object']), dtype, shape)
+        base_raw = self._read_blob(entry['base'])
+        delta_bytes = zlib.decompress(self._read_blob(entry['object']))
+        if entry['encoding'] == 'xor':
+            raw = np.bitwise_xor(np.frombuffer(base_raw, dtype=np.uint8), np.frombuffer(delta_bytes, dtype=np.uint8)).tobytes()
+            return _tensor_from_bytes(raw, dtype, shape)
+        delta = _tensor_from_bytes(delta_bytes, getattr(torch, entry['delta_dtype']), shape)
+        base_tensor = _tensor_from_bytes(base_raw, dtype, shape)
+        return (base_tensor.double() + delta.double() * entry['scale']).to(dtype)
+
+    def _store_blob(self, content: bytes) -> str:
+        '''
+        Writes :param: content to a content addressed object, unless already present.
+
+        :returns: Hash identifying the object
+        '''
+        content_hash = hashlib.sha256(content).hexdigest()
+        object_path = self._object_path(content_hash)
+        if not os.path.exists(object_path):
+            self._write_atomically(object_path, content)
+        return content_hash
+
+    def _read_blob(self, content_hash: str) -> bytes:
+        with open(self._object_path(content_hash), 'rb') as f: return f.read()
+
+    def _write_atomically(self, path: str, content: bytes):
+        temporary_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary_path, 'wb') as f: f.write(content)
+        os.replace(temporary_path, path)
+        self.bytes_written += len(content)
+
+    def _read_entries(self) -> Dict:
+        '''
+        :returns: Entries of all tensors of the snapshots already in the store,
+                  keyed by the content hash of the tensor they reconstruct
+        '''
+        entries = {}
+        for key in self.keys():
+            with open(self._manifest_path(key), 'r') as f: manifest = json.load(f)
+            for entry in _manifest_entries(manifest):
+                entries.setdefault(entry['hash'], entry)
+        return entries
+
+    def _manifest_path(self, key: str) -> str:
+        return f'{self.path}/snapshots/{key}.json'
+
+    def _object_path(self, content_hash: str) -> str:
+        return f'{self.path}/objects/{content_hash}'
+
+    def __contains__(self, key: str):
+        return os.path.exists(self._manifest_path(key))
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __getstate__(self):
+        # Locks can't be pickled. Other processes only need to be able to load snapshots.
+        return {'path': self.path, 'delta_encoding': self.delta_encoding, 'base_interval': self.base_interval,
+                'quantization_bits': self.quantization_bits, 'compression_level': self.compression_level}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __repr__(self):
+        return f'CheckpointStore: {self.path}. {len(self)} snapshots. Delta encoding: {self.delta_encoding}'
+
+
+class StoredAgent():
+
+    def __init__(self, store: CheckpointStore, key: str, name: str):
+        '''
+        Lightweight handle to an agent stored in a CheckpointStore.
+        Loading it reconstructs the agent from the store.
+
+        :param store: CheckpointStore holding the agent
+        :param key: Identifier of the agent's snapshot in :param: store
+        :param name: Name of the stored agent
+        '''
+        self.store, self.key, self.name = store, key, name
+
+    def load(self):
+        return self.store.load(self.key)
+
+    @property
+    def cache_key(self) -> str:
+        return f'{os.path.abspath(self.store.path)}/snapshots/{self.key}'
+
+    def __repr__(self):
+        return f'StoredAgent: {self.name}. Key: {self.key}. Store: {self.store.path}'
+
+
+def _manifest_entries(manifest: Dict) -> List[Dict]:
+    '''
+    :returns: Entries of all tensors (network parameters and Q-tables) of a snapshot manifest
+    '''
+    return [entry for name, value in manifest['weights'].items()
+            for entry in ([value] if name in manifest['config']['q_tables'] else value.values())]
+
+
+def _tensor_bytes(tensor: torch.Tensor) -> bytes:
+    return tensor.detach().cpu().contiguous().reshape(-1).view(torch.uint8).numpy().tobytes()
+
+
+def _tensor_from_bytes(content: bytes, dtype, shape) -> torch.Tensor:
+    if len(content) == 0: return torch.empty(shape, dtype=dtype)
+    return torch.frombuffer(bytearray(content), dtype=torch.uint8).view(dtype).reshape(shape)
+
+
+def _dtype_name(tensor: torch.Tensor) -> str:
+    return str(tensor.dtype).split('.')[-1]
+
+
+def _hash(raw: bytes, dtype: str, shape: List[int]) -> str:
+    '''
+    :returns: Hash of the contents, dtype and shape of a tensor
+              whose raw bytes are :param: raw
+    '''
+    return hashlib.sha256(f'{dtype}{shape}'.encode() + raw).hexdigest()
@@ -0,0 +1,122 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+from .checkpoint import _snapshot_checkpoint, _write_checkpoint
+
+
+class AsyncCheckpointWriter():
+
+    def __init__(self, max_pending: int = 4, fsync: bool = True):
+        '''
+        Saves structured checkpoints (see regym.rl_algorithms.save_checkpoint)
+        in a background thread, so that training loops do not wait on disk I/O.
+
+        Saving an agent only snapshots it on the calling thread: its tensors are
+        copied to CPU and its config is recorded. Serializing the tensors, writing
+        and fsyncing the checkpoint happen in the background thread. At most
+        :param: max_pending checkpoints wait to be written at any time. Once that
+        many are pending, saving blocks until the oldest one has been written
+        (backpressure), which bounds the memory held by pending snapshots.
+
+        :param max_pending: Maximum number of checkpoints waiting to be written
+        :param fsync: Whether to wait for each checkpoint to be physically written to
+                      disk before considering it written, so that checkpoints survive crashes
+        '''
+        if not max_pending > 0:
+            raise ValueError('Parameter \'max_pending\' must be a strictly positive integer')
+        self.max_pending = max_pending
+        self.fsync = fsync
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.lock = threading.Lock()
+        self.pending = {}  # path -> Future, for checkpoints not yet written
+        self.errors = []
+        self.thread = None
+
+    def save(self, agent, path: str, save_optimizer: bool = False,
+             save_buffers: bool = False, buffer_shard_size: int = 10000) -> Future:
+        '''
+        Snapshots :param: agent and schedules it to be written at :param: path.
+        Blocks while :param: max_pending checkpoints are waiting to be written.
+        Parameters are the same as those of regym.rl_algorithms.save_checkpoint.
+
+        :returns: Future which completes once the checkpoint has been written
+        '''
+        self._raise_errors()
+        config, members = _snapshot_checkpoint(agent, save_optimizer, save_buffers,
+                                               buffer_shard_size, copy_tensors=True)
+        future = Future()
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._write_pending_checkpoints, daemon=True)
+                self.thread.start()
+            self.pending[path] = future
+        self.queue.put((path, config, members, future))
+        return future
+
+    def wait(self, path: str):
+        '''
+        Blocks until the checkpoint scheduled to be written at :param: path
+        (if any) has been written, so that it can be loaded.
+        '''
+        with self.lock:
+            future = self.pending.get(path)
+        if future is not None: future.result()
+
+    def flush(self):
+        '''
+        Blocks until all scheduled checkpoints have been written.
+        Raises the first error encountered while writing them, if any.
+        '''
+        self.queue.join()
+        self._raise_errors()
+
+    def close(self):
+        '''
+        Writes all scheduled checkpoints and stops the background thread
+        '''
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        self.thread = None
+        self._raise_errors()
+
+    def _write_pending_checkpoints(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+            path, config, members, future = item
+            try:
+                _write_checkpoint(path, config, members, fsync=self.fsync)
+                future.set_result(path)
+            except Exception as e:
+                self.errors.append(e)
+                future.set_exception(e)
+            finally:
+                with self.lock:
+                    if self.pending.get(path) is future: del self.pending[path]
+                self.queue.task_done()
+
+    def _raise_errors(self):
+        if len(self.errors) > 0:
+            error, self.errors = self.errors[0], []
+            raise error
+
+    def __len__(self):
+        '''
+        :returns: Number of checkpoints waiting to be written
+        '''
+        with self.lock:
+            return len(self.pending)
+
+    def __getstate__(self):
+        # Threads, locks and pending checkpoints can't be pickled
+        return {'max_pending': self.max_pending, 'fsync': self.fsync}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __repr__(self):
+        return f'AsyncCheckpointWriter: {len(self)}/{self.max_pending} checkpoints pending. fsync: {self.fsync}'
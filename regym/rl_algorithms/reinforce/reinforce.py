@@ -1,3 +1,5 @@
+import numpy as np
+import scipy.signal
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
@@ -9,47 +11,92 @@ from functools import reduce
 
 class ReinforceAlgorithm():
 
-    def __init__(self, policy_model_input_dim, policy_model_output_dim, learning_rate, adam_eps):
+    def __init__(self, policy_model_input_dim, policy_model_output_dim, learning_rate, adam_eps,
+                 discount_factor=1., use_baseline=False):
+        '''
+        :param discount_factor: Discount factor used to compute the (reward to go) returns of each timestep
+        :param use_baseline: Whether to subtract the mean return of each batch of
+                             trajectories from all returns, to reduce variance
+        '''
         self.learning_rate = learning_rate
+        self.discount_factor = discount_factor
+        self.use_baseline = use_baseline
         self.model = FullyConnectedFeedForward(policy_model_input_dim, policy_model_output_dim, hidden_units=(16,))
         self.optimizer = optim.Adam(self.model.parameters(), lr=learning_rate, eps=adam_eps)
+        self.policy_updates = 0  # Number of optimizer steps taken (see regym.training_schemes.menagerie.policy_version)
 
     def train(self, trajectories):
+        '''
+        Updates the policy with a single (batched) forward and backward pass
+        over all timesteps of all :param: trajectories, which can come
+        from many environments at once.
+
+        :param trajectories: List of trajectories, each a list of (s, a, r, succ_s) tuples
+        '''
+        states, actions, returns = self.batch_trajectories(trajectories)
         def closure():
             self.optimizer.zero_grad()
-            loss = -1. * self.compute_policy_utility_gradient(trajectories) # check that a gradient function exists
+            loss = -1. * self.compute_policy_utility_gradient(states, actions, returns, len(trajectories))
             loss.backward()
             return loss
         self.optimizer.step(closure)
+        self.policy_updates += 1
+
+    def batch_trajectories(self, trajectories):
+        '''
+        Concatenates all :param: trajectories into preallocated buffers.
+        :returns: Tensors of states, actions and discounted returns for every timestep
+        '''
+        total_timesteps = sum(len(t) for t in trajectories)
+        states = np.empty((total_timesteps, self.model.input_dim), dtype=np.float32)
+        actions = np.empty(total_timesteps, dtype=np.int64)
+        returns = np.empty(total_timesteps, dtype=np.float32)
+        start = 0
+        for trajectory in trajectories:
+            end = start + len(trajectory)
+            states[start:end] = np.reshape([s for (s, a, r, succ_s) in trajectory], (len(trajectory), -1))
+            actions[start:end] = [a for (s, a, r, succ_s) in trajectory]
+            returns[start:end] = discounted_returns(np.array([r for (s, a, r, succ_s) in trajectory], dtype=np.float32),
+                                                    self.discount_factor)
+            start = end
+        if self.use_baseline: returns -= returns.mean()
+        return torch.from_numpy(states), torch.from_numpy(actions), torch.from_numpy(returns)
 
-    def compute_policy_utility_gradient(self, trajectories):
-        gradient = reduce(lambda acc, trajectory: acc + self.compute_trajectory_loss(trajectory), trajectories, 0)
-        normalized_gradient = gradient / len(trajectories) # make sure that tensors have type.float
-        return normalized_gradient
+    def compute_policy_utility_gradient(self, states, actions, returns, num_trajectories):
+        log_action_probabilities = self.model(states, actions)['action_log_probability']
+        return torch.sum(log_action_probabilities * returns) / num_trajectories
 
-    def compute_trajectory_loss(self, trajectory):
-        # Normalize reward? normalized_episode_reward = (episode_reward - episode_reward.mean()) / std
-        episode_reward = self.cummulative_trajectory_reward(trajectory)
-        return sum([log_a * episode_reward for (s, a, log_a, r, succ_s) in trajectory])
 
-    def cummulative_trajectory_reward(self, trajectory):
-        return sum([reward for (s, a, log_a, reward, succ_s) in trajectory])
+def discounted_returns(rewards: np.ndarray, discount_factor: float) -> np.ndarray:
+    '''
+    Computes the discounted return (reward to go) of every timestep of an episode
+    with a linear filter over the reversed :param: rewards:
+        G_t = r_t + discount_factor * G_{t+1}
+    '''
+    return scipy.signal.lfilter([1.], [1., -discount_factor], rewards[::-1])[::-1]
 
 
 class FullyConnectedFeedForward(nn.Module):
 
     def __init__(self, input_dim, output_dim, hidden_units=(32,), gate=F.relu):
         super(FullyConnectedFeedForward, self).__init__()
+        self.input_dim = input_dim
         dimensions = (input_dim,) + hidden_units + (output_dim,)
         self.layers = nn.ModuleList([layer_init(nn.Linear(dim_in, dim_out))
                                      for dim_in, dim_out in zip(dimensions[:-1], dimensions[1:])])
         self.gate = gate
 
-    def forward(self, x):
-        x = torch.from_numpy(x).unsqueeze(0).type(torch.FloatTensor).cpu()
+    def forward(self, x, actions=None):
+        '''
+        :param x: Single observation, or batch of observations (one per row)
+        :param actions: If present, the log probabilities of these actions are computed,
+                        instead of those of newly sampled ones.
+        '''
+        x = torch.as_tensor(x, dtype=torch.float32)
+        if x.dim() == 1: x = x.unsqueeze(0)
         last_layer_output = reduce(lambda acc, layer: self.gate(layer(acc)), self.layers, x)
-        action_probabilities = F.softmax(last_layer_output)
+        action_probabilities = F.softmax(last_layer_output, dim=-1)
         distribution = torch.distributions.Categorical(probs=action_probabilities)
-        action = distribution.sample(sample_shape=(action_probabilities.size(0),))
+        action = distribution.sample() if actions is None else actions
         log_probability = distribution.log_prob(action)
         return {'action': action, 'action_log_probability': log_probability}
@@ -0,0 +1,97 @@
+import time
+
+import torch
+import torch.multiprocessing as mp
+
+from .checkpoint import _agent_components, _weights, _algorithm_owner
+
+
+# Seconds waited before retrying a read that overlapped a publication, doubled at every retry
+INITIAL_RETRY_BACKOFF, MAXIMUM_RETRY_BACKOFF = 1e-5, 1e-2
+
+
+class WeightBroadcast():
+
+    def __init__(self, agent):
+        '''
+        Shared memory copy of the policy of :param: agent (the state_dicts of its
+        neural networks and its dense Q-tables) with a version counter, through
+        which one process (i.e a learner) publishes updated weights and any number
+        of processes (i.e actors) refresh copies of the agent with a memory copy,
+        instead of receiving and unpickling whole agents.
+
+        A WeightBroadcast has to reach other processes either by being inherited
+        (fork) or as an argument of a torch.multiprocessing.Process, so that its
+        tensors are shared rather than copied. Only a single process may publish.
+
+        :param agent: Agent whose weights are published. Processes refreshing their
+                      copies must hold agents with the same architecture.
+        '''
+        modules, _, _, q_tables = _agent_components(agent)
+        self.tensors = {name: {k: v.share_memory_() for k, v in weights.items()} if isinstance(weights, dict)
+                        else weights.share_memory_()
+                        for name, weights in _weights(modules, q_tables, copy_tensors=True).items()}
+        # Sequence counter: odd while weights are being written, incremented twice per publication
+        self.sequence = mp.Value('q', 0)
+        self.refreshed_sequence = 0  # Sequence of the weights last loaded, in the current process
+
+    def publish(self, agent):
+        '''
+        Copies the current weights of :param: agent into shared memory and bumps the version
+        '''
+        modules, _, _, q_tables = _agent_components(agent)
+        with self.sequence.get_lock():
+            self.sequence.value += 1
+        with torch.no_grad():
+            for name, module in modules.items():
+                for k, v in module.state_dict().items(): self.tensors[name][k].copy_(v)
+            for name, q_table in q_tables.items():
+                self.tensors[name].copy_(torch.from_numpy(q_table.table))
+        with self.sequence.get_lock():
+            self.sequence.value += 1
+
+    def refresh(self, agent) -> bool:
+        '''
+        Loads the latest published weights into :param: agent, unless they
+        were already loaded by the current process. Copies made while weights were
+        being published are detected and retried, with exponential backoff,
+        so :param: agent never holds a mix of two publications.
+
+        :returns: Whether new weights were loaded
+        '''
+        modules, _, _, q_tables = _agent_components(agent)
+        backoff = INITIAL_RETRY_BACKOFF
+        while True:
+            sequence = self.sequence.value
+            if sequence == self.refreshed_sequence: return False
+            if sequence % 2 == 1:  # Being published
+                backoff = wait(backoff)
+                continue
+            with torch.no_grad():
+                for name, module in modules.items(): module.load_state_dict(self.tensors[name])
+                for name, q_table in q_tables.items(): q_table.table[...] = self.tensors[name].numpy()
+            if self.sequence.value == sequence:
+                self.refreshed_sequence = sequence
+                algorithm = getattr(_algorithm_owner(agent), 'algorithm', None)
+                if hasattr(algorithm, 'policy_updates'): algorithm.policy_updates += 1  # Weights changed outside of training
+                return True
+            backoff = wait(backoff)  # Weights were published while being copied
+
+    @property
+    def version(self) -> int:
+        '''
+        :returns: Number of completed publications
+        '''
+        return self.sequence.value // 2
+
+    def __repr__(self):
+        return f'WeightBroadcast: version {self.version}. Tensors: {list(self.tensors)}'
+
+
+def wait(backoff: float) -> float:
+    '''
+    Sleeps for :param: backoff seconds
+    :returns: Backoff for the next retry
+    '''
+    time.sleep(backoff)
+    return min(2 * backoff, MAXIMUM_RETRY_BACKOFF)
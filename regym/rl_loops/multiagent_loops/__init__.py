@@ -1,3 +1,4 @@
 from . import simultaneous_action_rl_loop
 from . import sequential_action_rl_loop
-from .self_play_loop import self_play_training
+from .self_play_loop import self_play_training, resume_self_play_training
+from .actor_learner_self_play_loop import actor_learner_self_play_training
@@ -0,0 +1,268 @@
+'''
+Actor-learner version of regym.rl_loops.multiagent_loops.self_play_training.
+
+Episodes are simulated in parallel by actor processes, while a single learner
+(the calling process) owns the agent being trained:
+
+    - Actors hold a copy of the training agent's policy and a copy of the menagerie.
+      They sample opponents with the self-play scheme, run episodes via task.run_episode
+      and stream the resulting trajectories to the learner.
+    - The learner feeds every trajectory it receives to the training agent, runs
+      the scheme's curator, and periodically publishes the training agent's weights
+      in shared memory (see regym.rl_algorithms.WeightBroadcast), from which actors
+      refresh their copy before every episode. Changes to the menagerie are sent
+      to the actors through queues.
+
+Actors act with a policy which may lag behind the learner's by a few updates.
+'''
+import os
+import queue
+import traceback
+from typing import List
+
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+from regym.environments import EnvType
+from regym.rl_algorithms import weights_only_copy
+from regym.rl_algorithms import WeightBroadcast
+from regym.training_schemes.menagerie import Menagerie, as_menagerie
+
+
+def actor_learner_self_play_training(task, training_agent, self_play_scheme,
+                                     target_episodes: int = 10, opci: int = 1,
+                                     menagerie: List = [],
+                                     menagerie_path: str = '.',
+                                     initial_episode: int = 0,
+                                     num_actors: int = 2,
+                                     broadcast_interval: int = 1,
+                                     max_pending_episodes: int = None,
+                                     seed: int = None):
+    '''
+    Runs self-play training like regym.rl_loops.multiagent_loops.self_play_training,
+    simulating episodes in :param: num_actors actor processes. Only tasks
+    of type EnvType.MULTIAGENT_SIMULTANEOUS_ACTION are supported.
+
+    Experiences are fed to the training agent in the order in which their
+    episodes are received, each step preceded by the prediction
+    (agent.current_prediction, if any, i.e for PPO) the actor's policy made
+    for that step. Agents keeping internal state between steps other than
+    that (i.e recurrent PPO) are not supported.
+
+    :param task: Mutiagent task
+    :param training_agent: Agent being trained, which only lives in the learner (calling) process
+    :param self_play_scheme: Self play training scheme. Actors sample opponents with a copy
+                             of it, which is refreshed whenever its curator changes the menagerie.
+    :param target_episodes: Number of episodes that will be run before training ends
+    :param opci: Opponent policy Change Interval, counted over the episodes of each actor
+    :param menagerie: Initial menagerie. Either a list of agent handles (i.e AgentHooks) or a Menagerie
+    :param menagerie_path: Path to folder where all menageries are stored
+    :param initial_episode: Episode from where training takes on. Useful when training is interrupted.
+    :param num_actors: Number of actor processes simulating episodes
+    :param broadcast_interval: Number of episodes learnt from between publications
+                               of the training agent's weights to the actors
+    :param max_pending_episodes: Maximum number of episodes simulated by actors waiting to be
+                                 learnt from, which bounds how stale actor policies can get.
+                                 Actors wait while this many episodes are pending. Defaults to 2 * num_actors.
+    :param seed: Optional. Actor i seeds its random number generators with seed + i
+    :returns: Menagerie after target_episodes have elapsed
+    :returns: Trained agent. freshly baked!
+    :returns: Array of arrays of trajectories for all target_episodes, in the order they were learnt from
+    '''
+    check_parameter_validity(task, num_actors, broadcast_interval, max_pending_episodes)
+    agent_menagerie_path = '{}/{}-{}'.format(menagerie_path, self_play_scheme.name, training_agent.name)
+    if not os.path.exists(agent_menagerie_path):
+        os.mkdir(agent_menagerie_path)
+    menagerie = as_menagerie(menagerie)
+    # Schemes which initialize their state when first sampling opponents (i.e PSRO)
+    # are initialized here, before being copied into actor processes
+    self_play_scheme.opponent_sampling_distribution(menagerie, training_agent)
+
+    max_pending_episodes = max_pending_episodes if max_pending_episodes is not None else 2 * num_actors
+    experience_queue = mp.Queue(maxsize=max_pending_episodes)
+    broadcast_queues = [mp.Queue() for _ in range(num_actors)]
+    stop_event = mp.Event()
+    actor_agent = weights_only_copy(training_agent, training=True, trainable=False)
+    weight_broadcast = WeightBroadcast(training_agent)
+    actors = [mp.Process(target=actor_process,
+                         args=(i, task, actor_agent, self_play_scheme, menagerie, opci,
+                               experience_queue, weight_broadcast, broadcast_queues[i], stop_event,
+                               seed + i if seed is not None else None))
+              for i in range(num_actors)]
+    for actor in actors: actor.start()
+
+    broadcaster = MenagerieBroadcaster(menagerie)
+    trajectories = []
+    try:
+        for episode in range(target_episodes):
+            message = experience_queue.get()
+            if message[0] == 'error': raise RuntimeError(f'Actor {message[1]} failed:\n{message[2]}')
+            _, _, training_agent_index, episode_trajectory, predictions = message
+            learn_from_trajectory(training_agent, episode_trajectory, training_agent_index, predictions)
+
+            candidate_save_path = f'{agent_menagerie_path}/checkpoint_episode_{initial_episode + episode}.pt'
+            menagerie = self_play_scheme.curator(menagerie, training_agent,
+                                                 episode_trajectory, training_agent_index,
+                                                 candidate_save_path=candidate_save_path)
+            trajectories.append(episode_trajectory)
+
+            if (episode + 1) % broadcast_interval == 0 and episode + 1 < target_episodes:
+                weight_broadcast.publish(training_agent)
+                menagerie_update = broadcaster.menagerie_update(menagerie, self_play_scheme)
+                if menagerie_update is not None:
+                    for broadcast_queue in broadcast_queues: broadcast_queue.put(menagerie_update)
+    finally:
+        stop_actors(actors, stop_event, experience_queue)
+        # Stopped actors may have left broadcasts unread, which must not block this process' exit
+        for broadcast_queue in broadcast_queues: broadcast_queue.cancel_join_thread()
+
+    if menagerie.checkpoint_writer is not None:
+        menagerie.checkpoint_writer.flush()
+    return menagerie, training_agent, trajectories
+
+
+def actor_process(actor_index: int, task, agent, self_play_scheme, menagerie: Menagerie, opci: int,
+                  experience_queue, weight_broadcast: WeightBroadcast, broadcast_queue, stop_event, seed: int = None):
+    '''
+    Simulates episodes between :param: agent and opponents sampled from :param: menagerie
+    until :param: stop_event is set, sending them through :param: experience_queue.
+    Weights are refreshed from :param: weight_broadcast and menagerie updates
+    are received through :param: broadcast_queue.
+    '''
+    try:
+        if seed is not None:
+            np.random.seed(seed)
+            torch.manual_seed(seed)
+        recording_agent = PredictionRecordingAgent(agent)
+        episode = 0
+        while not stop_event.is_set():
+            weight_broadcast.refresh(agent)
+            menagerie, self_play_scheme = receive_menagerie_updates(broadcast_queue, menagerie, self_play_scheme)
+            if episode % opci == 0:
+                opponent_agent_vector_e = self_play_scheme.opponent_sampling_distribution(menagerie, agent)
+            training_agent_index = sample_training_agent_index(opponent_agent_vector_e)
+            agent_vector = list(opponent_agent_vector_e)
+            agent_vector.insert(training_agent_index, recording_agent)
+
+            recording_agent.predictions = []
+            episode_trajectory = task.run_episode(agent_vector=agent_vector, training=False)
+            predictions = recording_agent.predictions if len(recording_agent.predictions) > 0 else None
+            put_unless_stopped(experience_queue, ('episode', actor_index, training_agent_index, episode_trajectory, predictions), stop_event)
+            episode += 1
+    except Exception:
+        put_unless_stopped(experience_queue, ('error', actor_index, traceback.format_exc()), stop_event)
+
+
+def receive_menagerie_updates(broadcast_queue, menagerie: Menagerie, self_play_scheme):
+    '''
+    Applies all menagerie updates (see MenagerieBroadcaster) waiting in :param: broadcast_queue.
+
+    :returns: Updated menagerie, updated self-play scheme
+    '''
+    while True:
+        try: start, handles, self_play_scheme = broadcast_queue.get_nowait()
+        except queue.Empty: break
+        updated_menagerie = Menagerie(menagerie.handles[:start] + handles, cache=menagerie.cache,
+                                      prefetch=menagerie.prefetch, checkpoint_store=menagerie.checkpoint_store)
+        updated_menagerie.training_agent_snapshot = menagerie.training_agent_snapshot
+        menagerie = updated_menagerie
+    return menagerie, self_play_scheme
+
+
+class MenagerieBroadcaster():
+
+    def __init__(self, menagerie):
+        '''
+        Keeps track of the menagerie handles already sent to actors,
+        so that only new handles are broadcast.
+        '''
+        self.sent_handles = list(menagerie)
+
+    def menagerie_update(self, menagerie, self_play_scheme):
+        '''
+        :returns: None if :param: menagerie did not change since the last update. Otherwise,
+                  (index from which the actors' menageries changed, handles from that index
+                  onwards, :param: self_play_scheme), as the scheme's state may depend on its menagerie.
+        '''
+        handles = list(menagerie)
+        start = 0
+        while start < min(len(handles), len(self.sent_handles)) and handles[start] is self.sent_handles[start]:
+            start += 1
+        if start == len(handles) == len(self.sent_handles): return None
+        self.sent_handles = handles
+        return (start, handles[start:], self_play_scheme)
+
+
+class PredictionRecordingAgent():
+
+    def __init__(self, agent):
+        '''
+        Acts like :param: agent, recording (a detached copy of) the prediction
+        :param: agent made for every action taken, if it makes any (i.e PPOAgent.current_prediction).
+        '''
+        self.agent = agent
+        self.name = agent.name
+        self.requires_environment_model = agent.requires_environment_model
+        self.training = False
+        self.predictions = []
+
+    def take_action(self, *args, **kwargs):
+        action = self.agent.take_action(*args, **kwargs)
+        if hasattr(self.agent, 'current_prediction'):
+            self.predictions.append({k: v.detach() if isinstance(v, torch.Tensor) else v
+                                     for k, v in self.agent.current_prediction.items()})
+        return action
+
+    def handle_experience(self, s, a, r, succ_s, done=False):
+        pass
+
+
+def sample_training_agent_index(opponent_agent_vector: List) -> int:
+    '''
+    :returns: Index at which the training agent is inserted in :param: opponent_agent_vector,
+              uniformly sampled among all len(opponent_agent_vector) + 1 positions
+    '''
+    return np.random.choice(range(len(opponent_agent_vector) + 1))
+
+
+def learn_from_trajectory(agent, trajectory, agent_index: int, predictions: List = None):
+    '''
+    Feeds the experiences of the :param: agent_index-th agent of :param: trajectory
+    (generated by a simultaneous action episode) to :param: agent.
+
+    :param predictions: Optional. Prediction made when acting at each step of
+                        :param: trajectory, set as agent.current_prediction before
+                        handling the experience of that step
+    '''
+    for step, (observations, actions, rewards, succ_observations, done) in enumerate(trajectory):
+        if predictions is not None: agent.current_prediction = predictions[step]
+        agent.handle_experience(observations[agent_index], actions[agent_index], rewards[agent_index],
+                                succ_observations[agent_index], done)
+
+
+def put_unless_stopped(target_queue, item, stop_event):
+    while not stop_event.is_set():
+        try:
+            target_queue.put(item, timeout=0.1)
+            return
+        except queue.Full: continue
+
+
+def stop_actors(actors, stop_event, experience_queue):
+    stop_event.set()
+    while any(actor.is_alive() for actor in actors):
+        try: experience_queue.get(timeout=0.1)  # Unblocks actors waiting to put episodes
+        except queue.Empty: pass
+    for actor in actors: actor.join()
+
+
+def check_parameter_validity(task, num_actors, broadcast_interval, max_pending_episodes):
+    if task.env_type != EnvType.MULTIAGENT_SIMULTANEOUS_ACTION:
+        raise ValueError('Actor-learner self-play only supports tasks of type EnvType.MULTIAGENT_SIMULTANEOUS_ACTION')
+    if not num_actors > 0:
+        raise ValueError('Parameter \'num_actors\' must be a strictly positive integer')
+    if not broadcast_interval > 0:
+        raise ValueError('Parameter \'broadcast_interval\' must be a strictly positive integer')
+    if max_pending_episodes is not None and not max_pending_episodes > 0:
+        raise ValueError('Parameter \'max_pending_episodes\' must be a strictly positive integer')
@@ -1,13 +1,27 @@
 from typing import List
+from copy import deepcopy
 import numpy as np
 import os
 
+from regym.environments import EnvType
+from regym.util.episode_summaries import summarize_episode, opponent_names
+from regym.training_schemes.menagerie import Menagerie, as_menagerie
+from . import simultaneous_action_rl_loop
+from .actor_learner_self_play_loop import learn_from_trajectory, sample_training_agent_index
+from .self_play_training_state import SelfPlayTrainingState
+from .self_play_training_state import save_training_state, load_training_state, set_rng_states
+
 
 def self_play_training(task, training_agent, self_play_scheme,
                        target_episodes: int=10, opci: int=1,
                        menagerie: List=[],
                        menagerie_path: str='.',
-                       initial_episode: int=0):
+                       initial_episode: int=0,
+                       training_state_path: str=None,
+                       training_state_interval: int=100,
+                       episodes_per_batch: int=1,
+                       episode_summary_sink=None,
+                       keep_trajectories: bool=True):
     '''
     Extension of the multi-agent rl loop. The extension works thus:
     - Opponent sampling distribution
@@ -21,28 +35,164 @@ def self_play_training(task, training_agent, self_play_scheme,
     :param curator: Gating function which determines if the current agent will be added to the menagerie at the end of an episode
     :param target_episodes: number of episodes that will be run before training ends.
     :param opci: Opponent policy Change Interval
+    :param menagerie: Initial menagerie. Either a list of agent handles (i.e AgentHooks)
+                      or a Menagerie, which loads agents saved on disk lazily
+                      through an LRU cache, and can prefetch sampled opponents.
+                      Curators save the agents they add to a Menagerie in its
+                      checkpoint_store (i.e a regym.rl_algorithms.CheckpointStore), if it has one,
+                      and write their checkpoints with its checkpoint_writer
+                      (a regym.rl_algorithms.AsyncCheckpointWriter), if it has one.
     :param menageries_path: path to folder where all menageries are stored.
     :param initial_episode: Episode from where training takes on. Useful when training is interrupted.
+    :param training_state_path: Optional. Directory where the full training state
+                                (training agent with its optimizers and replay buffers,
+                                menagerie, self-play scheme, random number generator states)
+                                is saved every :param: training_state_interval episodes and
+                                at the end of training, so that training can be resumed
+                                with resume_self_play_training if interrupted.
+    :param training_state_interval: Number of episodes between training state saves
+    :param episodes_per_batch: Number of episodes run concurrently, over differently seeded
+                               copies of the task's environment. Opponents are sampled at most
+                               once per batch (at the start of a batch in which :param: opci
+                               episodes have elapsed), and agents implementing take_actions
+                               (i.e PPOAgent) act in all episodes of the batch with a single
+                               forward pass per step (see simultaneous_action_rl_loop.run_episodes).
+                               Once the batch is over, the training agent learns from each
+                               episode in turn, and the curator is called once, with the
+                               batch's last episode. Only tasks of type EnvType.MULTIAGENT_SIMULTANEOUS_ACTION
+                               support batches of more than one episode, and agents keeping
+                               internal state between steps (i.e recurrent PPO) are not supported.
+    :param episode_summary_sink: Optional. Sink (i.e regym.util.CSVEpisodeSummarySink) to which a
+                                 regym.util.EpisodeSummary of every episode is written as soon as
+                                 it is run. Flushed, but not closed, at the end of training.
+    :param keep_trajectories: Whether to keep and return the trajectories of all episodes.
+                              Set to False, alongside an :param: episode_summary_sink,
+                              for memory usage not to grow with :param: target_episodes.
     :returns: Menagerie after target_episodes have elapsed
     :returns: Trained agent. freshly baked!
-    :returns: Array of arrays of trajectories for all target_episodes
+    :returns: Array of arrays of trajectories for all target_episodes (empty if not :param: keep_trajectories)
     '''
     agent_menagerie_path = '{}/{}-{}'.format(menagerie_path, self_play_scheme.name, training_agent.name)
     if not os.path.exists(agent_menagerie_path):
         os.mkdir(agent_menagerie_path)
 
+    if training_state_path is not None and not training_state_interval > 0:
+        raise ValueError('Parameter \'training_state_interval\' must be a strictly positive integer')
+    if not episodes_per_batch > 0:
+        raise ValueError('Parameter \'episodes_per_batch\' must be a strictly positive integer')
+    if episodes_per_batch > 1 and task.env_type != EnvType.MULTIAGENT_SIMULTANEOUS_ACTION:
+        raise ValueError('Batches of more than one episode are only supported for tasks of type EnvType.MULTIAGENT_SIMULTANEOUS_ACTION')
+    menagerie = as_menagerie(menagerie)
+
+    def save_state(episode):
+        save_training_state(training_state_path,
+                            SelfPlayTrainingState(training_agent=training_agent, self_play_scheme=self_play_scheme,
+                                                  menagerie=menagerie, episode=initial_episode + episode,
+                                                  final_episode=initial_episode + target_episodes, opci=opci,
+                                                  menagerie_path=menagerie_path,
+                                                  training_state_interval=training_state_interval,
+                                                  rng_states=None))
+
     trajectories = []
-    for episode in range(target_episodes):
-        if episode % opci == 0:
-            opponent_agent_vector_e = self_play_scheme.opponent_sampling_distribution(menagerie, training_agent)
-        training_agent_index = np.random.choice(range(len(opponent_agent_vector_e)))
-        opponent_agent_vector_e.insert(training_agent_index, training_agent)
-        episode_trajectory = task.run_episode(agent_vector=opponent_agent_vector_e, training=True)
-        candidate_save_path = f'{agent_menagerie_path}/checkpoint_episode_{initial_episode + episode}.pt'
-
-        menagerie = self_play_scheme.curator(menagerie, training_agent,
-                                             episode_trajectory, training_agent_index,
-                                             candidate_save_path=candidate_save_path)
-        trajectories.append(episode_trajectory)
+    if episodes_per_batch > 1:
+        envs = create_environment_copies(task.env, episodes_per_batch)
+        for batch_start in range(0, target_episodes, episodes_per_batch):
+            batch_episodes = range(batch_start, min(batch_start + episodes_per_batch, target_episodes))
+            if batch_episodes[-1] // opci > (batch_start - 1) // opci:  # An episode of the batch is a multiple of opci
+                opponent_agent_vector_e = self_play_scheme.opponent_sampling_distribution(menagerie, training_agent)
+            training_agent_indices = [sample_training_agent_index(opponent_agent_vector_e) for _ in batch_episodes]
+            agent_vectors = []
+            for training_agent_index in training_agent_indices:
+                agent_vector = list(opponent_agent_vector_e)
+                agent_vector.insert(training_agent_index, training_agent)
+                agent_vectors.append(task._extend_agent_vector(agent_vector))
+            batch_trajectories, batch_predictions = simultaneous_action_rl_loop.run_episodes(envs[:len(batch_episodes)], agent_vectors,
+                                                                                              recorded_agent_indices=training_agent_indices)
+            task.total_episodes_run += len(batch_episodes)
+
+            for episode, episode_trajectory, training_agent_index, predictions, agent_vector in \
+                    zip(batch_episodes, batch_trajectories, training_agent_indices, batch_predictions, agent_vectors):
+                learn_from_trajectory(training_agent, episode_trajectory, training_agent_index, predictions)
+                if episode_summary_sink is not None:
+                    episode_summary_sink.write(summarize_episode(initial_episode + episode, episode_trajectory, training_agent_index,
+                                                                 opponent_names(agent_vector, training_agent_index)))
+                if keep_trajectories: trajectories.append(episode_trajectory)
+
+            batch_end = batch_episodes[-1] + 1
+            candidate_save_path = f'{agent_menagerie_path}/checkpoint_episode_{initial_episode + batch_end - 1}.pt'
+            menagerie = self_play_scheme.curator(menagerie, training_agent,
+                                                 batch_trajectories[-1], training_agent_indices[-1],
+                                                 candidate_save_path=candidate_save_path)
+            if training_state_path is not None and (batch_end // training_state_interval > batch_start // training_state_interval
+                                                    or batch_end == target_episodes):
+                save_state(batch_end)
+    else:
+        for episode in range(target_episodes):
+            if episode % opci == 0:
+                opponent_agent_vector_e = self_play_scheme.opponent_sampling_distribution(menagerie, training_agent)
+            training_agent_index = sample_training_agent_index(opponent_agent_vector_e)
+            agent_vector = list(opponent_agent_vector_e)
+            agent_vector.insert(training_agent_index, training_agent)
+            episode_trajectory = task.run_episode(agent_vector=agent_vector, training=True)
+            candidate_save_path = f'{agent_menagerie_path}/checkpoint_episode_{initial_episode + episode}.pt'
 
+            menagerie = self_play_scheme.curator(menagerie, training_agent,
+                                                 episode_trajectory, training_agent_index,
+                                                 candidate_save_path=candidate_save_path)
+            if episode_summary_sink is not None:
+                episode_summary_sink.write(summarize_episode(initial_episode + episode, episode_trajectory, training_agent_index,
+                                                             opponent_names(agent_vector, training_agent_index)))
+            if keep_trajectories: trajectories.append(episode_trajectory)
+
+            if training_state_path is not None and ((episode + 1) % training_state_interval == 0 or episode + 1 == target_episodes):
+                save_state(episode + 1)
+
+    if menagerie.checkpoint_writer is not None:
+        menagerie.checkpoint_writer.flush()
+    if episode_summary_sink is not None: episode_summary_sink.flush()
     return menagerie, training_agent, trajectories
+
+
+def create_environment_copies(env, num_copies: int) -> List:
+    '''
+    :returns: :param: num_copies copies of :param: env, each seeded with a different
+              seed drawn from numpy's global random number generator, so that
+              episodes run concurrently on them are not correlated
+    '''
+    envs = [deepcopy(env) for _ in range(num_copies)]
+    for env_copy, seed in zip(envs, np.random.randint(np.iinfo(np.int32).max, size=num_copies)):
+        env_copy.seed(int(seed))
+    return envs
+
+
+def resume_self_play_training(task, training_state_path: str, target_episodes: int=None,
+                              episodes_per_batch: int=1, episode_summary_sink=None,
+                              keep_trajectories: bool=True):
+    '''
+    Resumes self_play_training from the latest training state saved in
+    :param: training_state_path, restoring the training agent (with its optimizers
+    and replay buffers), the menagerie, the self-play scheme and the states of the
+    random number generators. Training states keep being saved in :param: training_state_path.
+    Opponents are sampled anew when training resumes.
+
+    :param task: Mutiagent task
+    :param training_state_path: Directory passed as training_state_path to self_play_training
+    :param target_episodes: Number of episodes to run. Defaults to the episodes
+                            remaining from the target_episodes of the interrupted run.
+    :param episodes_per_batch: Number of episodes run concurrently (see self_play_training)
+    :param episode_summary_sink: Optional. Sink to which summaries of the resumed episodes are written (see self_play_training)
+    :param keep_trajectories: Whether to keep and return the trajectories of the resumed episodes
+    :returns: Same as self_play_training, with trajectories only for the resumed episodes
+    '''
+    state = load_training_state(training_state_path)
+    set_rng_states(state.rng_states)
+    if target_episodes is None: target_episodes = state.final_episode - state.episode
+    return self_play_training(task, state.training_agent, state.self_play_scheme,
+                              target_episodes=target_episodes, opci=state.opci,
+                              menagerie=state.menagerie, menagerie_path=state.menagerie_path,
+                              initial_episode=state.episode,
+                              training_state_path=training_state_path,
+                              training_state_interval=state.training_state_interval,
+                              episodes_per_batch=episodes_per_batch,
+                              episode_summary_sink=episode_summary_sink,
+                              keep_trajectories=keep_trajectories)
@@ -0,0 +1,97 @@
+'''
+Full training state of regym.rl_loops.multiagent_loops.self_play_training,
+from which interrupted (i.e preempted) self-play runs can be resumed.
+A training state is a directory holding:
+
+    - latest.json:          Name of the subdirectory holding the latest complete training state.
+                            Only updated once that subdirectory has been fully written, so a
+                            run interrupted while saving can still resume from the previous state.
+    - episode_<n>/
+        - training_agent.pt: Structured checkpoint (see regym.rl_algorithms.save_checkpoint)
+                             of the training agent, including its optimizers and replay buffers.
+        - state.pt:          Self-play scheme (i.e PSRO's meta-game, meta-game solution and statistics),
+                             menagerie handles, random number generator states and loop parameters.
+
+Agents saved on disk by curators (see Menagerie) are referenced, not copied.
+'''
+import os
+import json
+import random
+import shutil
+from collections import namedtuple
+
+import dill
+import numpy as np
+import torch
+
+from regym.rl_algorithms import save_checkpoint, load_checkpoint
+
+TRAINING_STATE_FORMAT_VERSION = 1
+
+SelfPlayTrainingState = namedtuple('SelfPlayTrainingState', 'training_agent self_play_scheme menagerie '
+                                                            'episode final_episode opci menagerie_path '
+                                                            'training_state_interval rng_states')
+
+
+def save_training_state(path: str, state: SelfPlayTrainingState):
+    '''
+    Saves :param: state in directory :param: path, replacing the training state previously saved there.
+
+    :param path: Directory holding the training state. Created if it does not exist.
+    :param state: Training state. Its rng_states are captured if None.
+    '''
+    if state.rng_states is None: state = state._replace(rng_states=get_rng_states())
+    menagerie_checkpoint_writer = getattr(state.menagerie, 'checkpoint_writer', None)
+    if menagerie_checkpoint_writer is not None: menagerie_checkpoint_writer.flush()
+
+    directory = f'episode_{state.episode}'
+    os.makedirs(f'{path}/{directory}', exist_ok=True)
+    save_checkpoint(state.training_agent, f'{path}/{directory}/training_agent.pt',
+                    save_optimizer=True, save_buffers=True, fsync=True)
+    loop_state = {'format_version': TRAINING_STATE_FORMAT_VERSION,
+                  **{k: v for k, v in state._asdict().items() if k != 'training_agent'}}
+    temporary_path = f'{path}/{directory}/state.pt.tmp'
+    with open(temporary_path, 'wb') as f:
+        torch.save(loop_state, f, pickle_module=dill)  # dill, as schemes may hold lambdas (i.e PSRO's meta_game_solver)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary_path, f'{path}/{directory}/state.pt')
+
+    with open(f'{path}/latest.json.tmp', 'w') as f: json.dump({'directory': directory, 'episode': state.episode}, f)
+    os.replace(f'{path}/latest.json.tmp', f'{path}/latest.json')
+    for previous_directory in os.listdir(path):
+        if previous_directory.startswith('episode_') and previous_directory != directory:
+            shutil.rmtree(f'{path}/{previous_directory}', ignore_errors=True)
+
+
+def load_training_state(path: str) -> SelfPlayTrainingState:
+    '''
+    :param path: Directory holding a training state (see save_training_state)
+    :returns: Latest training state saved in :param: path. The training agent's
+              optimizer states and replay buffers are restored. Its neural
+              networks are loaded on CPU.
+    '''
+    if not os.path.exists(f'{path}/latest.json'):
+        raise ValueError(f'No training state found in {path}')
+    with open(f'{path}/latest.json', 'r') as f: directory = json.load(f)['directory']
+    training_agent = load_checkpoint(f'{path}/{directory}/training_agent.pt', load_optimizer=True, load_buffers=True)
+    with open(f'{path}/{directory}/state.pt', 'rb') as f:
+        loop_state = torch.load(f, pickle_module=dill, weights_only=False)
+    loop_state.pop('format_version')
+    return SelfPlayTrainingState(training_agent=training_agent, **loop_state)
+
+
+def get_rng_states():
+    '''
+    :returns: States of the random number generators of python, numpy and torch (CPU and CUDA)
+    '''
+    return {'python': random.getstate(), 'numpy': np.random.get_state(), 'torch': torch.get_rng_state(),
+            'torch_cuda': torch.cuda.get_rng_state_all() if torch.cuda.is_available() else None}
+
+
+def set_rng_states(rng_states):
+    random.setstate(rng_states['python'])
+    np.random.set_state(rng_states['numpy'])
+    torch.set_rng_state(rng_states['torch'])
+    if rng_states['torch_cuda'] is not None and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(rng_states['torch_cuda'])
@@ -1,9 +1,10 @@
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 from copy import deepcopy
 
 from PIL import Image
 
 import gym
+import torch
 import regym
 from regym.rl_algorithms.agents import Agent
 
@@ -47,3 +48,67 @@ def run_episode(env: gym.Env, agent_vector: List[Agent], training: bool, render_
         if 'legal_actions' in info: legal_actions = info['legal_actions']
 
     return trajectory
+
+
+def run_episodes(envs: List[gym.Env], agent_vectors: List[List[Agent]],
+                 recorded_agent_indices: List[int] = None) -> Tuple[List[List[Tuple]], List[List[Dict]]]:
+    '''
+    Runs one episode on each environment in :param: envs concurrently,
+    stepping all unfinished environments in lockstep, where each
+    agent takes an action simultaneously. Agents do not learn from
+    the experiences collected (see run_episode with training=True),
+    as the same agent may be acting in more than one environment.
+
+    At every step, an agent acting in several environments which implements
+    take_actions (i.e PPOAgent) takes its actions in all of them at once,
+    from their stacked observations. Other agents take them one at a time.
+
+    :param envs: Vector of OpenAI gym environments (i.e copies of a Task's env)
+    :param agent_vectors: Vector containing, for each environment, the agent for each agent in the environment
+    :param recorded_agent_indices: Optional. For each environment, index of the agent
+                                   whose predictions (agent.current_prediction, i.e for PPO)
+                                   are recorded at every step
+    :returns: Episode trajectory (o,a,r,o',d) for each environment in :param: envs
+    :returns: For each environment in :param: envs, predictions made by its recorded agent
+              at every step. None if no agent is recorded, or if it makes no predictions.
+    '''
+    observations = [env.reset() for env in envs]
+    legal_actions: List = [None] * len(envs)  # Assumption: all actions are permitted on the first state
+    trajectories = [[] for _ in envs]
+    predictions = [[] for _ in envs]
+    unfinished = list(range(len(envs)))
+    while len(unfinished) > 0:
+        action_vectors = {e: [None] * len(agent_vectors[e]) for e in unfinished}
+        for agent, seats in _group_seats_by_agent(agent_vectors, unfinished):
+            if hasattr(agent, 'take_actions') and not agent.requires_environment_model:
+                actions = agent.take_actions([observations[e][i] for e, i in seats], [legal_actions[e] for e, _ in seats])
+                agent_predictions = getattr(agent, 'current_predictions', [None] * len(seats))
+            else:
+                actions, agent_predictions = [], []
+                for e, i in seats:
+                    actions.append(agent.take_action(deepcopy(envs[e]), player_index=i) if agent.requires_environment_model
+                                   else agent.take_action(observations[e][i], legal_actions[e]))
+                    agent_predictions.append(getattr(agent, 'current_prediction', None))
+            for (e, i), action, prediction in zip(seats, actions, agent_predictions):
+                action_vectors[e][i] = action
+                if recorded_agent_indices is not None and recorded_agent_indices[e] == i and prediction is not None:
+                    predictions[e].append({k: v.detach() if isinstance(v, torch.Tensor) else v for k, v in prediction.items()})
+        for e in unfinished:
+            succ_observations, reward_vector, done, info = envs[e].step(action_vectors[e])
+            trajectories[e].append((observations[e], action_vectors[e], reward_vector, succ_observations, done))
+            observations[e] = succ_observations
+            if 'legal_actions' in info: legal_actions[e] = info['legal_actions']
+        unfinished = [e for e in unfinished if not trajectories[e][-1][4]]
+    return trajectories, [p if len(p) > 0 else None for p in predictions]
+
+
+def _group_seats_by_agent(agent_vectors: List[List[Agent]], environment_indices: List[int]) -> List[Tuple]:
+    '''
+    :returns: For each distinct agent acting in the environments :param: environment_indices,
+              (agent, [(environment index, agent index), ...] of the seats it occupies)
+    '''
+    seats = {}
+    for e in environment_indices:
+        for i, agent in enumerate(agent_vectors[e]):
+            seats.setdefault(id(agent), (agent, []))[1].append((e, i))
+    return list(seats.values())
@@ -0,0 +1,39 @@
+import os
+import sys
+from unittest import mock
+import numpy as np
+
+# Experiment scripts import regym's subpackages as top level modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../experiment')))
+
+import benchmark_match_play
+from benchmark_match_play import BenchmarkWorkerPool, initialize_indexed_benchmark_worker, benchmark_worker_matches
+from rl_algorithms import AgentHook, rockAgent, scissorsAgent
+
+
+def create_RPS_environment():
+    import gym
+    import gym_rock_paper_scissors
+    return gym.make('RockPaperScissors-v0')
+
+
+def test_agents_are_unhooked_once_per_worker():
+    initialize_indexed_benchmark_worker(0, create_RPS_environment, seed=1)
+    agent_vector = [AgentHook(rockAgent), AgentHook(scissorsAgent)]
+    agent_ids = [(0, 'scheme', 'RockAgent'), (0, 'scheme', 'ScissorsAgent')]
+    with mock.patch.object(AgentHook, 'unhook', wraps=AgentHook.unhook) as unhook:
+        for _ in range(3):
+            np.testing.assert_array_equal(benchmark_worker_matches(agent_vector, agent_ids, episodes=2), [2, 0])
+    assert unhook.call_count == 2
+
+
+def test_episodes_are_split_across_workers():
+    worker_pool = BenchmarkWorkerPool(create_RPS_environment, num_workers=2, seed=1)
+    agent_vector = [AgentHook(rockAgent), AgentHook(scissorsAgent)]
+    agent_ids = [(0, 'scheme', 'RockAgent'), (0, 'scheme', 'ScissorsAgent')]
+    with mock.patch.object(worker_pool.executor, 'submit', wraps=worker_pool.executor.submit) as submit:
+        wins = worker_pool.benchmark(agent_vector, agent_ids, episodes=5)
+    worker_pool.shutdown()
+    np.testing.assert_array_equal(wins, [5, 0])
+    assert sorted(call.args[-1] for call in submit.call_args_list) == [2, 3]
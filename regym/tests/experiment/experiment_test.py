@@ -0,0 +1,82 @@
+import os
+import sys
+import numpy as np
+
+# Experiment scripts import regym's subpackages as top level modules
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../experiment')))
+
+import experiment
+from experiment import TrainingJob, EnvironmentCreationFunction, schedule_experiment, preprocess_fixed_agents
+from scheduler import WorkStealingScheduler
+from training_process import training_segment
+from rl_algorithms import AgentHook, rockAgent, paperAgent, build_TabularQ_Agent
+from training_schemes import NaiveSelfPlay
+from regym.training_schemes import Menagerie
+from regym.environments import generate_task, EnvType
+
+
+def stub_training_segment(createNewEnvironment, training_agent, self_play_scheme, menagerie,
+                          completed_iterations, target_iteration, process_name, base_path, seed):
+    '''
+    Records the segments each job was trained for in its menagerie,
+    and marks its self play scheme as trained up to :param: target_iteration
+    '''
+    menagerie = (menagerie or []) + [(completed_iterations, target_iteration)]
+    self_play_scheme = self_play_scheme._replace(name=f'{NaiveSelfPlay.name}-{target_iteration}')
+    return training_agent, self_play_scheme, menagerie, AgentHook(rockAgent)
+
+
+def stub_benchmark_worker_matches(agent_vector, agent_ids, episodes):
+    '''
+    The first agent of every matchup wins all episodes
+    '''
+    return np.array([episodes, 0.])
+
+
+def test_schedule_experiment_chains_training_segments_and_aggregates_benchmarks(tmp_path, monkeypatch):
+    segments = []
+    monkeypatch.setattr(experiment, 'training_segment', stub_training_segment)
+    monkeypatch.setattr(experiment, 'benchmark_worker_matches', stub_benchmark_worker_matches)
+    training_jobs = [TrainingJob(NaiveSelfPlay, AgentHook(rockAgent), f'{NaiveSelfPlay.name}-{rockAgent.name}')]
+    initial_fixed_agents, fixed_agents_for_confusion = preprocess_fixed_agents([paperAgent], [10, 20])
+
+    with WorkStealingScheduler(num_workers=2) as scheduler:
+        original_submit = scheduler.submit
+        def recording_submit(function, *args):
+            if function is stub_training_segment: segments.append((args[2], args[3], args[4], args[5]))
+            return original_submit(function, *args)
+        scheduler.submit = recording_submit
+        schedule_experiment(scheduler, training_jobs, initial_fixed_agents, fixed_agents_for_confusion,
+                            checkpoint_at_iterations=[20, 10], benchmarking_episodes=5,
+                            createNewEnvironment=None, results_path=str(tmp_path), seed=1)
+
+    # Each segment starts from the self play scheme and menagerie returned by the previous one
+    assert [(scheme.name, menagerie, start, end) for scheme, menagerie, start, end in segments] == \
+           [(NaiveSelfPlay.name, None, 0, 10), (f'{NaiveSelfPlay.name}-10', [(0, 10)], 10, 20)]
+    for iteration in [10, 20]:
+        # Episodes of each matchup are split across both workers, and their wins summed up
+        confusion_matrix = np.loadtxt(tmp_path / 'confusion_matrices' / f'confusion_matrix-{iteration}.txt', delimiter=',')
+        # Fixed agent (index 1), recorded first, is the first agent of the matchup against the trained agent (index 0)
+        np.testing.assert_array_equal(confusion_matrix, [[0.5, 0.], [1., 0.5]])
+
+
+def test_training_segments_train_on_a_task_created_from_the_environment(tmp_path):
+    createNewEnvironment = EnvironmentCreationFunction('RockPaperScissors-v0')
+    task = generate_task('RockPaperScissors-v0', EnvType.MULTIAGENT_SIMULTANEOUS_ACTION)
+    config = {'learning_rate': 0.9, 'discount_factor': 0.99, 'epsilon_greedy': 0.1,
+              'use_repeated_update_q_learning': False, 'temperature': 1}
+    agent = build_TabularQ_Agent(task, config, 'TQL')
+    for directory in ['episodic_rewards', 'menageries']: os.makedirs(tmp_path / directory)
+
+    (trained_agent, self_play_scheme,
+     menagerie, hooked_agent) = training_segment(createNewEnvironment, AgentHook(agent), NaiveSelfPlay, None,
+                                                 completed_iterations=5, target_iteration=8,
+                                                 process_name='NaiveSelfPlay-TQL',
+                                                 base_path=str(tmp_path), seed=1)
+    assert self_play_scheme.name == NaiveSelfPlay.name
+    assert isinstance(menagerie, Menagerie)
+    assert os.path.exists(tmp_path / 'NaiveSelfPlay-TQL' / '8_iterations.pt')
+    episode_summaries = (tmp_path / 'episodic_rewards' / f'{NaiveSelfPlay.name}-TQL.csv').read_text().splitlines()
+    # Episodes are numbered from the iteration at which the segment starts
+    assert [int(line.split(',')[0]) for line in episode_summaries[1:]] == [5, 6, 7]
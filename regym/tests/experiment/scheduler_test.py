@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../experiment')))
+
+from scheduler import WorkStealingScheduler
+
+
+def square(x):
+    return x ** 2
+
+
+def sleep_then_return(duration, value):
+    time.sleep(duration)
+    return value
+
+
+def failing_task():
+    raise ValueError('Task failure')
+
+
+def failing_initializer(worker_index):
+    raise ValueError('Initializer failure')
+
+
+def crashing_task():
+    os._exit(1)  # Exits without reporting, like a process killed by the OS
+
+
+def test_results_of_all_submitted_tasks_are_returned():
+    with WorkStealingScheduler(num_workers=2) as scheduler:
+        task_ids = {scheduler.submit(square, x): x for x in range(10)}
+        results = dict(scheduler.next_result() for _ in range(10))
+        assert scheduler.pending == 0
+    assert results == {task_id: x ** 2 for task_id, x in task_ids.items()}
+
+
+def test_idle_workers_steal_tasks_queued_behind_a_long_task():
+    with WorkStealingScheduler(num_workers=2) as scheduler:
+        long_task_id = scheduler.submit(sleep_then_return, 3., 'long')
+        # Half of these are queued for the worker running the long task
+        for i in range(6): scheduler.submit(sleep_then_return, 0., i)
+        completion_order = [scheduler.next_result()[0] for _ in range(7)]
+    assert completion_order[-1] == long_task_id
+
+
+def test_failing_tasks_raise_in_the_submitting_process():
+    with WorkStealingScheduler(num_workers=1) as scheduler:
+        scheduler.submit(failing_task)
+        with pytest.raises(RuntimeError, match='Task failure'):
+            scheduler.next_result()
+        # Workers keep running after a task failed
+        task_id = scheduler.submit(square, 3)
+        assert scheduler.next_result() == (task_id, 9)
+
+
+def test_failing_worker_initializers_raise_in_the_submitting_process():
+    with WorkStealingScheduler(num_workers=1, initializer=failing_initializer) as scheduler:
+        scheduler.submit(square, 3)
+        with pytest.raises(RuntimeError, match='Initializer failure'):
+            scheduler.next_result()
+
+
+def test_workers_dying_without_reporting_raise_instead_of_blocking():
+    with WorkStealingScheduler(num_workers=1, poll_interval=0.1) as scheduler:
+        scheduler.submit(crashing_task)
+        with pytest.raises(RuntimeError, match='died'):
+            scheduler.next_result()
@@ -1,3 +1,8 @@
+import pytest
+import numpy as np
+import gym
+import torch
+
 from test_fixtures import a2c_config_dict, CartPoleTask
 from utils import can_act_in_environment
 
@@ -17,3 +22,46 @@ def test_learns_to_solve_cartpole(CartPoleTask, a2c_config_dict):
     for _ in progress_bar:
         trajectory = run_episode(CartPoleTask.env, agent, training=True)
         progress_bar.set_description(f'{agent.name} in {CartPoleTask.env.spec.id}. Episode length: {len(trajectory)}')
+
+
+def test_n_step_targets_are_masked_at_episode_ends(CartPoleTask, a2c_config_dict):
+    agent = build_A2C_Agent(CartPoleTask, a2c_config_dict, 'Test-A2C')
+    gamma = agent.algorithm.discount_factor
+    rewards = torch.tensor([[1., 1.], [2., 1.], [3., 1.]])
+    non_terminals = torch.tensor([[1., 1.], [0., 1.], [1., 1.]])  # First environment's episode ends at t = 1
+    bootstrap_values = torch.tensor([10., 0.])
+
+    targets = agent.algorithm.compute_temporal_differences_targets(rewards, non_terminals, bootstrap_values)
+
+    expected_first_env = [1. + gamma * 2., 2., 3. + gamma * 10.]
+    expected_second_env = [1. + gamma * 1. + gamma**2 * 1., 1. + gamma * 1., 1.]
+    np.testing.assert_allclose(targets[:, 0].numpy(), expected_first_env, rtol=1e-6)
+    np.testing.assert_allclose(targets[:, 1].numpy(), expected_second_env, rtol=1e-6)
+
+
+def test_a2c_updates_from_vectorized_environments(CartPoleTask, a2c_config_dict):
+    agent = build_A2C_Agent(CartPoleTask, a2c_config_dict, 'Test-A2C')
+    initial_parameters = [p.clone() for p in agent.algorithm.model.parameters()]
+
+    num_envs = 4
+    vector_env = gym.vector.make(CartPoleTask.env.spec.id, num_envs=num_envs, asynchronous=False)
+    observations = vector_env.reset()
+    for _ in range(a2c_config_dict['samples_before_update']):
+        actions = agent.take_multiple_actions(observations)
+        succ_observations, rewards, dones, _ = vector_env.step(actions)
+        agent.handle_multiple_experiences(observations, actions, rewards, succ_observations, dones)
+        observations = succ_observations
+
+    assert agent.rollout_length == 0  # A single update has been computed with all samples
+    assert any(not torch.equal(p, initial_p) for p, initial_p in zip(agent.algorithm.model.parameters(), initial_parameters))
+
+
+def test_changing_number_of_environments_mid_rollout_raises_valueerror(CartPoleTask, a2c_config_dict):
+    agent = build_A2C_Agent(CartPoleTask, a2c_config_dict, 'Test-A2C')
+    observation_dim = CartPoleTask.observation_dim
+    agent.handle_multiple_experiences(np.zeros((2, observation_dim)), [0, 1], [1., 1.],
+                                      np.zeros((2, observation_dim)), [False, False])
+    with pytest.raises(ValueError) as _:
+        agent.handle_multiple_experiences(np.zeros((3, observation_dim)), [0, 1, 0], [1., 1., 1.],
+                                          np.zeros((3, observation_dim)), [False, False, False])
+    assert agent.rollout_length == 1  # Stored experiences are kept
@@ -0,0 +1,142 @@
+import os
+import json
+import pytest
+import numpy as np
+import torch
+
+from regym.rl_algorithms.agents import build_PPO_Agent
+from regym.rl_algorithms.agents import build_TabularQ_Agent
+from regym.rl_algorithms.agents import freeze_agent
+from regym.rl_algorithms import CheckpointStore, StoredAgent, save_checkpoint
+
+from test_fixtures import RPSTask
+from test_fixtures import ppo_config_dict, tabular_q_learning_config_dict
+
+
+def update_policy(agent, observation_dim):
+    agent.algorithm.model(torch.rand(1, observation_dim))['v'].sum().backward()
+    agent.algorithm.optimizer.step()
+
+
+def assert_same_weights(model, retrieved_model, atol=0.):
+    for tensor, retrieved_tensor in zip(model.state_dict().values(), retrieved_model.state_dict().values()):
+        if atol == 0.: assert torch.equal(tensor, retrieved_tensor)
+        else: assert torch.allclose(tensor, retrieved_tensor, atol=atol)
+
+
+def test_invalid_delta_encoding_raises_valueerror(tmp_path):
+    with pytest.raises(ValueError) as _:
+        CheckpointStore(str(tmp_path), delta_encoding='gzip')
+
+
+def test_unchanged_tensors_are_stored_once(RPSTask, ppo_config_dict, tmp_path):
+    agent = build_PPO_Agent(RPSTask, ppo_config_dict, 'PPO')
+    store = CheckpointStore(str(tmp_path / 'store'))
+    store.save(agent, 'checkpoint_episode_0')
+    objects_after_first_save = len(os.listdir(tmp_path / 'store' / 'objects'))
+    store.save(agent, 'checkpoint_episode_1')
+
+    assert len(os.listdir(tmp_path / 'store' / 'objects')) == objects_after_first_save
+    assert store.keys() == ['checkpoint_episode_0', 'checkpoint_episode_1']
+    assert_same_weights(agent.algorithm.model, store.load('checkpoint_episode_1').algorithm.model)
+
+
+def test_xor_deltas_reconstruct_snapshots_exactly(RPSTask, ppo_config_dict, tmp_path):
+    agent = build_PPO_Agent(RPSTask, ppo_config_dict, 'PPO')
+    store = CheckpointStore(str(tmp_path / 'store'), delta_encoding='xor', base_interval=3)
+    snapshots = []
+    for i in range(6):
+        store.save(agent, f'checkpoint_episode_{i}')
+        snapshots.append({k: v.clone() for k, v in agent.algorithm.model.state_dict().items()})
+        update_policy(agent, RPSTask.observation_dim)
+
+    for i in [4, 0, 5, 2]:  # Random access
+        retrieved_weights = store.load(f'checkpoint_episode_{i}').algorithm.model.state_dict()
+        assert all(torch.equal(snapshots[i][k], retrieved_weights[k]) for k in snapshots[i])
+
+    checkpoint_path = str(tmp_path / 'checkpoint.pt')
+    save_checkpoint(agent, checkpoint_path, save_optimizer=False)
+    assert store.disk_usage() < 6 * os.path.getsize(checkpoint_path)
+
+
+def test_quantized_deltas_approximate_snapshots(RPSTask, ppo_config_dict, tmp_path):
+    agent = build_PPO_Agent(RPSTask, ppo_config_dict, 'PPO')
+    store = CheckpointStore(str(tmp_path / 'store'), delta_encoding='quantized', quantization_bits=8)
+    store.save(agent, 'base')
+    for _ in range(5): update_policy(agent, RPSTask.observation_dim)
+    store.save(agent, 'delta')
+
+    assert any(entry['encoding'] == 'quantized' for entry in store.entries.values())
+    # 5 Adam steps move each parameter by at most 5 * learning_rate
+    max_error = 5 * ppo_config_dict['learning_rate'] / (2 ** 7 - 1)
+    assert_same_weights(agent.algorithm.model, store.load('delta').algorithm.model, atol=max_error + 1e-7)
+
+
+def test_reopened_store_deduplicates_and_loads_tabular_agents(RPSTask, tabular_q_learning_config_dict, tmp_path):
+    agent = build_TabularQ_Agent(RPSTask, tabular_q_learning_config_dict, 'TQL')
+    agent.algorithm.Q_table.set(0, 1, 3.)
+    CheckpointStore(str(tmp_path / 'store')).save(agent, 'tql_0')
+
+    store = CheckpointStore(str(tmp_path / 'store'))
+    bytes_before = store.disk_usage()
+    handle = store.hook(agent, 'tql_1')
+    assert isinstance(handle, StoredAgent) and 'tql_1' in store
+    # Only the new snapshot's manifest was written
+    assert store.disk_usage() - bytes_before < 4096
+
+    retrieved_agent = handle.load()
+    assert np.array_equal(agent.algorithm.Q_table, retrieved_agent.algorithm.Q_table)
+    assert retrieved_agent.take_action(RPSTask.env.reset()[0], None) in range(RPSTask.action_dim)
+
+
+def test_sparse_q_tables_are_stored_without_pickling(RPSTask, tabular_q_learning_config_dict, tmp_path):
+    agent = build_TabularQ_Agent(RPSTask, {**tabular_q_learning_config_dict, 'q_table_backend': 'sparse'}, 'TQL')
+    store = CheckpointStore(str(tmp_path / 'store'), delta_encoding='xor')
+    agent.algorithm.Q_table.set(0, 1, 3.)
+    store.save(agent, 'tql_0')
+    agent.algorithm.Q_table.set(2, 0, 1.)
+    store.save(agent, 'tql_1')
+
+    with open(tmp_path / 'store' / 'snapshots' / 'tql_1.json') as f: assert 'skeleton' not in json.load(f)
+    retrieved_q_table = store.load('tql_1').algorithm.Q_table
+    assert list(retrieved_q_table.table) == [0, 2]
+    assert np.array_equal(retrieved_q_table.table[2], agent.algorithm.Q_table.table[2])
+
+
+def test_frozen_agents_can_be_stored(RPSTask, ppo_config_dict, tmp_path):
+    agent = build_PPO_Agent(RPSTask, ppo_config_dict, 'PPO')
+    store = CheckpointStore(str(tmp_path / 'store'), delta_encoding='xor')
+    store.save(freeze_agent(agent), 'frozen_0')
+    update_policy(agent, RPSTask.observation_dim)
+    store.save(freeze_agent(agent), 'frozen_1')
+
+    retrieved_agent = store.load('frozen_1')
+    assert not retrieved_agent.training
+    assert_same_weights(agent.algorithm.model, retrieved_agent.policy_agent.algorithm.model)
+
+
+def test_gc_removes_objects_of_overwritten_and_deleted_snapshots(RPSTask, ppo_config_dict, tmp_path):
+    agent = build_PPO_Agent(RPSTask, ppo_config_dict, 'PPO')
+    store = CheckpointStore(str(tmp_path / 'store'), delta_encoding='xor', base_interval=2)
+    for i in range(3):
+        store.save(agent, 'latest')
+        update_policy(agent, RPSTask.observation_dim)
+    store.save(agent, 'checkpoint_episode_3')
+    usage_before_gc = store.disk_usage()
+
+    assert store.gc() > 0
+    assert store.disk_usage() < usage_before_gc
+    for key in ['latest', 'checkpoint_episode_3']: store.load(key)
+
+    store.delete('latest')
+    store.gc()
+    update_policy(agent, RPSTask.observation_dim)
+    store.save(agent, 'checkpoint_episode_4')  # Stored as a difference against a base no snapshot points to
+    assert store.keys() == ['checkpoint_episode_3', 'checkpoint_episode_4']
+    assert_same_weights(agent.algorithm.model, store.load('checkpoint_episode_4').algorithm.model)
+
+    store.delete('checkpoint_episode_3')
+    store.delete('checkpoint_episode_4')
+    store.gc()
+    base_objects = {entry['object'] for _, entry in store.base_tensors.values()}
+    assert set(os.listdir(tmp_path / 'store' / 'objects')) == base_objects
@@ -0,0 +1,193 @@
+import os
+import zipfile
+import pytest
+import numpy as np
+import torch
+
+from regym.rl_algorithms.agents import build_PPO_Agent
+from regym.rl_algorithms.agents import build_DQN_Agent
+from regym.rl_algorithms.agents import build_TabularQ_Agent
+from regym.rl_algorithms.replay_buffers import EXP
+from regym.rl_algorithms import save_checkpoint, load_checkpoint, read_checkpoint_config, weights_only_copy
+from regym.rl_algorithms import load_population_from_path
+from regym.rl_algorithms import freeze_agent
+from regym.rl_algorithms import checkpoint
+
+from test_fixtures import RPSTask
+from test_fixtures import ppo_config_dict, dqn_config_dict, tabular_q_learning_config_dict
+
+
+def test_ppo_checkpoint_restores_weights_and_config(RPSTask, ppo_config_dict, tmp_path):
+    agent = build_PPO_Agent(RPSTask, ppo_config_dict, 'PPO')
+    save_path = str(tmp_path / 'ppo.pt')
+    save_checkpoint(agent, save_path)
+
+    config = read_checkpoint_config(save_path)
+    assert config['agent_class'] == 'PPOAgent' and config['name'] == 'PPO'
+    assert config['hyperparameters']['horizon'] == ppo_config_dict['horizon']
+
+    retrieved_agent = load_checkpoint(save_path)
+    assert_same_weights(agent.algorithm.model, retrieved_agent.algorithm.model)
+    # Optimizers are recreated over the loaded parameters
+    optimized_parameters = retrieved_agent.algorithm.optimizer.param_groups[0]['params']
+    assert all(p1 is p2 for p1, p2 in zip(optimized_parameters, retrieved_agent.algorithm.model.parameters()))
+
+
+def test_agents_are_rebuilt_from_their_config_without_unpickling(RPSTask, ppo_config_dict, tmp_path, monkeypatch):
+    agent = build_PPO_Agent(RPSTask, ppo_config_dict, 'PPO')
+    agent.algorithm.policy_updates = 7
+    save_path = str(tmp_path / 'ppo.pt')
+    save_checkpoint(agent, save_path)
+
+    with zipfile.ZipFile(save_path) as archive: assert 'skeleton.pt' not in archive.namelist()
+    config = read_checkpoint_config(save_path)
+    assert config['build']['builder'] == ['regym.rl_algorithms.agents.ppo_agent', 'build_PPO_Agent']
+    assert config['build']['config'] == ppo_config_dict
+
+    deserialize = checkpoint._deserialize
+
+    def deserialize_weights_only(content, weights_only=False):
+        assert weights_only, 'Checkpoint was unpickled'
+        return deserialize(content, weights_only=True)
+    monkeypatch.setattr(checkpoint, '_deserialize', deserialize_weights_only)
+    retrieved_agent = load_checkpoint(save_path)
+    assert retrieved_agent.algorithm.policy_updates == 7
+    assert_same_weights(agent.algorithm.model, retrieved_agent.algorithm.model)
+
+
+def test_half_precision_frozen_agent_is_rebuilt(RPSTask, ppo_config_dict, tmp_path):
+    frozen_agent = freeze_agent(build_PPO_Agent(RPSTask, ppo_config_dict, 'PPO'), half_precision=True)
+    save_path = str(tmp_path / 'frozen_ppo.pt')
+    save_checkpoint(frozen_agent, save_path)
+
+    retrieved_agent = load_checkpoint(save_path)
+    assert type(retrieved_agent) is type(frozen_agent) and retrieved_agent.half_precision
+    assert not retrieved_agent.training
+    assert all(p.dtype == torch.float16 for p in retrieved_agent.policy_agent.algorithm.model.parameters())
+    assert_same_weights(frozen_agent.policy_agent.algorithm.model, retrieved_agent.policy_agent.algorithm.model)
+    assert retrieved_agent.take_action(RPSTask.env.reset()[0], None) in range(RPSTask.action_dim)
+
+
+def test_optimizer_state_is_only_loaded_if_requested(RPSTask, ppo_config_dict, tmp_path):
+    agent = build_PPO_Agent(RPSTask, ppo_config_dict, 'PPO')
+    agent.algorithm.model(torch.rand(1, RPSTask.observation_dim))['v'].sum().backward()
+    agent.algorithm.optimizer.step()
+    save_path = str(tmp_path / 'ppo.pt')
+    save_checkpoint(agent, save_path, save_optimizer=True)
+
+    assert len(load_checkpoint(save_path).algorithm.optimizer.state) == 0
+    assert len(load_checkpoint(save_path, load_optimizer=True).algorithm.optimizer.state) > 0
+
+
+def test_dqn_replay_buffer_is_saved_in_shards(RPSTask, dqn_config_dict, tmp_path):
+    agent = build_DQN_Agent(RPSTask, dqn_config_dict, 'DQN')
+    for i in range(25):
+        agent.algorithm.replayBuffer.push(EXP(torch.rand(1, 3), torch.LongTensor([i % 3]), torch.rand(1, 3), torch.ones(1), False))
+    save_path = str(tmp_path / 'dqn.pt')
+    save_checkpoint(agent, save_path, save_buffers=True, buffer_shard_size=10)
+    assert len(read_checkpoint_config(save_path)['buffers']['replayBuffer']['shards']) == 1 + 3
+
+    retrieved_agent = load_checkpoint(save_path)
+    assert retrieved_agent.algorithm.replayBuffer.current_size == 0
+
+    retrieved_agent = load_checkpoint(save_path, load_buffers=True)
+    retrieved_buffer, buffer = retrieved_agent.algorithm.replayBuffer, agent.algorithm.replayBuffer
+    assert retrieved_buffer.current_size == buffer.current_size == 25
+    assert retrieved_buffer.position == buffer.position
+    assert all(torch.equal(e1.state, e2.state) for e1, e2 in zip(retrieved_buffer.memory[:25], buffer.memory[:25]))
+    assert_same_weights(agent.algorithm.target_model, retrieved_agent.algorithm.target_model)
+
+
+def test_checkpoint_is_smaller_than_pickled_agent(RPSTask, dqn_config_dict, tmp_path):
+    agent = build_DQN_Agent(RPSTask, dqn_config_dict, 'DQN')
+    for i in range(int(dqn_config_dict['memoryCapacity'])):
+        agent.algorithm.replayBuffer.push(EXP(torch.rand(1, 3), torch.LongTensor([i % 3]), torch.rand(1, 3), torch.ones(1), False))
+    checkpoint_path, pickle_path = str(tmp_path / 'checkpoint.pt'), str(tmp_path / 'pickle.pt')
+    save_checkpoint(agent, checkpoint_path, save_optimizer=False)
+    torch.save(agent, pickle_path)
+    assert os.path.getsize(checkpoint_path) * 10 < os.path.getsize(pickle_path)
+
+
+def test_tql_checkpoint_restores_q_table(RPSTask, tabular_q_learning_config_dict, tmp_path):
+    agent = build_TabularQ_Agent(RPSTask, tabular_q_learning_config_dict, 'TQL')
+    agent.algorithm.Q_table.set(0, 1, 3.)
+    save_path = str(tmp_path / 'tql.pt')
+    save_checkpoint(agent, save_path)
+
+    retrieved_agent = load_checkpoint(save_path)
+    assert np.array_equal(agent.algorithm.Q_table, retrieved_agent.algorithm.Q_table)
+    assert retrieved_agent.take_action(RPSTask.env.reset()[0], None) in range(RPSTask.action_dim)
+
+
+def test_tql_checkpoint_restores_sparse_q_table(RPSTask, tabular_q_learning_config_dict, tmp_path):
+    config = {**tabular_q_learning_config_dict, 'q_table_backend': 'sparse', 'q_table_capacity': 10}
+    agent = build_TabularQ_Agent(RPSTask, config, 'TQL')
+    agent.algorithm.Q_table.set(3, 1, 3.)
+    agent.algorithm.Q_table.set(0, 2, 1.)
+    save_path = str(tmp_path / 'tql.pt')
+    save_checkpoint(agent, save_path)
+
+    retrieved_q_table = load_checkpoint(save_path).algorithm.Q_table
+    assert retrieved_q_table.capacity == 10
+    assert list(retrieved_q_table.table) == list(agent.algorithm.Q_table.table)
+    assert all(np.array_equal(retrieved_q_table.table[s], agent.algorithm.Q_table.table[s]) for s in [0, 3])
+
+
+def test_can_load_population_of_checkpoints_and_pickled_agents(RPSTask, tabular_q_learning_config_dict, tmp_path):
+    agent = build_TabularQ_Agent(RPSTask, tabular_q_learning_config_dict, 'TQL')
+    save_checkpoint(agent, str(tmp_path / 'agent_0.pt'))
+    torch.save(agent, str(tmp_path / 'agent_1.pt'))
+
+    population = load_population_from_path(str(tmp_path), sort_fn=lambda f: f)
+    assert len(population) == 2
+    for retrieved_agent in population:
+        assert np.array_equal(agent.algorithm.Q_table, retrieved_agent.algorithm.Q_table)
+
+
+def assert_same_weights(model, retrieved_model):
+    for (name, tensor), (retrieved_name, retrieved_tensor) in zip(model.state_dict().items(), retrieved_model.state_dict().items()):
+        assert name == retrieved_name
+        assert torch.equal(tensor, retrieved_tensor)
+
+
+def test_weights_only_copy_does_not_copy_replay_buffer(RPSTask, dqn_config_dict):
+    agent = build_DQN_Agent(RPSTask, dqn_config_dict, 'DQN')
+    for i in range(25):
+        agent.algorithm.replayBuffer.push(EXP(torch.rand(1, 3), torch.LongTensor([i % 3]), torch.rand(1, 3), torch.ones(1), False))
+    copied_agent = weights_only_copy(agent)
+
+    assert not copied_agent.training
+    assert copied_agent.algorithm.replayBuffer.current_size == 0
+    assert_same_weights(agent.algorithm.model, copied_agent.algorithm.model)
+    assert all(p1.data_ptr() != p2.data_ptr() for p1, p2 in zip(agent.algorithm.model.parameters(),
+                                                                copied_agent.algorithm.model.parameters()))
+
+
+def test_optimizer_over_several_modules_is_recreated(RPSTask, dqn_config_dict, tmp_path):
+    agent = build_DQN_Agent(RPSTask, dqn_config_dict, 'DQN')
+    algorithm = agent.algorithm
+    algorithm.optimizer = torch.optim.SGD([{'params': algorithm.model.parameters(), 'lr': 0.1},
+                                           {'params': algorithm.target_model.parameters()}], lr=0.01)
+    save_path = str(tmp_path / 'dqn.pt')
+    save_checkpoint(agent, save_path)
+
+    for retrieved_agent in [load_checkpoint(save_path), weights_only_copy(agent)]:
+        model_group, target_model_group = retrieved_agent.algorithm.optimizer.param_groups
+        assert model_group['lr'] == 0.1 and target_model_group['lr'] == 0.01
+        assert all(p1 is p2 for p1, p2 in zip(model_group['params'], retrieved_agent.algorithm.model.parameters()))
+        assert all(p1 is p2 for p1, p2 in zip(target_model_group['params'], retrieved_agent.algorithm.target_model.parameters()))
+
+
+def test_optimizers_which_cannot_be_recreated_are_refused_at_save_time(RPSTask, ppo_config_dict, tmp_path):
+    agent = build_PPO_Agent(RPSTask, ppo_config_dict, 'PPO')
+
+    class LocalOptimizer(torch.optim.SGD):
+        pass
+
+    agent.algorithm.optimizer = LocalOptimizer(agent.algorithm.model.parameters(), lr=0.1)
+    with pytest.raises(ValueError):
+        save_checkpoint(agent, str(tmp_path / 'local_optimizer.pt'))
+
+    agent.algorithm.optimizer = torch.optim.SGD([torch.nn.Parameter(torch.zeros(1))], lr=0.1)
+    with pytest.raises(ValueError):
+        save_checkpoint(agent, str(tmp_path / 'foreign_parameters.pt'))
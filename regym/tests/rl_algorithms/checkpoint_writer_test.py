@@ -0,0 +1,73 @@
+import time
+import threading
+import pytest
+import numpy as np
+import torch
+
+from regym.rl_algorithms.agents import build_PPO_Agent
+from regym.rl_algorithms.agents import build_TabularQ_Agent
+from regym.rl_algorithms.agent_hook import AgentHook
+from regym.rl_algorithms import AsyncCheckpointWriter, load_checkpoint
+from regym.rl_algorithms import checkpoint_writer as checkpoint_writer_module
+
+from test_fixtures import RPSTask
+from test_fixtures import ppo_config_dict, tabular_q_learning_config_dict
+
+
+def test_saved_checkpoint_is_a_snapshot_of_the_agent_when_saved(RPSTask, ppo_config_dict, tmp_path):
+    agent = build_PPO_Agent(RPSTask, ppo_config_dict, 'PPO')
+    weights = {k: v.clone() for k, v in agent.algorithm.model.state_dict().items()}
+    writer = AsyncCheckpointWriter()
+    save_path = str(tmp_path / 'ppo.pt')
+    future = writer.save(agent, save_path)
+
+    # Updating the agent while its checkpoint is (possibly) being written
+    agent.algorithm.model(torch.rand(1, RPSTask.observation_dim))['v'].sum().backward()
+    agent.algorithm.optimizer.step()
+    writer.flush()
+
+    assert future.result() == save_path and len(writer) == 0
+    retrieved_weights = load_checkpoint(save_path).algorithm.model.state_dict()
+    assert all(torch.equal(weights[k], retrieved_weights[k]) for k in weights)
+    writer.close()
+
+
+def test_saving_blocks_when_too_many_checkpoints_are_pending(RPSTask, tabular_q_learning_config_dict, tmp_path, monkeypatch):
+    can_write = threading.Event()
+    monkeypatch.setattr(checkpoint_writer_module, '_write_checkpoint',
+                        lambda path, config, members, fsync: can_write.wait())
+    agent = build_TabularQ_Agent(RPSTask, tabular_q_learning_config_dict, 'TQL')
+    writer = AsyncCheckpointWriter(max_pending=1)
+    submitted = []
+
+    def save_checkpoints():
+        for i in range(3): submitted.append(writer.save(agent, str(tmp_path / f'tql_{i}.pt')))
+    saving_thread = threading.Thread(target=save_checkpoints)
+    saving_thread.start()
+    time.sleep(0.5)
+    # One checkpoint is being written, one is queued, the third save is blocked
+    assert len(submitted) == 2 and saving_thread.is_alive()
+
+    can_write.set()
+    saving_thread.join(timeout=5)
+    writer.close()
+    assert len(submitted) == 3 and all(future.done() for future in submitted)
+
+
+def test_write_errors_are_raised_on_flush(RPSTask, tabular_q_learning_config_dict, tmp_path):
+    agent = build_TabularQ_Agent(RPSTask, tabular_q_learning_config_dict, 'TQL')
+    writer = AsyncCheckpointWriter()
+    writer.save(agent, str(tmp_path / 'missing_directory' / 'tql.pt'))
+    with pytest.raises(FileNotFoundError) as _:
+        writer.flush()
+
+
+def test_agenthook_waits_for_asynchronous_write_before_loading(RPSTask, tabular_q_learning_config_dict, tmp_path):
+    agent = build_TabularQ_Agent(RPSTask, tabular_q_learning_config_dict, 'TQL')
+    agent.algorithm.Q_table.set(0, 2, 1.)
+    writer = AsyncCheckpointWriter()
+    hook = AgentHook(agent, save_path=str(tmp_path / 'tql.pt'), checkpoint_writer=writer)
+
+    retrieved_agent = AgentHook.unhook(hook)
+    assert np.array_equal(agent.algorithm.Q_table, retrieved_agent.algorithm.Q_table)
+    writer.close()
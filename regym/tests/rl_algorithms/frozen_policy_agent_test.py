@@ -0,0 +1,88 @@
+import os
+import numpy as np
+import torch
+
+from regym.rl_algorithms.agents import build_PPO_Agent
+from regym.rl_algorithms.agents import build_DQN_Agent
+from regym.rl_algorithms.agents import build_TabularQ_Agent
+from regym.rl_algorithms.agents import FrozenPolicyAgent, freeze_agent
+from regym.rl_algorithms.agent_hook import AgentHook, AgentType
+from regym.rl_algorithms.replay_buffers import EXP
+
+from test_fixtures import RPSTask
+from test_fixtures import ppo_config_dict, ppo_rnn_config_dict, dqn_config_dict, tabular_q_learning_config_dict
+
+
+def test_frozen_agent_only_holds_policy(RPSTask, dqn_config_dict):
+    agent = build_DQN_Agent(RPSTask, dqn_config_dict, 'DQN')
+    agent.algorithm.replayBuffer.push(EXP(torch.rand(1, 3), torch.LongTensor([0]), torch.rand(1, 3), torch.ones(1), False))
+    frozen_agent = freeze_agent(agent)
+
+    assert isinstance(frozen_agent, FrozenPolicyAgent)
+    assert frozen_agent.name == agent.name and not frozen_agent.training
+    assert frozen_agent.policy_agent.algorithm.optimizer is None
+    assert frozen_agent.policy_agent.algorithm.replayBuffer is None
+    observation = torch.rand(1, RPSTask.observation_dim)
+    assert torch.equal(agent.algorithm.model(observation)['a'], frozen_agent.policy_agent.algorithm.model(observation)['a'])
+
+
+def test_frozen_agent_policy_does_not_change_with_trained_agent(RPSTask, ppo_config_dict):
+    agent = build_PPO_Agent(RPSTask, ppo_config_dict, 'PPO')
+    frozen_agent = freeze_agent(agent)
+    observation = torch.rand(1, RPSTask.observation_dim)
+    value = frozen_agent.policy_agent.algorithm.model(observation)['v']
+
+    agent.algorithm.model(observation)['v'].sum().backward()
+    agent.algorithm.optimizer.step()
+    assert torch.equal(value, frozen_agent.policy_agent.algorithm.model(observation)['v'])
+
+
+def test_half_precision_frozen_agent_acts_like_original(RPSTask, ppo_config_dict, ppo_rnn_config_dict):
+    for config in [ppo_config_dict, ppo_rnn_config_dict]:
+        agent = build_PPO_Agent(RPSTask, config, 'PPO')
+        frozen_agent = freeze_agent(agent, half_precision=True)
+        model = frozen_agent.policy_agent.algorithm.model
+        assert all(p.dtype == torch.float16 for p in model.parameters())
+
+        observation = torch.rand(1, RPSTask.observation_dim)
+        rnn_states = {}
+        if agent.recurrent:
+            agent._pre_process_rnn_states()
+            frozen_agent.policy_agent._pre_process_rnn_states()
+            rnn_states = {'rnn_states': frozen_agent.policy_agent.rnn_states}
+        with torch.no_grad():
+            half_precision_prediction = model(observation, **rnn_states)
+            prediction = agent.algorithm.model(observation, **({'rnn_states': agent.rnn_states} if agent.recurrent else {}))
+        assert half_precision_prediction['v'].dtype == torch.float32
+        assert torch.allclose(prediction['v'], half_precision_prediction['v'], atol=1e-2)
+
+
+def test_frozen_tabular_agent_can_act_in_half_precision(RPSTask, tabular_q_learning_config_dict):
+    agent = build_TabularQ_Agent(RPSTask, tabular_q_learning_config_dict, 'TQL')
+    agent.algorithm.Q_table.set(0, 2, 1.)
+    frozen_agent = freeze_agent(agent, half_precision=True)
+
+    assert np.asarray(frozen_agent.policy_agent.algorithm.Q_table).dtype == np.float16
+    assert frozen_agent.take_action(RPSTask.env.reset()[0], None) in range(RPSTask.action_dim)
+    frozen_agent.handle_experience(None, None, None, None, False)
+
+
+def test_frozen_agent_clones_share_weights(RPSTask, ppo_config_dict):
+    frozen_agent = freeze_agent(build_PPO_Agent(RPSTask, ppo_config_dict, 'PPO'))
+    clone = frozen_agent.clone()
+    assert clone is not frozen_agent and clone.policy_agent is not frozen_agent.policy_agent
+    assert clone.policy_agent.algorithm.model is frozen_agent.policy_agent.algorithm.model
+
+
+def test_can_save_and_load_frozen_agent_from_agenthook(RPSTask, ppo_config_dict, tmp_path):
+    agent = build_PPO_Agent(RPSTask, ppo_config_dict, 'PPO')
+    full_precision_path, half_precision_path = str(tmp_path / 'frozen.pt'), str(tmp_path / 'frozen_half.pt')
+    hook = AgentHook(freeze_agent(agent), save_path=full_precision_path)
+    AgentHook(freeze_agent(agent, half_precision=True), save_path=half_precision_path)
+    assert hook.type == AgentType.FrozenPolicyAgent
+    assert os.path.getsize(half_precision_path) < os.path.getsize(full_precision_path)
+
+    retrieved_agent = AgentHook.unhook(hook)
+    assert isinstance(retrieved_agent, FrozenPolicyAgent)
+    for p1, p2 in zip(agent.algorithm.model.parameters(), retrieved_agent.policy_agent.algorithm.model.parameters()):
+        assert torch.equal(p1, p2)
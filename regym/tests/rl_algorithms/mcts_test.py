@@ -5,6 +5,12 @@ from test_fixtures import mcts_config_dict, Connect4Task, RandomWalkTask
 from utils import can_act_in_environment
 
 from regym.rl_algorithms.agents import build_MCTS_Agent
+from regym.rl_algorithms.MCTS.transposition_table import TranspositionTable
+from regym.rl_algorithms.MCTS.rollout import PlayoutResults
+from regym.rl_algorithms.MCTS.sequential_puct_node import SequentialPUCTNode
+from regym.rl_algorithms.MCTS.node_pool import NodePool
+from regym.rl_algorithms.MCTS.util import PUCT
+from regym.rl_algorithms.networks import CategoricalActorCriticNet
 from regym.util.play_matches import extract_winner
 
 
@@ -49,3 +55,165 @@ def test_can_coordinate_in_random_walk(RandomWalkTask, mcts_config_dict):
     np.testing.assert_array_equal(expected_end_state, actual_end_state_p1)
     np.testing.assert_array_equal(expected_end_state, actual_end_state_p2)
 
+
+
+def test_non_positive_time_budget_raises_value_error(Connect4Task):
+    config = {'time_budget': 0., 'rollout_budget': 10}
+    with pytest.raises(ValueError) as _:
+        _ = build_MCTS_Agent(Connect4Task, config, 'name')
+
+
+def test_either_budget_or_time_budget_must_be_specified(Connect4Task):
+    config = {'rollout_budget': 10}
+    with pytest.raises(ValueError) as _:
+        _ = build_MCTS_Agent(Connect4Task, config, 'name')
+
+
+def test_time_budget_bounds_search(RandomWalkTask, mcts_config_dict):
+    del mcts_config_dict['budget']
+    mcts_config_dict['time_budget'] = 0.05
+    mcts_config_dict['rollout_budget'] = 0
+    mcts = build_MCTS_Agent(RandomWalkTask, mcts_config_dict, agent_name='MCTS-test')
+
+    _ = mcts.take_action(RandomWalkTask.env.clone(), player_index=0)
+
+    assert mcts.search_statistics.iterations >= 1
+    # Allow for the last iteration to overshoot the deadline
+    assert mcts.search_statistics.elapsed_time < 10 * mcts_config_dict['time_budget']
+
+
+def test_node_budget_bounds_search(RandomWalkTask, mcts_config_dict):
+    mcts_config_dict['budget'] = 1000
+    mcts_config_dict['node_budget'] = 10
+    mcts_config_dict['rollout_budget'] = 0
+    mcts = build_MCTS_Agent(RandomWalkTask, mcts_config_dict, agent_name='MCTS-test')
+
+    _ = mcts.take_action(RandomWalkTask.env.clone(), player_index=0)
+
+    assert mcts.search_statistics.nodes == mcts_config_dict['node_budget']
+    assert mcts.search_statistics.iterations < mcts_config_dict['budget']
+
+
+def test_transposition_table_evicts_least_recently_used_entry():
+    table = TranspositionTable(capacity=2)
+    table.store('a', 1)
+    table.store('b', 2)
+    assert table.lookup('a') == 1  # 'b' is now the least recently used entry
+    table.store('c', 3)
+
+    assert len(table) == 2
+    assert 'b' not in table
+    assert table.lookup('a') == 1 and table.lookup('c') == 3
+    assert table.evictions == 1
+
+
+def test_transposition_table_is_only_supported_in_sequential_tasks(RandomWalkTask, mcts_config_dict):
+    mcts_config_dict['transposition_table_size'] = 100
+    with pytest.raises(ValueError) as _:
+        _ = build_MCTS_Agent(RandomWalkTask, mcts_config_dict, 'name')
+
+
+def test_mcts_with_transposition_table_can_take_actions(Connect4Task, mcts_config_dict):
+    mcts_config_dict['budget'] = 50
+    mcts_config_dict['transposition_table_size'] = 1000
+    mcts1 = build_MCTS_Agent(Connect4Task, mcts_config_dict, agent_name='MCTS1-test')
+    mcts2 = build_MCTS_Agent(Connect4Task, mcts_config_dict, agent_name='MCTS2-test')
+    Connect4Task.run_episode([mcts1, mcts2], training=False)
+
+
+def test_can_coordinate_in_random_walk_with_multiple_playouts(RandomWalkTask, mcts_config_dict):
+    mcts_config_dict['budget'] = 100
+    mcts_config_dict['rollout_budget'] = 5
+    mcts_config_dict['num_playouts'] = 4
+
+    mcts1 = build_MCTS_Agent(RandomWalkTask, mcts_config_dict, agent_name='MCTS1-test')
+    mcts2 = build_MCTS_Agent(RandomWalkTask, mcts_config_dict, agent_name='MCTS2-test')
+
+    trajectory = RandomWalkTask.run_episode([mcts1, mcts2], training=False)
+
+    np.testing.assert_array_equal([3, 3], trajectory[-1][-2][0])
+
+
+def test_playout_results_average_terminal_results_and_truncated_values():
+    class FixedResultState():
+        def __init__(self, result): self.result = result
+        def get_result(self, player_index): return self.result
+
+    evaluated_states = []
+    def value_function(states, player_index):
+        evaluated_states.append(len(states))
+        return [0.5 for _ in states]
+
+    results = PlayoutResults(states=[FixedResultState(1), FixedResultState(0), FixedResultState(0)],
+                             terminal_flags=[True, True, False],
+                             value_function=value_function)
+
+    assert results(0) == (1 + 0 + 0.5) / 3
+    assert results(0) == (1 + 0 + 0.5) / 3  # Results are cached per player
+    assert evaluated_states == [1]  # Truncated playouts are evaluated in a single batch
+
+
+def test_neural_guided_mcts_is_only_supported_in_sequential_tasks(RandomWalkTask):
+    config = {'budget': 10, 'evaluation_function': lambda obs, players, moves: None}
+    with pytest.raises(ValueError) as _:
+        _ = build_MCTS_Agent(RandomWalkTask, config, 'name')
+
+
+def test_virtual_loss_discourages_selecting_nodes_with_pending_evaluations():
+    root = SequentialPUCTNode(player=0)
+    root.expand(moves=[0, 1], priors=[0.5, 0.5])
+    first, second = root.child_nodes
+    assert PUCT(root, first) == PUCT(root, second)
+
+    first.add_virtual_loss()
+    assert PUCT(root, first) < PUCT(root, second)
+    first.update(0.)  # Reverts virtual loss
+    assert first.virtual_losses == 0 and first.visits == 1
+
+
+def test_neural_guided_mcts_can_take_actions(Connect4Task):
+    model = CategoricalActorCriticNet(state_dim=Connect4Task.observation_dim,
+                                      action_dim=Connect4Task.action_dim)
+    config = {'budget': 20, 'model': model, 'evaluation_batch_size': 4}
+    mcts1 = build_MCTS_Agent(Connect4Task, config, agent_name='MCTS1-test')
+    mcts2 = build_MCTS_Agent(Connect4Task, config, agent_name='MCTS2-test')
+    Connect4Task.run_episode([mcts1, mcts2], training=False)
+    assert mcts1.search_statistics.iterations == config['budget']
+
+
+def test_node_pool_prunes_least_visited_subtree_and_recycles_nodes():
+    class Node():
+        def __init__(self, parent=None, visits=1):
+            self.parent_node, self.visits, self.child_nodes = parent, visits, []
+            if parent is not None: parent.child_nodes.append(self)
+        def remove_child(self, node): self.child_nodes.remove(node)
+
+    pool = NodePool(capacity=4, prune_fraction=0.25)
+    root = pool.acquire(Node, visits=10)
+    pool.set_roots([root])
+    most_visited = pool.acquire(Node, parent=root, visits=5)
+    least_visited = pool.acquire(Node, parent=root, visits=2)
+    _ = pool.acquire(Node, parent=most_visited, visits=3)
+
+    new_node = pool.acquire(Node, parent=most_visited, visits=0)  # Pool is full
+
+    assert least_visited not in root.child_nodes
+    assert len(pool) == 4
+    assert pool.statistics().pruned_nodes == 1
+    assert pool.statistics().recycled_nodes == 1  # Pruned node was recycled into new_node
+    assert new_node in most_visited.child_nodes
+
+
+def test_mcts_with_bounded_memory_can_coordinate_in_random_walk(RandomWalkTask, mcts_config_dict):
+    mcts_config_dict['budget'] = 100
+    mcts_config_dict['rollout_budget'] = 0
+    mcts_config_dict['memory_capacity'] = 50
+
+    mcts1 = build_MCTS_Agent(RandomWalkTask, mcts_config_dict, agent_name='MCTS1-test')
+    mcts2 = build_MCTS_Agent(RandomWalkTask, mcts_config_dict, agent_name='MCTS2-test')
+
+    trajectory = RandomWalkTask.run_episode([mcts1, mcts2], training=False)
+
+    np.testing.assert_array_equal([3, 3], trajectory[-1][-2][0])
+    assert mcts1.memory_statistics.peak_live_nodes <= mcts_config_dict['memory_capacity']
+    assert mcts1.memory_statistics.live_nodes == 0  # Trees are released after every search
@@ -21,6 +21,18 @@ def test_ppo_can_take_actions(RPSTask, ppo_config_dict):
         # assert RPSenv.action_space.contains([a, a])
 
 
+def test_ppo_takes_batched_actions_with_a_single_forward_pass(RPSTask, ppo_config_dict):
+    from unittest import mock
+    agent = build_PPO_Agent(RPSTask, ppo_config_dict, 'PPO')
+    observations = [RPSTask.env.observation_space.sample()[0] for _ in range(3)]
+    with mock.patch.object(agent.algorithm, 'model', wraps=agent.algorithm.model) as model:
+        actions = agent.take_actions(observations)
+    assert model.call_count == 1
+    assert len(actions) == 3 and all(0 <= a < RPSTask.action_dim for a in actions)
+    assert [int(prediction['a']) for prediction in agent.current_predictions] == actions
+    assert all(prediction['log_pi_a'].shape == (1, 1) for prediction in agent.current_predictions)
+
+
 def test_learns_to_beat_rock_in_RPS(RPSTask, ppo_config_dict):
     '''
     Test used to make sure that agent is 'learning' by learning a best response
@@ -1,7 +1,12 @@
+import numpy as np
+import gym
+import torch
+
 from test_fixtures import reinforce_config_dict, CartPoleTask
 from utils import can_act_in_environment
 
 from regym.rl_algorithms.agents import build_Reinforce_Agent
+from regym.rl_algorithms.reinforce.reinforce import discounted_returns
 from regym.rl_loops.singleagent_loops.rl_loop import run_episode
 
 
@@ -17,3 +22,28 @@ def test_learns_to_solve_cartpole(CartPoleTask, reinforce_config_dict):
     for _ in progress_bar:
         trajectory = run_episode(CartPoleTask.env, agent, training=True)
         progress_bar.set_description(f'{agent.name} in {CartPoleTask.env.spec.id}. Episode length: {len(trajectory)}')
+
+
+def test_discounted_returns_are_rewards_to_go():
+    rewards = np.array([1., 0., 2.])
+    np.testing.assert_allclose(discounted_returns(rewards, discount_factor=0.5), [1. + 0.5 * 0. + 0.25 * 2., 0. + 0.5 * 2., 2.])
+    np.testing.assert_allclose(discounted_returns(rewards, discount_factor=1.), [3., 2., 2.])
+
+
+def test_reinforce_learns_from_vectorized_environments(CartPoleTask, reinforce_config_dict):
+    reinforce_config_dict['episodes_before_update'] = 4
+    reinforce_config_dict['use_baseline'] = True
+    agent = build_Reinforce_Agent(CartPoleTask, reinforce_config_dict, 'Test-Reinforce')
+    initial_parameters = [p.clone() for p in agent.algorithm.model.parameters()]
+
+    num_envs = 3
+    vector_env = gym.vector.make(CartPoleTask.env.spec.id, num_envs=num_envs, asynchronous=False)
+    observations = vector_env.reset()
+    while agent.completed_episodes < reinforce_config_dict['episodes_before_update']:
+        actions = agent.take_multiple_actions(observations)
+        assert len(actions) == num_envs
+        succ_observations, rewards, dones, _ = vector_env.step(actions)
+        agent.handle_multiple_experiences(observations, actions, rewards, succ_observations, dones)
+        observations = succ_observations
+
+    assert any(not torch.equal(p, initial_p) for p, initial_p in zip(agent.algorithm.model.parameters(), initial_parameters))
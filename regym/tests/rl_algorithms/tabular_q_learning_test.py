@@ -1,5 +1,12 @@
+import multiprocessing
+
+import pytest
+import numpy as np
+
 from regym.rl_algorithms import rockAgent
 from regym.rl_algorithms.agents import build_TabularQ_Agent
+from regym.rl_algorithms.TQL.util import stable_softmax, random_argmax
+from regym.rl_algorithms.TQL.q_table import DenseQTable, SparseQTable
 
 from test_fixtures import tabular_q_learning_config_dict, RPSTask, RPSTaskSingleRepetition
 
@@ -56,3 +63,100 @@ def test_learns_to_beat_rock_in_RPS(RPSTaskSingleRepetition, tabular_q_learning_
                                reward_tolerance=0.,
                                maximum_average_reward=1.0,
                                evaluation_method='cumulative')
+
+
+def test_stable_softmax_does_not_overflow():
+    probabilities = stable_softmax(np.array([1000., 1000., -1000.]), temperature=0.1)
+    np.testing.assert_allclose(probabilities, [0.5, 0.5, 0.])
+
+
+def test_random_argmax_breaks_ties_uniformly():
+    values = np.array([1., 3., 0., 3.])
+    assert random_argmax(values, u=0.) == 1
+    assert random_argmax(values, u=0.99) == 3
+
+
+def test_batch_update_matches_sequential_updates(RPSTask, tabular_q_learning_config_dict):
+    for use_repeated_update_q_learning in [False, True]:
+        tabular_q_learning_config_dict['use_repeated_update_q_learning'] = use_repeated_update_q_learning
+        sequential_agent = build_TabularQ_Agent(RPSTask, tabular_q_learning_config_dict, 'TQL')
+        batch_agent = build_TabularQ_Agent(RPSTask, tabular_q_learning_config_dict, 'TQL')
+        states, actions, rewards, succ_states = [1, 2, 3], [0, 1, 2], [1., -1., 0.5], [4, 5, 6]
+        sequential_agent.algorithm.hashing_function = lambda s: s  # States are already hashed
+
+        for s, a, r, succ_s in zip(states, actions, rewards, succ_states):
+            sequential_agent.algorithm.update_q_table(s, a, r, succ_s)
+        batch_agent.algorithm.update_q_table_batch(states, actions, rewards, succ_states, hashed=True)
+
+        np.testing.assert_allclose(sequential_agent.algorithm.Q_table, batch_agent.algorithm.Q_table)
+
+
+def test_sparse_q_table_allocates_rows_lazily_and_evicts_least_recently_used(RPSTask, tabular_q_learning_config_dict):
+    tabular_q_learning_config_dict['q_table_backend'] = 'sparse'
+    tabular_q_learning_config_dict['q_table_capacity'] = 2
+    agent = build_TabularQ_Agent(RPSTask, tabular_q_learning_config_dict, 'TQL')
+    q_table = agent.algorithm.Q_table
+    assert isinstance(q_table, SparseQTable) and len(q_table) == 0
+
+    q_table.set(0, 1, 1.)
+    q_table.set(1, 1, 2.)
+    _ = q_table.row(0)  # State 1 is now the least recently used
+    q_table.set(2, 1, 3.)
+
+    assert len(q_table) == 2
+    assert q_table.get(0, 1) == 1. and q_table.get(1, 1) == 0. and q_table.get(2, 1) == 3.
+    assert q_table.evictions == 1
+
+
+def test_sparse_and_dense_q_tables_learn_the_same_q_values(RPSTask, tabular_q_learning_config_dict):
+    dense_agent = build_TabularQ_Agent(RPSTask, tabular_q_learning_config_dict, 'TQL')
+    tabular_q_learning_config_dict['q_table_backend'] = 'sparse'
+    sparse_agent = build_TabularQ_Agent(RPSTask, tabular_q_learning_config_dict, 'TQL')
+    states, actions, rewards, succ_states = [1, 2, 1], [0, 1, 0], [1., -1., 0.5], [2, 1, 3]
+    for agent in [dense_agent, sparse_agent]:
+        agent.algorithm.update_q_table_batch(states, actions, rewards, succ_states, hashed=True)
+        agent.algorithm.update_q_table_batch(states, actions, rewards, succ_states, hashed=True)
+    np.testing.assert_allclose(np.array(dense_agent.algorithm.Q_table), np.array(sparse_agent.algorithm.Q_table))
+
+
+def test_sparse_q_table_without_state_space_size_is_densified_up_to_highest_visited_state():
+    q_table = SparseQTable(action_space_size=2)
+    assert np.array(q_table).shape == (0, 2)
+    q_table.set(3, 1, 5.)
+    np.testing.assert_array_equal(np.array(q_table), [[0, 0], [0, 0], [0, 0], [0, 5.]])
+    q_table.set('state', 0, 1.)
+    with pytest.raises(ValueError):
+        np.array(q_table)
+
+
+def test_unknown_q_table_backend_raises_value_error(RPSTask, tabular_q_learning_config_dict):
+    tabular_q_learning_config_dict['q_table_backend'] = 'unknown'
+    with pytest.raises(ValueError) as _:
+        _ = build_TabularQ_Agent(RPSTask, tabular_q_learning_config_dict, 'TQL')
+
+
+def test_shared_q_table_is_updated_by_worker_processes(RPSTask, tabular_q_learning_config_dict):
+    tabular_q_learning_config_dict['q_table_backend'] = 'shared'
+    agent = build_TabularQ_Agent(RPSTask, tabular_q_learning_config_dict, 'TQL')
+
+    def update_from_worker(algorithm, state):
+        algorithm.update_q_table_batch([state], [1], [1.], [state], hashed=True)
+
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=update_from_worker, args=(agent.algorithm, state)) for state in [0, 1]]
+    for worker in workers: worker.start()
+    for worker in workers: worker.join()
+
+    assert agent.algorithm.Q_table.get(0, 1) > 0 and agent.algorithm.Q_table.get(1, 1) > 0
+
+
+def test_clones_of_agents_with_shared_q_table_are_snapshots(RPSTask, tabular_q_learning_config_dict):
+    tabular_q_learning_config_dict['q_table_backend'] = 'shared'
+    agent = build_TabularQ_Agent(RPSTask, tabular_q_learning_config_dict, 'TQL')
+    agent.algorithm.Q_table.set(0, 1, 1.)
+
+    clone = agent.clone(training=False)
+    agent.algorithm.Q_table.set(0, 1, 2.)
+
+    assert isinstance(clone.algorithm.Q_table, DenseQTable)
+    assert clone.algorithm.Q_table.get(0, 1) == 1.
@@ -0,0 +1,69 @@
+from unittest import mock
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+
+from regym.rl_algorithms.agents import build_PPO_Agent
+from regym.rl_algorithms.agents import build_TabularQ_Agent
+from regym.rl_algorithms import WeightBroadcast, weights_only_copy
+
+from test_fixtures import RPSTask
+from test_fixtures import ppo_config_dict, tabular_q_learning_config_dict
+
+
+def update_policy(agent, observation_dim):
+    agent.algorithm.model(torch.rand(1, observation_dim))['v'].sum().backward()
+    agent.algorithm.optimizer.step()
+
+
+def test_refresh_only_loads_newly_published_weights(RPSTask, ppo_config_dict):
+    agent = build_PPO_Agent(RPSTask, ppo_config_dict, 'PPO')
+    actor_agent = weights_only_copy(agent, trainable=False)
+    weight_broadcast = WeightBroadcast(agent)
+    assert weight_broadcast.version == 0 and not weight_broadcast.refresh(actor_agent)
+
+    update_policy(agent, RPSTask.observation_dim)
+    weight_broadcast.publish(agent)
+    assert weight_broadcast.version == 1
+    assert weight_broadcast.refresh(actor_agent) and not weight_broadcast.refresh(actor_agent)
+    # Loaded weights count as a policy update of the refreshed agent
+    assert actor_agent.algorithm.policy_updates == agent.algorithm.policy_updates + 1
+    for p1, p2 in zip(agent.algorithm.model.parameters(), actor_agent.algorithm.model.parameters()):
+        assert torch.equal(p1, p2)
+
+
+def read_q_value(weight_broadcast, actor_agent, published, results):
+    published.wait()
+    results.put((weight_broadcast.refresh(actor_agent), actor_agent.algorithm.Q_table.get(0, 1)))
+
+
+def test_weights_are_shared_with_other_processes(RPSTask, tabular_q_learning_config_dict):
+    agent = build_TabularQ_Agent(RPSTask, tabular_q_learning_config_dict, 'TQL')
+    weight_broadcast = WeightBroadcast(agent)
+    published, results = mp.Event(), mp.Queue()
+    process = mp.Process(target=read_q_value, args=(weight_broadcast, weights_only_copy(agent), published, results))
+    process.start()
+
+    # Published after the process was started
+    agent.algorithm.Q_table.set(0, 1, 4.)
+    weight_broadcast.publish(agent)
+    published.set()
+    refreshed, q_value = results.get(timeout=30)
+    process.join()
+    assert refreshed and q_value == 4.
+
+
+def test_refresh_backs_off_while_weights_are_being_published(RPSTask, tabular_q_learning_config_dict):
+    agent = build_TabularQ_Agent(RPSTask, tabular_q_learning_config_dict, 'TQL')
+    weight_broadcast = WeightBroadcast(agent)
+    actor_agent = weights_only_copy(agent)
+    weight_broadcast.sequence.value += 1  # Publication in progress
+    backoffs = []
+
+    def sleep(duration):
+        backoffs.append(duration)
+        if len(backoffs) == 3: weight_broadcast.sequence.value += 1  # Publication completed
+
+    with mock.patch('regym.rl_algorithms.weight_broadcast.time.sleep', side_effect=sleep):
+        assert weight_broadcast.refresh(actor_agent)
+    assert len(backoffs) == 3 and backoffs[0] < backoffs[1] < backoffs[2]
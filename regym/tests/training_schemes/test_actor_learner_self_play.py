@@ -0,0 +1,97 @@
+import queue
+import pytest
+import numpy as np
+import torch
+
+from regym.environments import generate_task, EnvType
+from regym.rl_algorithms import AgentHook, build_TabularQ_Agent, build_PPO_Agent
+from regym.training_schemes import Menagerie, FullHistoryLimitSelfPlay
+from regym.rl_loops.multiagent_loops import actor_learner_self_play_training
+from regym.rl_loops.multiagent_loops.actor_learner_self_play_loop import MenagerieBroadcaster
+from regym.rl_loops.multiagent_loops.actor_learner_self_play_loop import learn_from_trajectory, receive_menagerie_updates
+
+
+@pytest.fixture()
+def RPS_task():
+    import gym_rock_paper_scissors
+    return generate_task('RockPaperScissors-v0', EnvType.MULTIAGENT_SIMULTANEOUS_ACTION)
+
+
+@pytest.fixture()
+def tabular_q_learning_config_dict():
+    config = dict()
+    config['learning_rate'] = 0.9
+    config['discount_factor'] = 0.99
+    config['epsilon_greedy'] = 0.1
+    config['use_repeated_update_q_learning'] = False
+    config['temperature'] = 1
+    return config
+
+
+@pytest.fixture()
+def ppo_config_dict():
+    config = dict()
+    config['discount'] = 0.99
+    config['use_gae'] = False
+    config['use_cuda'] = False
+    config['gae_tau'] = 0.95
+    config['entropy_weight'] = 0.01
+    config['gradient_clip'] = 5
+    config['optimization_epochs'] = 10
+    config['mini_batch_size'] = 32
+    config['ppo_ratio_clip'] = 0.2
+    config['learning_rate'] = 3.0e-4
+    config['adam_eps'] = 1.0e-5
+    config['horizon'] = 128
+    config['phi_arch'] = 'MLP'
+    config['actor_arch'] = 'None'
+    config['critic_arch'] = 'None'
+    return config
+
+
+def test_invalid_number_of_actors_raises_valueerror(RPS_task, tabular_q_learning_config_dict):
+    training_agent = build_TabularQ_Agent(RPS_task, tabular_q_learning_config_dict, 'TQL')
+    with pytest.raises(ValueError) as _:
+        actor_learner_self_play_training(RPS_task, training_agent, FullHistoryLimitSelfPlay, num_actors=0)
+
+
+def test_learner_trains_on_episodes_simulated_by_actors(RPS_task, tabular_q_learning_config_dict, tmp_path):
+    training_agent = build_TabularQ_Agent(RPS_task, tabular_q_learning_config_dict, 'TQL')
+    target_episodes = 12
+    menagerie, trained_agent, trajectories = actor_learner_self_play_training(
+        RPS_task, training_agent, FullHistoryLimitSelfPlay, target_episodes=target_episodes,
+        menagerie_path=str(tmp_path), num_actors=2, broadcast_interval=2, seed=1)
+
+    assert trained_agent is training_agent
+    assert len(trajectories) == target_episodes and len(menagerie) == target_episodes
+    assert np.abs(np.asarray(trained_agent.algorithm.Q_table)).sum() > 0
+    # Menagerie agents were saved by the learner, and can be loaded
+    assert menagerie.load(target_episodes - 1).name == training_agent.name
+
+
+def test_ppo_learns_from_predictions_made_by_actor_policy(RPS_task, ppo_config_dict):
+    agent = build_PPO_Agent(RPS_task, ppo_config_dict, 'PPO')
+    observations = [np.random.rand(RPS_task.observation_dim) for _ in range(3)]
+    predictions = [{k: v.detach() for k, v in agent.algorithm.model(torch.FloatTensor(o).unsqueeze(0)).items()}
+                   for o in observations[:2]]
+    trajectory = [([None, observations[i]], [0, 1], [0, 1], [None, observations[i + 1]], i == 1) for i in range(2)]
+
+    learn_from_trajectory(agent, trajectory, agent_index=1, predictions=predictions)
+    assert len(agent.algorithm.storage.log_pi_a) == 2
+    assert all(stored is prediction['log_pi_a'] for stored, prediction in zip(agent.algorithm.storage.log_pi_a, predictions))
+
+
+def test_actors_only_receive_menagerie_changes(RPS_task, tabular_q_learning_config_dict):
+    agents = [build_TabularQ_Agent(RPS_task, tabular_q_learning_config_dict, f'TQL-{i}') for i in range(2)]
+    menagerie = Menagerie([AgentHook(agents[0])])
+    broadcaster = MenagerieBroadcaster(menagerie)
+    assert broadcaster.menagerie_update(menagerie, None) is None
+
+    extended_menagerie = menagerie + [AgentHook(agents[1])]
+    start, handles, _ = broadcaster.menagerie_update(extended_menagerie, None)
+    assert start == 1 and handles == [extended_menagerie[1]]
+
+    broadcast_queue = queue.Queue()
+    broadcast_queue.put((start, handles, None))
+    actor_menagerie, _ = receive_menagerie_updates(broadcast_queue, menagerie, None)
+    assert len(actor_menagerie) == 2 and actor_menagerie.cache is menagerie.cache
@@ -0,0 +1,94 @@
+from copy import deepcopy
+import pytest
+import numpy as np
+
+from regym.environments import generate_task, EnvType
+from regym.rl_algorithms import build_TabularQ_Agent, rockAgent, paperAgent, scissorsAgent
+from regym.training_schemes import SelfPlayTrainingScheme, FullHistoryLimitSelfPlay
+from regym.rl_loops.multiagent_loops import self_play_training
+from regym.rl_loops.multiagent_loops.self_play_loop import create_environment_copies
+from regym.rl_loops.multiagent_loops.simultaneous_action_rl_loop import run_episodes
+
+
+@pytest.fixture()
+def RPS_task():
+    import gym_rock_paper_scissors
+    return generate_task('RockPaperScissors-v0', EnvType.MULTIAGENT_SIMULTANEOUS_ACTION)
+
+
+@pytest.fixture()
+def tabular_q_learning_config_dict():
+    config = dict()
+    config['learning_rate'] = 0.9
+    config['discount_factor'] = 0.99
+    config['epsilon_greedy'] = 0.1
+    config['use_repeated_update_q_learning'] = False
+    config['temperature'] = 1
+    return config
+
+def test_invalid_episodes_per_batch_raises_valueerror(RPS_task, tabular_q_learning_config_dict, tmp_path):
+    training_agent = build_TabularQ_Agent(RPS_task, tabular_q_learning_config_dict, 'TQL')
+    with pytest.raises(ValueError) as _:
+        self_play_training(RPS_task, training_agent, FullHistoryLimitSelfPlay,
+                           menagerie_path=str(tmp_path), episodes_per_batch=0)
+
+
+def test_batches_of_episodes_are_run_concurrently_and_learnt_from(RPS_task, tabular_q_learning_config_dict, tmp_path):
+    training_agent = build_TabularQ_Agent(RPS_task, tabular_q_learning_config_dict, 'TQL')
+    sampled_menagerie_sizes = []
+
+    def opponent_sampling_distribution(menagerie, training_agent):
+        sampled_menagerie_sizes.append(len(menagerie))
+        return FullHistoryLimitSelfPlay.opponent_sampling_distribution(menagerie, training_agent)
+
+    self_play_scheme = SelfPlayTrainingScheme(opponent_sampling_distribution, FullHistoryLimitSelfPlay.curator, 'BatchSP')
+    target_episodes, episodes_per_batch = 10, 4
+    menagerie, trained_agent, trajectories = self_play_training(
+        RPS_task, training_agent, self_play_scheme, target_episodes=target_episodes,
+        menagerie_path=str(tmp_path), episodes_per_batch=episodes_per_batch)
+
+    # The curator runs once per batch
+    assert len(trajectories) == target_episodes and len(menagerie) == 3
+    assert np.abs(np.asarray(trained_agent.algorithm.Q_table)).sum() > 0
+    # Opponents are sampled once per batch, from the menagerie curated up to the previous batch
+    assert sampled_menagerie_sizes == [0, 1, 2]
+
+
+def test_environment_copies_are_seeded_differently(RPS_task):
+    envs = create_environment_copies(RPS_task.env, 3)
+    random_numbers = [env.np_random.random() for env in envs]
+    assert len(set(random_numbers)) == 3
+
+
+class BatchedRockAgent():
+    '''
+    Always plays rock, recording the number of observations it receives on each call to take_actions
+    '''
+
+    def __init__(self):
+        self.name, self.requires_environment_model, self.batch_sizes = 'BatchedRockAgent', False, []
+
+    def take_actions(self, states, legal_actions):
+        self.batch_sizes.append(len(states))
+        self.current_predictions = [{'a': 0}] * len(states)
+        return [0] * len(states)
+
+
+def test_run_episodes_runs_one_episode_per_environment(RPS_task):
+    envs = [deepcopy(RPS_task.env) for _ in range(2)]
+    trajectories, predictions = run_episodes(envs, [[rockAgent, paperAgent], [rockAgent, scissorsAgent]])
+    assert len(trajectories) == 2 and predictions == [None, None]
+    assert all(len(trajectory) > 0 and trajectory[-1][4] for trajectory in trajectories)
+    assert all(t[1] == [0, 1] for t in trajectories[0]) and all(t[1] == [0, 2] for t in trajectories[1])
+
+
+def test_run_episodes_takes_actions_of_all_environments_at_once(RPS_task):
+    envs = [deepcopy(RPS_task.env) for _ in range(3)]
+    batched_agent = BatchedRockAgent()
+    agent_vectors = [[batched_agent, paperAgent], [scissorsAgent, batched_agent], [batched_agent, paperAgent]]
+    trajectories, predictions = run_episodes(envs, agent_vectors, recorded_agent_indices=[0, 1, 1])
+
+    # One call per step, with the observations of every environment
+    assert batched_agent.batch_sizes == [3] * len(trajectories[0])
+    assert all(t[1] == [0, 1] for t in trajectories[0]) and all(t[1] == [2, 0] for t in trajectories[1])
+    assert predictions[0] == predictions[1] == [{'a': 0}] * len(trajectories[0]) and predictions[2] is None
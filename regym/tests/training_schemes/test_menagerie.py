@@ -0,0 +1,185 @@
+import os
+import pytest
+import numpy as np
+import torch
+
+from regym.environments import generate_task, EnvType
+from regym.rl_algorithms import AgentHook, CheckpointStore, StoredAgent, AsyncCheckpointWriter
+from regym.rl_algorithms import build_TabularQ_Agent, build_PPO_Agent
+from regym.training_schemes import Menagerie, AgentCache, SelfPlayTrainingScheme
+from regym.training_schemes import DeltaDistributionalSelfPlay
+from regym.training_schemes.menagerie import agent_memory_footprint
+from regym.rl_loops.multiagent_loops.self_play_loop import self_play_training
+
+
+@pytest.fixture()
+def RPS_task():
+    import gym_rock_paper_scissors
+    return generate_task('RockPaperScissors-v0', EnvType.MULTIAGENT_SIMULTANEOUS_ACTION)
+
+
+@pytest.fixture()
+def tabular_q_learning_config_dict():
+    config = dict()
+    config['learning_rate'] = 0.9
+    config['discount_factor'] = 0.99
+    config['epsilon_greedy'] = 0.1
+    config['use_repeated_update_q_learning'] = False
+    config['temperature'] = 1
+    return config
+
+
+@pytest.fixture()
+def ppo_config_dict():
+    config = dict()
+    config['discount'] = 0.99
+    config['use_gae'] = False
+    config['use_cuda'] = False
+    config['gae_tau'] = 0.95
+    config['entropy_weight'] = 0.01
+    config['gradient_clip'] = 5
+    config['optimization_epochs'] = 10
+    config['mini_batch_size'] = 32
+    config['ppo_ratio_clip'] = 0.2
+    config['learning_rate'] = 3.0e-4
+    config['adam_eps'] = 1.0e-5
+    config['horizon'] = 128
+    config['phi_arch'] = 'MLP'
+    config['actor_arch'] = 'None'
+    config['critic_arch'] = 'None'
+    return config
+
+
+@pytest.fixture()
+def saved_agents(RPS_task, tabular_q_learning_config_dict, tmp_path):
+    hooks = []
+    for i in range(5):
+        agent = build_TabularQ_Agent(RPS_task, tabular_q_learning_config_dict, f'TQL-{i}')
+        agent.algorithm.Q_table.set(0, 0, i)
+        hooks.append(AgentHook(agent, save_path=str(tmp_path / f'checkpoint_episode_{i}.pt')))
+    return hooks
+
+
+def test_agents_are_loaded_lazily_and_cached(saved_agents, tmp_path):
+    menagerie = Menagerie.from_path(str(tmp_path), sort_fn=lambda f: int(f.split('_')[-1].split('.')[0]),
+                                    cache=AgentCache(max_agents=2))
+    assert len(menagerie) == 5 and len(menagerie.cache) == 0
+
+    agent = menagerie.load(3)
+    assert agent.algorithm.Q_table.get(0, 0) == 3
+    assert menagerie.load(3) is agent
+    assert (menagerie.cache.hits, menagerie.cache.misses) == (1, 1)
+
+
+def test_least_recently_used_agents_are_evicted(saved_agents):
+    menagerie = Menagerie(saved_agents, cache=AgentCache(max_agents=2))
+    for i in [0, 1, 0, 2]: menagerie.load(i)
+    assert saved_agents[0].save_path in menagerie.cache
+    assert saved_agents[1].save_path not in menagerie.cache
+    assert saved_agents[2].save_path in menagerie.cache
+    # Menagerie hooks do not hold on to loaded agents
+    assert not any(hasattr(hook, 'agent') for hook in saved_agents)
+
+
+def test_cache_can_be_bounded_by_memory(saved_agents):
+    agent_bytes = agent_memory_footprint(Menagerie(saved_agents).load(0))
+    menagerie = Menagerie(saved_agents, cache=AgentCache(max_agents=10, max_bytes=3 * agent_bytes))
+    for i in range(5): menagerie.load(i)
+    assert len(menagerie.cache) == 3
+
+
+def test_menageries_derived_from_a_menagerie_share_its_cache(saved_agents):
+    menagerie = Menagerie(saved_agents[:4])
+    agent = menagerie.load(0)
+    extended_menagerie = menagerie + [saved_agents[4]]
+    assert len(menagerie) == 4 and len(extended_menagerie) == 5
+    assert extended_menagerie.load(0) is agent
+
+
+def test_sampled_opponents_are_prefetched(saved_agents):
+    menagerie = Menagerie(saved_agents, prefetch=True)
+    sampled_indices = iter([1, 4, 2])
+    assert menagerie.sample(lambda: next(sampled_indices), range(5)) == 1
+    # Index 4 was sampled in advance and is being loaded in the background
+    assert menagerie.sample(lambda: next(sampled_indices), range(5)) == 4
+    assert menagerie.load(4).algorithm.Q_table.get(0, 0) == 4
+    assert menagerie.cache.hits + menagerie.cache.misses == 1
+    assert menagerie.next_sample == 2
+
+
+def test_delta_self_play_loads_opponents_through_menagerie(RPS_task, tabular_q_learning_config_dict, saved_agents):
+    training_agent = build_TabularQ_Agent(RPS_task, tabular_q_learning_config_dict, 'TQL')
+    self_play = DeltaDistributionalSelfPlay(delta=0., distribution=lambda indices: 2)
+    menagerie = Menagerie(saved_agents)
+    for _ in range(3):
+        opponent = self_play.opponent_sampling_distribution(menagerie, training_agent)[0]
+        assert opponent.algorithm.Q_table.get(0, 0) == 2
+    assert menagerie.cache.misses == 1
+
+
+def test_self_play_training_caches_opponents_of_list_menageries_across_episodes(RPS_task, tabular_q_learning_config_dict,
+                                                                                saved_agents, tmp_path):
+    training_agent = build_TabularQ_Agent(RPS_task, tabular_q_learning_config_dict, 'TQL')
+    self_play = DeltaDistributionalSelfPlay(delta=0., distribution=lambda indices: 2)
+    scheme = SelfPlayTrainingScheme(self_play.opponent_sampling_distribution, lambda menagerie, *args, **kwargs: menagerie, 'delta')
+    menagerie, _, _ = self_play_training(RPS_task, training_agent, scheme, target_episodes=3,
+                                         menagerie=saved_agents, menagerie_path=str(tmp_path))
+    assert isinstance(menagerie, Menagerie)
+    assert menagerie.cache.misses == 1 and menagerie.cache.hits == 2
+
+
+def test_training_agent_snapshot_is_reused_until_its_policy_is_updated(RPS_task, ppo_config_dict):
+    training_agent = build_PPO_Agent(RPS_task, ppo_config_dict, 'PPO')
+    menagerie = Menagerie()
+    snapshot = menagerie.load_training_agent(training_agent)
+    assert not snapshot.training
+    # Only the policy is copied, not the optimizer nor the rollout storage
+    assert snapshot.algorithm.optimizer is None and snapshot.algorithm.storage is None
+    assert (menagerie + []).load_training_agent(training_agent) is snapshot
+
+    states = torch.rand(4, RPS_task.observation_dim)
+    prediction = training_agent.algorithm.model(states)
+    training_agent.algorithm.optimize_model(states, prediction['a'], prediction['log_pi_a'].detach(),
+                                            returns=torch.ones(4, 1), advantages=torch.ones(4, 1))
+    updated_snapshot = menagerie.load_training_agent(training_agent)
+    assert updated_snapshot is not snapshot
+    for p1, p2 in zip(training_agent.algorithm.model.parameters(), updated_snapshot.algorithm.model.parameters()):
+        assert torch.equal(p1, p2)
+
+    # Without an update counter, policy updates can't be detected: the training agent is always copied again
+    del training_agent.algorithm.policy_updates
+    assert menagerie.load_training_agent(training_agent) is not menagerie.load_training_agent(training_agent)
+
+
+def test_curators_save_agents_in_the_menagerie_checkpoint_store(RPS_task, ppo_config_dict, tmp_path):
+    training_agent = build_PPO_Agent(RPS_task, ppo_config_dict, 'PPO')
+    self_play = DeltaDistributionalSelfPlay(delta=0., distribution=lambda indices: 0)
+    store = CheckpointStore(str(tmp_path / 'store'), delta_encoding='xor')
+    menagerie = Menagerie(checkpoint_store=store)
+    for episode in range(3):
+        menagerie = self_play.curator(menagerie, training_agent, None, 0,
+                                      candidate_save_path=str(tmp_path / f'checkpoint_episode_{episode}.pt'))
+
+    assert all(isinstance(handle, StoredAgent) for handle in menagerie)
+    assert store.keys() == [f'checkpoint_episode_{episode}' for episode in range(3)]
+    assert not any(f.endswith('.pt') for f in os.listdir(tmp_path))
+    opponent = self_play.opponent_sampling_distribution(menagerie, training_agent)[0]
+    assert opponent is menagerie.load(0)
+    for p1, p2 in zip(training_agent.algorithm.model.parameters(), opponent.policy_agent.algorithm.model.parameters()):
+        assert torch.equal(p1, p2)
+
+
+def test_curators_write_checkpoints_with_the_menagerie_checkpoint_writer(RPS_task, tabular_q_learning_config_dict, tmp_path):
+    training_agent = build_TabularQ_Agent(RPS_task, tabular_q_learning_config_dict, 'TQL')
+    training_agent.algorithm.Q_table.set(0, 1, 5.)
+    self_play = DeltaDistributionalSelfPlay(delta=0., distribution=lambda indices: 0)
+    menagerie = Menagerie(checkpoint_writer=AsyncCheckpointWriter(max_pending=2))
+    for episode in range(3):
+        menagerie = self_play.curator(menagerie, training_agent, None, 0,
+                                      candidate_save_path=str(tmp_path / f'checkpoint_episode_{episode}.pt'))
+
+    assert all(handle.checkpoint_writer is menagerie.checkpoint_writer for handle in menagerie)
+    opponent = menagerie.load(2)
+    assert opponent.policy_agent.algorithm.Q_table.get(0, 1) == 5.
+    menagerie.checkpoint_writer.close()
+    assert len(os.listdir(tmp_path)) == 3
@@ -1,4 +1,5 @@
 from unittest import mock
+import dill
 import pytest
 import numpy as np
 
@@ -68,6 +69,21 @@ def test_can_fill_missing_game_entries_upon_adding_new_policy(RPS_task):
     np.testing.assert_array_equal(expected_updated_metagame, actual_updated_metagame)
 
 
+def test_benchmarking_workers_are_reused_across_metagame_updates(RPS_task):
+    psro = PSRONashResponse(task=RPS_task, benchmarking_episodes=2, benchmarking_num_workers=2)
+    psro.menagerie = [rockAgent, paperAgent]
+    psro.meta_game = np.array([[0.5]])
+    np.testing.assert_array_equal(psro.update_meta_game(), [[0.5, 0], [1, 0.5]])
+    executor = psro.benchmarking_executor
+    assert executor is not None
+
+    psro.menagerie.append(scissorsAgent)
+    np.testing.assert_array_equal(psro.update_meta_game(), [[0.5, 0, 1], [1, 0.5, 0], [0, 1, 0.5]])
+    assert psro.benchmarking_executor is executor
+    assert dill.loads(dill.dumps(psro)).benchmarking_executor is None
+    psro.shutdown_benchmarking_workers()
+
+
 def test_can_update_mata_game(RPS_task):
     psro = PSRONashResponse(task=RPS_task, benchmarking_episodes=2)
     psro.menagerie = [rockAgent, paperAgent, scissorsAgent]
@@ -117,3 +133,16 @@ def test_can_detect_convergence_to_threshold_best_response(RPS_task):
     psro.match_outcome_rolling_window = random_match_outcome_window
 
     assert psro.has_policy_converged()
+
+
+def test_convergence_with_confidence_requires_full_window_of_victories(RPS_task):
+    psro = PSRONashResponse(task=RPS_task,
+                            threshold_best_response=0.7,
+                            match_outcome_rolling_window_size=10,
+                            convergence_confidence=0.95)
+    psro.match_outcome_rolling_window = [1] * 9
+    assert not psro.has_policy_converged()
+    psro.match_outcome_rolling_window = [1] * 8 + [0, 1]
+    assert not psro.has_policy_converged()  # Winrate of 0.9, but too few episodes to be confident about it
+    psro.match_outcome_rolling_window = [1] * 10
+    assert psro.has_policy_converged()
@@ -0,0 +1,113 @@
+import os
+import pytest
+import numpy as np
+import torch
+
+from regym.environments import generate_task, EnvType
+from regym.rl_algorithms import build_TabularQ_Agent, build_PPO_Agent
+from regym.training_schemes import SelfPlayTrainingScheme, FullHistoryLimitSelfPlay, PSRONashResponse
+from regym.rl_loops.multiagent_loops import self_play_training, resume_self_play_training
+from regym.rl_loops.multiagent_loops.self_play_training_state import SelfPlayTrainingState
+from regym.rl_loops.multiagent_loops.self_play_training_state import save_training_state, load_training_state
+
+
+@pytest.fixture()
+def RPS_task():
+    import gym_rock_paper_scissors
+    return generate_task('RockPaperScissors-v0', EnvType.MULTIAGENT_SIMULTANEOUS_ACTION)
+
+
+@pytest.fixture()
+def tabular_q_learning_config_dict():
+    config = dict()
+    config['learning_rate'] = 0.9
+    config['discount_factor'] = 0.99
+    config['epsilon_greedy'] = 0.1
+    config['use_repeated_update_q_learning'] = False
+    config['temperature'] = 1
+    return config
+
+
+@pytest.fixture()
+def ppo_config_dict():
+    config = dict()
+    config['discount'] = 0.99
+    config['use_gae'] = False
+    config['use_cuda'] = False
+    config['gae_tau'] = 0.95
+    config['entropy_weight'] = 0.01
+    config['gradient_clip'] = 5
+    config['optimization_epochs'] = 10
+    config['mini_batch_size'] = 32
+    config['ppo_ratio_clip'] = 0.2
+    config['learning_rate'] = 3.0e-4
+    config['adam_eps'] = 1.0e-5
+    config['horizon'] = 128
+    config['phi_arch'] = 'MLP'
+    config['actor_arch'] = 'None'
+    config['critic_arch'] = 'None'
+    return config
+
+
+def test_resumed_training_matches_uninterrupted_training(RPS_task, tabular_q_learning_config_dict, tmp_path):
+    np.random.seed(0)
+    training_agent = build_TabularQ_Agent(RPS_task, tabular_q_learning_config_dict, 'TQL')
+    os.mkdir(tmp_path / 'uninterrupted')
+    _, uninterrupted_agent, uninterrupted_trajectories = self_play_training(
+        RPS_task, training_agent, FullHistoryLimitSelfPlay, target_episodes=10,
+        menagerie_path=str(tmp_path / 'uninterrupted'))
+
+    np.random.seed(0)
+    training_agent = build_TabularQ_Agent(RPS_task, tabular_q_learning_config_dict, 'TQL')
+    os.mkdir(tmp_path / 'interrupted')
+    training_state_path = str(tmp_path / 'training_state')
+    self_play_training(RPS_task, training_agent, FullHistoryLimitSelfPlay, target_episodes=4,
+                       menagerie_path=str(tmp_path / 'interrupted'),
+                       training_state_path=training_state_path, training_state_interval=2)
+    menagerie, resumed_agent, resumed_trajectories = resume_self_play_training(RPS_task, training_state_path, target_episodes=6)
+
+    assert len(menagerie) == 10 and len(resumed_trajectories) == 6
+    assert np.array_equal(uninterrupted_agent.algorithm.Q_table, resumed_agent.algorithm.Q_table)
+    assert all(np.array_equal(t1[0][1], t2[0][1]) for t1, t2 in zip(uninterrupted_trajectories[4:], resumed_trajectories))
+    assert sorted(os.listdir(training_state_path)) == ['episode_10', 'latest.json']
+
+
+def test_training_state_restores_optimizer(RPS_task, ppo_config_dict, tmp_path):
+    agent = build_PPO_Agent(RPS_task, ppo_config_dict, 'PPO')
+    agent.algorithm.model(torch.rand(1, RPS_task.observation_dim))['v'].sum().backward()
+    agent.algorithm.optimizer.step()
+    save_training_state(str(tmp_path), SelfPlayTrainingState(agent, FullHistoryLimitSelfPlay, [], episode=3, final_episode=5,
+                                                             opci=1, menagerie_path='.', training_state_interval=1,
+                                                             rng_states=None))
+    state = load_training_state(str(tmp_path))
+    assert state.episode == 3 and state.final_episode == 5
+    optimizer_state = state.training_agent.algorithm.optimizer.state_dict()['state']
+    assert len(optimizer_state) > 0
+    assert torch.equal(optimizer_state[0]['exp_avg'], agent.algorithm.optimizer.state_dict()['state'][0]['exp_avg'])
+
+
+def test_psro_meta_game_is_restored(RPS_task, tabular_q_learning_config_dict, tmp_path):
+    agent = build_TabularQ_Agent(RPS_task, tabular_q_learning_config_dict, 'TQL')
+    psro = PSRONashResponse(task=RPS_task, benchmarking_episodes=2)
+    scheme = SelfPlayTrainingScheme(psro.opponent_sampling_distribution, psro.curator, psro.name)
+    scheme.opponent_sampling_distribution([], agent)
+    psro.meta_game = np.array([[0.5]])
+    psro.statistics[-1].menagerie_picks[0] = 7
+
+    save_training_state(str(tmp_path), SelfPlayTrainingState(agent, scheme, psro.menagerie, episode=1, final_episode=2,
+                                                             opci=1, menagerie_path='.', training_state_interval=1,
+                                                             rng_states=None))
+    restored_psro = load_training_state(str(tmp_path)).self_play_scheme.curator.__self__
+    assert restored_psro is not psro
+    assert np.array_equal(restored_psro.meta_game, psro.meta_game)
+    assert restored_psro.statistics[-1].menagerie_picks[0] == 7
+    assert len(restored_psro.menagerie) == 1
+
+
+def test_unpickled_schemes_sample_from_the_global_random_state():
+    import pickle
+    distribution = pickle.loads(pickle.dumps(FullHistoryLimitSelfPlay)).opponent_sampling_distribution.keywords['distribution']
+    np.random.seed(0)
+    samples = [distribution(100) for _ in range(5)]
+    np.random.seed(0)
+    assert samples == [np.random.choice(100) for _ in range(5)]
@@ -0,0 +1,75 @@
+import csv
+import json
+import sqlite3
+import pytest
+
+from regym.environments import generate_task, EnvType
+from regym.rl_algorithms import build_TabularQ_Agent
+from regym.training_schemes import FullHistoryLimitSelfPlay
+from regym.rl_loops.multiagent_loops import self_play_training
+from regym.util import summarize_episode, CSVEpisodeSummarySink, SQLiteEpisodeSummarySink
+
+
+@pytest.fixture
+def RPS_task():
+    import gym_rock_paper_scissors
+    return generate_task('RockPaperScissors-v0', EnvType.MULTIAGENT_SIMULTANEOUS_ACTION)
+
+
+@pytest.fixture
+def tabular_q_learning_config_dict():
+    config = dict()
+    config['learning_rate'] = 0.9
+    config['discount_factor'] = 0.99
+    config['epsilon_greedy'] = 0.1
+    config['use_repeated_update_q_learning'] = False
+    config['temperature'] = 1
+    return config
+
+
+def test_can_summarize_episode():
+    trajectory = [([], [], [0, 1], [], False), ([], [], [2, 0], [], True)]
+    summary = summarize_episode(3, trajectory, training_agent_index=1, opponents=['Rock'])
+    assert summary.episode == 3 and summary.length == 2
+    assert summary.returns == [2, 1] and summary.winner == 0
+    assert summary.opponents == ['Rock']
+
+    draw = summarize_episode(4, [([], [], [1, 1], [], True)])
+    assert draw.winner == -1
+
+
+def test_csv_sink_appends_summaries(tmp_path):
+    path = str(tmp_path / 'summaries.csv')
+    for episode in range(2):
+        sink = CSVEpisodeSummarySink(path)
+        sink.write(summarize_episode(episode, [([], [], [0, 1], [], True)], 0, ['Rock', 'Paper']))
+        sink.close()
+
+    with open(path) as f: rows = list(csv.DictReader(f))
+    assert [row['episode'] for row in rows] == ['0', '1']
+    assert json.loads(rows[0]['returns']) == [0, 1] and rows[0]['opponents'] == 'Rock;Paper'
+
+
+def test_sqlite_sink_commits_summaries_in_batches(tmp_path):
+    path = str(tmp_path / 'summaries.db')
+    sink = SQLiteEpisodeSummarySink(path, commit_interval=2)
+    count_rows = lambda: sqlite3.connect(path).execute('SELECT COUNT(*) FROM episodes').fetchone()[0]
+    for episode in range(3):
+        sink.write(summarize_episode(episode, [([], [], [0, 1], [], True)], 0, ['Rock']))
+    assert count_rows() == 2
+    sink.close()
+    assert count_rows() == 3
+
+
+def test_self_play_training_streams_summaries_without_keeping_trajectories(RPS_task, tabular_q_learning_config_dict, tmp_path):
+    training_agent = build_TabularQ_Agent(RPS_task, tabular_q_learning_config_dict, 'TQL')
+    path = str(tmp_path / 'summaries.csv')
+    sink = CSVEpisodeSummarySink(path)
+    _, _, trajectories = self_play_training(RPS_task, training_agent, FullHistoryLimitSelfPlay, target_episodes=5,
+                                            menagerie_path=str(tmp_path), episode_summary_sink=sink,
+                                            keep_trajectories=False)
+    assert trajectories == []
+    with open(path) as f: rows = list(csv.DictReader(f))
+    assert [int(row['episode']) for row in rows] == list(range(5))
+    assert all(row['opponents'] == 'TQL' for row in rows)
+    sink.close()
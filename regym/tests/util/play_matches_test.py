@@ -3,10 +3,10 @@ import pytest
 import numpy as np
 
 from regym.rl_algorithms.agents import Agent
-from regym.rl_algorithms import rockAgent, scissorsAgent 
+from regym.rl_algorithms import rockAgent, scissorsAgent, randomAgent
 from regym.environments import generate_task
 from regym.environments import EnvType
-from regym.util.play_matches import play_multiple_matches
+from regym.util.play_matches import play_multiple_matches, match_process_pool
 
 
 @pytest.fixture
@@ -55,3 +55,32 @@ def play_matches_given_task_and_agent_vector(task, agent_vector: List[Agent]):
     assert len(trajectories) == number_matches
     assert task.total_episodes_run == number_matches
     np.testing.assert_array_equal(expected_winrates, winrates)
+
+
+def test_can_play_matches_across_workers(RPS_task):
+    agent_vector = [rockAgent, scissorsAgent]
+    winrates, trajectories, cumulative_rewards = play_multiple_matches(RPS_task, agent_vector, n_matches=7,
+                                                                       keep_trajectories=True,
+                                                                       keep_cumulative_rewards=True,
+                                                                       num_workers=3)
+    assert len(trajectories) == 7
+    assert RPS_task.total_episodes_run == 7
+    np.testing.assert_array_equal([1., 0.], winrates)
+    assert cumulative_rewards[0] > 0 and cumulative_rewards[0] == -cumulative_rewards[1]
+
+
+def test_parallel_matches_are_reproducible_given_a_seed(RPS_task):
+    agent_vector = [randomAgent, randomAgent]
+    play = lambda: play_multiple_matches(RPS_task, agent_vector, n_matches=20, keep_trajectories=True, num_workers=2, seed=1)[1]
+    assert [[t[1] for t in trajectory] for trajectory in play()] == [[t[1] for t in trajectory] for trajectory in play()]
+
+
+def test_matches_are_played_on_a_given_process_pool(RPS_task):
+    agent_vector = [rockAgent, scissorsAgent]
+    with match_process_pool(num_workers=2) as executor:
+        for _ in range(2):
+            winrates = play_multiple_matches(RPS_task, agent_vector, n_matches=4, num_workers=2, executor=executor)
+            np.testing.assert_array_equal([1., 0.], winrates)
+        worker_processes = set(executor._processes)
+        play_multiple_matches(RPS_task, agent_vector, n_matches=4, num_workers=2, executor=executor)
+        assert set(executor._processes) == worker_processes  # Processes are reused across calls
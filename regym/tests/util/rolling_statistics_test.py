@@ -0,0 +1,43 @@
+import pytest
+import numpy as np
+
+from regym.util import RollingStatistics
+
+
+def test_invalid_window_size_raises_valueerror():
+    with pytest.raises(ValueError) as _:
+        RollingStatistics(window_size=0)
+
+
+def test_rolling_window_keeps_last_values_in_order():
+    rolling_statistics = RollingStatistics(window_size=3)
+    rolling_statistics.extend([1, 0, 1, 1, 0])
+    assert len(rolling_statistics) == 3 and rolling_statistics.is_full()
+    np.testing.assert_array_equal([1, 1, 0], rolling_statistics)
+    assert rolling_statistics.mean == pytest.approx(2 / 3)
+
+
+def test_running_statistics_match_statistics_of_window():
+    values = np.random.rand(100)
+    rolling_statistics = RollingStatistics(window_size=7)
+    for i, value in enumerate(values):
+        rolling_statistics.push(value)
+        window = values[max(0, i - 6): i + 1]
+        assert rolling_statistics.mean == pytest.approx(window.mean())
+        assert rolling_statistics.variance == pytest.approx(window.var())
+
+    rolling_statistics.reset()
+    assert len(rolling_statistics) == 0 and np.isnan(rolling_statistics.mean)
+
+
+def test_confidence_interval_narrows_with_more_match_outcomes():
+    small_window, large_window = RollingStatistics(window_size=10), RollingStatistics(window_size=1000)
+    small_window.extend([1] * 9 + [0])
+    large_window.extend(([1] * 9 + [0]) * 100)
+
+    small_lower, small_upper = small_window.confidence_interval(0.95)
+    large_lower, large_upper = large_window.confidence_interval(0.95)
+    assert 0 <= small_lower < large_lower < 0.9 < large_upper < small_upper <= 1
+    # Reference values of the 95% Wilson score interval for 9 successes out of 10 trials
+    assert small_lower == pytest.approx(0.5958, abs=1e-4)
+    assert small_upper == pytest.approx(0.9821, abs=1e-4)
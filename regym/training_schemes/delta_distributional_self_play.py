@@ -1,5 +1,5 @@
 import math
-from ..rl_algorithms import AgentHook
+from regym.rl_algorithms import freeze_agent
 
 '''
 Based on the paper: Emergent Complexity in Multi TODO
@@ -9,17 +9,20 @@ allows to use distributions which aren't uniform.
 class DeltaDistributionalSelfPlay():
 
 
-    def __init__(self, delta, distribution):
+    def __init__(self, delta, distribution, half_precision_menagerie=False):
         '''
         :param delta: determines the percentage of the menagerie that will be
                       considered by the opponent_sampling_distribution:
                       - delta = 0 (all history),
                       - delta = 1 (only latest agent, Naive Self Play)
         :param distribution: Distribution to be used over the filtered set of agents.
+        :param half_precision_menagerie: Whether agents added to the menagerie
+                                         store their policy in half precision (float16)
         '''
         self.name = f'd={delta},{distribution.__name__}'
         self.delta = delta
         self.distribution = distribution
+        self.half_precision_menagerie = half_precision_menagerie
 
     def opponent_sampling_distribution(self, menagerie, training_agent):
         '''
@@ -29,14 +32,12 @@ class DeltaDistributionalSelfPlay():
         :param distribution: Distribution to be used over the filtered set of agents.
         :returns: Agent, sampled from the menagerie, to be used as an opponent in the next episode
         '''
-        latest_training_agent_hook = AgentHook(training_agent.clone(training=False))
         indices = range(len(menagerie) + 1) # +1 accounts for the training agent, not (yet) included in menagerie
         subset_of_considered_indices = slice(math.ceil(self.delta * len(menagerie)), len(indices))
         valid_agents_indices = indices[subset_of_considered_indices]
-        samples_indices = [self.distribution(valid_agents_indices)]
-        samples = [menagerie[i] if i < len(menagerie) else latest_training_agent_hook
-                   for i in samples_indices]
-        return [AgentHook.unhook(sampled_hook_agent) for sampled_hook_agent in samples]
+        samples_indices = [menagerie.sample(lambda: self.distribution(valid_agents_indices), valid_agents_indices)]
+        return [menagerie.load(i) if i < len(menagerie) else menagerie.load_training_agent(training_agent)
+                for i in samples_indices]
 
     def curator(self, menagerie, training_agent, episode_trajectory, training_agent_index, candidate_save_path):
         '''
@@ -45,4 +46,5 @@ class DeltaDistributionalSelfPlay():
         :returns: menagerie to be used in the next training episode.
         '''
 
-        return menagerie + [AgentHook(training_agent.clone(training=False), save_path=candidate_save_path)]
+        frozen_agent = freeze_agent(training_agent, half_precision=self.half_precision_menagerie)
+        return menagerie + [menagerie.hook(frozen_agent, save_path=candidate_save_path)]
@@ -1,5 +1,6 @@
 import math
-from ..rl_algorithms import AgentHook
+import numpy as np
+from regym.rl_algorithms import freeze_agent
 
 '''
 Delta-limit-uniform distribution:
@@ -16,7 +17,6 @@ def opponent_sampling_distribution(menagerie, training_agent, delta, distributio
     :param distribution: Distribution to be used over the filtered set of agents.
     :returns: Agent, sampled from the menagerie, to be used as an opponent in the next episode
     '''
-    latest_training_agent_hook = AgentHook(training_agent.clone(training=False))
     indices = range(len(menagerie) + 1) # +1 accounts for the training agent, not (yet) included in menagerie
     subset_of_considered_indices = slice(math.ceil(delta * len(menagerie)), len(indices))
     valid_agents_indices = indices[subset_of_considered_indices]
@@ -24,9 +24,18 @@ def opponent_sampling_distribution(menagerie, training_agent, delta, distributio
     unormalized_ps = [1.0/((n * (n-i)**2)) for i in range(n)]
     sum_ps = sum(unormalized_ps)
     normalized_ps = [p / sum_ps for p in unormalized_ps]
-    samples_indices = [distribution(valid_agents_indices, p=normalized_ps)]
-    samples = [menagerie[i] if i < len(menagerie) else latest_training_agent_hook for i in samples_indices]
-    return [AgentHook.unhook(sampled_hook_agent) for sampled_hook_agent in samples]
+    samples_indices = [menagerie.sample(lambda: distribution(valid_agents_indices, p=normalized_ps), valid_agents_indices)]
+    return [menagerie.load(i) if i < len(menagerie) else menagerie.load_training_agent(training_agent)
+            for i in samples_indices]
+
+
+def random_choice(*args, **kwargs):
+    '''
+    numpy.random.choice, drawing from numpy's global random state even after
+    being pickled (i.e in a saved training state), unlike np.random.choice,
+    which is unpickled bound to a copy of the global random state.
+    '''
+    return np.random.choice(*args, **kwargs)
 
 
 def curator(menagerie, training_agent, episode_trajectory,
@@ -38,4 +47,4 @@ def curator(menagerie, training_agent, episode_trajectory,
     :returns: menagerie to be used in the next training episode.
     '''
 
-    return menagerie + [AgentHook(training_agent.clone(training=False), save_path=candidate_save_path)]
+    return menagerie + [menagerie.hook(freeze_agent(training_agent), save_path=candidate_save_path)]
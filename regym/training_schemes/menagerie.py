@@ -0,0 +1,330 @@
+import os
+import copy
+import threading
+from os import listdir
+from os.path import isfile, join
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Sequence, Tuple
+
+import numpy as np
+import torch
+
+from regym.rl_algorithms import AgentHook
+from regym.rl_algorithms import load_agent
+from regym.rl_algorithms import weights_only_copy
+from regym.rl_algorithms import CheckpointStore, StoredAgent
+from regym.rl_algorithms import AsyncCheckpointWriter
+
+
+class AgentCache():
+
+    def __init__(self, max_agents: int = 32, max_bytes: int = None, prefetch_workers: int = 1):
+        '''
+        Thread safe Least Recently Used (LRU) cache of agents loaded from disk,
+        keyed by the path of the file they were loaded from.
+        Agents can be loaded in background threads ahead of time (prefetched).
+
+        :param max_agents: Maximum number of agents held in memory
+        :param max_bytes: Optional. Maximum (estimated) memory used by the
+                          neural networks / Q-tables of the agents held in memory
+        :param prefetch_workers: Number of background threads used for prefetching
+        '''
+        if not max_agents > 0:
+            raise ValueError('Parameter \'max_agents\' must be a strictly positive integer')
+        if max_bytes is not None and not max_bytes > 0:
+            raise ValueError('Parameter \'max_bytes\' must be a strictly positive integer')
+        self.max_agents, self.max_bytes = max_agents, max_bytes
+        self.prefetch_workers = prefetch_workers
+        self.executor = None
+        self.lock = threading.Lock()
+        self.agents = OrderedDict()  # key -> (agent, bytes)
+        self.pending = {}            # key -> Future, for agents being prefetched
+        self.used_bytes = 0
+        self.hits, self.misses = 0, 0
+
+    def get(self, key: str, load_fn: Callable):
+        '''
+        :returns: Agent cached under :param: key. If missing, it is
+                  loaded (or the ongoing prefetch is waited for) with :param: load_fn
+        '''
+        with self.lock:
+            if key in self.agents:
+                self.hits += 1
+                self.agents.move_to_end(key)
+                return self.agents[key][0]
+            self.misses += 1
+            future = self.pending.get(key)
+        agent = future.result() if future is not None else load_fn()
+        self._insert(key, agent)
+        return agent
+
+    def prefetch(self, key: str, load_fn: Callable):
+        '''
+        Loads the agent under :param: key with :param: load_fn in a background thread,
+        unless it is already cached or being loaded.
+        '''
+        with self.lock:
+            if key in self.agents or key in self.pending: return
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.prefetch_workers)
+            future = self.executor.submit(load_fn)
+            self.pending[key] = future
+        future.add_done_callback(lambda f: self._on_prefetched(key, f))
+
+    def _on_prefetched(self, key, future):
+        if future.exception() is None: self._insert(key, future.result())
+        with self.lock:
+            self.pending.pop(key, None)
+
+    def _insert(self, key, agent):
+        with self.lock:
+            if key in self.agents: return
+            size = agent_memory_footprint(agent)
+            self.agents[key] = (agent, size)
+            self.used_bytes += size
+            while len(self.agents) > 1 and (len(self.agents) > self.max_agents or
+                                            (self.max_bytes is not None and self.used_bytes > self.max_bytes)):
+                _, (_, evicted_size) = self.agents.popitem(last=False)
+                self.used_bytes -= evicted_size
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.agents
+
+    def __len__(self):
+        return len(self.agents)
+
+    def __getstate__(self):
+        # Threads and locks can't be pickled. Cached agents are not sent along.
+        return {'max_agents': self.max_agents, 'max_bytes': self.max_bytes,
+                'prefetch_workers': self.prefetch_workers}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def __repr__(self):
+        return f'AgentCache: {len(self)}/{self.max_agents} agents. {self.used_bytes} bytes. Hits: {self.hits}. Misses: {self.misses}'
+
+
+class TrainingAgentSnapshot():
+
+    def __init__(self):
+        '''
+        Frozen, weights-only copy (see regym.rl_algorithms.weights_only_copy)
+        of the agent being trained, which is only copied again once the policy
+        of the agent being trained has been updated (see policy_version).
+        Snapshots can only act: they hold neither optimizers nor replay buffers / storages.
+        '''
+        self.source, self.version, self.agent = None, None, None
+
+    def get(self, training_agent):
+        '''
+        :returns: Frozen copy of :param: training_agent's current policy
+        '''
+        version = policy_version(training_agent)
+        if self.source is not training_agent or version is None or version != self.version:
+            self.source, self.version = training_agent, version
+            self.agent = weights_only_copy(training_agent, training=False, trainable=False)
+        return self.agent
+
+    def __getstate__(self):
+        return {}  # Not worth sending between processes
+
+    def __setstate__(self, state):
+        self.__init__()
+
+
+class Menagerie():
+
+    def __init__(self, handles: Sequence = (), cache: AgentCache = None, prefetch: bool = False,
+                 checkpoint_store: CheckpointStore = None,
+                 checkpoint_writer: AsyncCheckpointWriter = None):
+        '''
+        Archive of agents (i.e opponents of a self-play training scheme) which
+        holds lightweight handles instead of agents. Agents saved on disk are only
+        loaded when they are needed, through an LRU cache shared by this menagerie
+        and all menageries derived from it (i.e via menagerie + [agent_hook]).
+
+        A handle can be:
+            - An AgentHook, either holding an agent in memory or pointing to an agent saved on disk
+            - A path to an agent saved on disk (see regym.rl_algorithms.load_agent)
+            - A StoredAgent, pointing to an agent saved in a CheckpointStore
+            - An agent
+
+        Menageries behave like (immutable) lists of handles: indexing returns
+        handles, and agents are retrieved via Menagerie.load.
+
+        :param handles: Initial handles of this menagerie
+        :param cache: AgentCache used to load agents from disk. Defaults to a cache of 32 agents
+        :param prefetch: Whether opponent sampling distributions should, after sampling
+                         the current opponents, sample the opponent of their next call and
+                         load it in the background. The next opponent is then drawn from the
+                         menagerie as it was one call earlier (one episode earlier for opci=1),
+                         which is a negligible bias for large menageries.
+        :param checkpoint_store: Optional. CheckpointStore where agents added to this menagerie
+                                 through Menagerie.hook are saved, deduplicating the tensors
+                                 they share with previously saved agents. If None, agents are
+                                 saved as individual checkpoints (see AgentHook).
+        :param checkpoint_writer: Optional. AsyncCheckpointWriter with which the individual
+                                  checkpoints of agents added through Menagerie.hook are
+                                  written in the background. Agents are still loaded
+                                  from disk only once they have been written.
+        '''
+        self.handles = list(handles)
+        self.cache = cache if cache is not None else AgentCache()
+        self.prefetch = prefetch
+        self.checkpoint_store = checkpoint_store
+        self.checkpoint_writer = checkpoint_writer
+        self.next_sample = None
+        self.training_agent_snapshot = TrainingAgentSnapshot()
+
+    @classmethod
+    def from_path(cls, path: str, file_extension='pt',
+                  sort_fn: Callable[[str], Tuple[Any]] = None, **kwargs):
+        '''
+        Lazy version of regym.rl_algorithms.load_population_from_path:
+        Creates a menagerie with a handle for each agent file in :param: path
+        (recognized by :param: file_extension) without loading any agent.
+
+        :param sort_fn: Function to be used as part of list.sort(key={})
+        :param kwargs: Forwarded to Menagerie.__init__
+        '''
+        files = [os.path.abspath(f'{path}/{f}') for f in listdir(path)
+                 if isfile(join(path, f)) and f.endswith(file_extension)]
+        if sort_fn is not None: files.sort(key=sort_fn)
+        return cls(files, **kwargs)
+
+    def load(self, index: int):
+        '''
+        :returns: Agent of the :param: index-th handle, loaded from disk only if it is not cached
+        '''
+        handle = self.handles[index]
+        key = self._cache_key(handle)
+        if key is None: return AgentHook.unhook(handle) if isinstance(handle, AgentHook) else handle
+        return self.cache.get(key, lambda: self._load_from_disk(handle))
+
+    def hook(self, agent, save_path: str = None):
+        '''
+        Creates the handle through which :param: agent is added to this menagerie
+        (i.e menagerie + [menagerie.hook(agent, save_path)]).
+
+        :param agent: Agent to be added to the menagerie
+        :param save_path: Path where :param: agent is saved. If this menagerie has a
+                          checkpoint_store, :param: agent is saved in it instead, under
+                          the file name of :param: save_path (without extension).
+                          If None, :param: agent is kept in memory.
+        :returns: StoredAgent if this menagerie has a checkpoint_store, AgentHook otherwise
+        '''
+        if self.checkpoint_store is None or save_path is None:
+            return AgentHook(agent, save_path=save_path, checkpoint_writer=self.checkpoint_writer)
+        return self.checkpoint_store.hook(agent, key=os.path.splitext(os.path.basename(save_path))[0])
+
+    def load_training_agent(self, training_agent):
+        '''
+        :returns: Frozen, weights-only snapshot of :param: training_agent, to be used
+                  as an opponent. Snapshots are reused until the policy of
+                  :param: training_agent is updated.
+        '''
+        return self.training_agent_snapshot.get(training_agent)
+
+    def prefetch_agent(self, index: int):
+        '''
+        Starts loading the agent of the :param: index-th handle in the background
+        '''
+        handle = self.handles[index]
+        key = self._cache_key(handle)
+        if key is not None: self.cache.prefetch(key, lambda: self._load_from_disk(handle))
+
+    def sample(self, sampling_fn: Callable[[], int], valid_indices: Sequence[int]) -> int:
+        '''
+        Samples an index with :param: sampling_fn. If this menagerie prefetches,
+        the index sampled (and prefetched) at the previous call is returned instead,
+        provided it is still one of the :param: valid_indices, and the index for
+        the next call is sampled and prefetched.
+
+        :param sampling_fn: Function sampling an index from :param: valid_indices
+        :param valid_indices: Indices which can currently be sampled
+        '''
+        if not self.prefetch: return sampling_fn()
+        index = self.next_sample if self.next_sample in valid_indices else sampling_fn()
+        self.next_sample = sampling_fn()
+        if self.next_sample < len(self): self.prefetch_agent(self.next_sample)
+        return index
+
+    @staticmethod
+    def _cache_key(handle):
+        if isinstance(handle, str): return handle
+        if isinstance(handle, AgentHook) and handle.save_path is not None: return handle.save_path
+        if isinstance(handle, StoredAgent): return handle.cache_key
+        return None
+
+    @staticmethod
+    def _load_from_disk(handle):
+        if isinstance(handle, str): return load_agent(handle)
+        if isinstance(handle, StoredAgent): return handle.load()
+        # Unhooking a copy, so that the menagerie's hook does not hold on to the loaded agent
+        return AgentHook.unhook(copy.copy(handle))
+
+    def __add__(self, handles: List):
+        menagerie = Menagerie(self.handles + list(handles), cache=self.cache, prefetch=self.prefetch,
+                              checkpoint_store=self.checkpoint_store,
+                              checkpoint_writer=self.checkpoint_writer)
+        menagerie.next_sample = self.next_sample
+        menagerie.training_agent_snapshot = self.training_agent_snapshot
+        return menagerie
+
+    def __getitem__(self, index):
+        return self.handles[index]
+
+    def __len__(self):
+        return len(self.handles)
+
+    def __iter__(self):
+        return iter(self.handles)
+
+    def __repr__(self):
+        return f'Menagerie: {len(self)} agents. {self.cache}'
+
+
+def as_menagerie(menagerie) -> Menagerie:
+    '''
+    Normalizes the menagerie given to a self-play training loop, so that opponent
+    sampling distributions and curators always receive a Menagerie (and the
+    AgentCache and training agent snapshot it carries across episodes).
+
+    :param menagerie: Menagerie, or sequence of handles (see Menagerie.__init__)
+    :returns: :param: menagerie itself if it is a Menagerie, a new Menagerie over its handles otherwise
+    '''
+    return menagerie if isinstance(menagerie, Menagerie) else Menagerie(menagerie)
+
+
+def agent_memory_footprint(agent) -> int:
+    '''
+    :returns: Estimated memory, in bytes, used by the neural networks and Q-tables of :param: agent
+    '''
+    if hasattr(agent, 'policy_agent'): agent = agent.policy_agent  # FrozenPolicyAgent
+    if not hasattr(agent, 'algorithm'): return 0
+    footprint = 0
+    for value in vars(agent.algorithm).values():
+        if isinstance(value, torch.nn.Module):
+            footprint += sum(t.nelement() * t.element_size() for t in value.state_dict().values())
+        elif hasattr(value, 'table') and isinstance(value.table, np.ndarray):
+            footprint += value.table.nbytes
+    return footprint
+
+
+def policy_version(agent):
+    '''
+    :returns: Hashable value which changes whenever the policy of :param: agent
+              is updated, or None if policy updates can't be detected.
+              Relies on the explicit update counter (algorithm.policy_updates)
+              that algorithms increment at every optimizer step, and which
+              WeightBroadcast.refresh increments when it loads new weights.
+              Code updating the weights of an agent by any other means
+              (i.e load_state_dict) must increment it too.
+              Policies of algorithms without counter (i.e tabular agents)
+              are considered to change at every step.
+    '''
+    if not hasattr(agent, 'algorithm'): return 0  # Fixed agents
+    return getattr(agent.algorithm, 'policy_updates', None)
@@ -9,7 +9,7 @@ def opponent_sampling_distribution(menagerie, training_agent):
     :param training_agent: AgentHook of the agent that is currently being trained
     :returns: Agent, sampled from the menagerie, to be used as an opponent in the next episode
     '''
-    return [training_agent.clone(training=False)]
+    return [menagerie.load_training_agent(training_agent)]
 
 
 def curator(menagerie, training_agent, episode_trajectory,
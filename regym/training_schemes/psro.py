@@ -5,17 +5,23 @@ http://papers.nips.cc/paper/7007-a-unified-game-theoretic-approach-to-multiagent
 TODO: difference between PSRO which takes 3 separate stages and our method, which is an online method.
 '''
 
+import os
 import dill
 import logging
 import time
 from typing import Callable, List
 from itertools import product
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 
 from regym.rl_algorithms import AgentHook
+from regym.rl_algorithms import freeze_agent
+from regym.rl_algorithms import CheckpointStore
+from regym.rl_algorithms import AsyncCheckpointWriter
 from regym.game_theory import compute_nash_averaging
 from regym.util import play_multiple_matches
 from regym.util import extract_winner
+from regym.util import RollingStatistics
 from regym.environments import generate_task, Task, EnvType
 
 
@@ -27,7 +33,12 @@ class PSRONashResponse():
                  meta_game_solver: Callable = lambda winrate_matrix: compute_nash_averaging(winrate_matrix, perform_logodds_transformation=True)[0],
                  threshold_best_response: float = 0.7,
                  benchmarking_episodes: int = 10,
-                 match_outcome_rolling_window_size: int = 10):
+                 benchmarking_num_workers: int = 1,
+                 match_outcome_rolling_window_size: int = 10,
+                 convergence_confidence: float = None,
+                 half_precision_menagerie: bool = False,
+                 checkpoint_store: CheckpointStore = None,
+                 checkpoint_writer: AsyncCheckpointWriter = None):
         '''
         :param task: Multiagent task 
         :param meta_game_solver: Function which takes a meta-game and returns a probability
@@ -39,16 +50,33 @@ class PSRONashResponse():
                                         againts the current meta-game solution.
         :param benchmarking_episodes: Number of episodes that will be used to compute winrates
                                       to fill the metagame.
+        :param benchmarking_num_workers: Number of processes across which the benchmarking
+                                         episodes of each metagame entry are split.
+                                         The processes are started once, the first time
+                                         the metagame is updated, and reused afterwards
         :param match_outcome_rolling_window_size: Number of episodes that will be used to
                                                   decide whether the currently training agent
                                                   has converged to a best response.
+        :param convergence_confidence: Optional. If set, the training agent is only considered
+                                       to have converged to a best response once the lower bound
+                                       of the :param: convergence_confidence confidence interval
+                                       of its winrate over the rolling window reaches
+                                       :param: threshold_best_response, so that lucky streaks
+                                       are not mistaken for best responses.
+        :param half_precision_menagerie: Whether the policies added to the menagerie
+                                         are stored in half precision (float16)
+        :param checkpoint_store: Optional. CheckpointStore where the policies added to the
+                                 menagerie are saved, instead of individual checkpoints
+        :param checkpoint_writer: Optional. AsyncCheckpointWriter used to write the individual
+                                  checkpoints of the policies added to the menagerie in the background
         '''
         self.name = f'PSRO(M=maxentNash,O=BestResponse(wr={threshold_best_response},ws={match_outcome_rolling_window_size})'
         self.logger = logging.getLogger(self.name)
         self.logger.setLevel(logging.INFO)
         self.check_parameter_validity(task, threshold_best_response,
                                       benchmarking_episodes,
-                                      match_outcome_rolling_window_size)
+                                      match_outcome_rolling_window_size,
+                                      convergence_confidence)
         self.task = task
 
         self.meta_game_solver = meta_game_solver
@@ -56,10 +84,16 @@ class PSRONashResponse():
         self.menagerie = []
 
         self.threshold_best_response = threshold_best_response
-        self.match_outcome_rolling_window = []
         self.match_outcome_rolling_window_size = match_outcome_rolling_window_size
+        self.match_outcome_rolling_window = RollingStatistics(match_outcome_rolling_window_size)
+        self.convergence_confidence = convergence_confidence
 
         self.benchmarking_episodes = benchmarking_episodes
+        self.benchmarking_num_workers = benchmarking_num_workers
+        self.benchmarking_executor = None  # Created on first metagame update, see fill_meta_game_missing_entries
+        self.half_precision_menagerie = half_precision_menagerie
+        self.checkpoint_store = checkpoint_store
+        self.checkpoint_writer = checkpoint_writer
 
         self.statistics = [self.IterationStatistics(0, 0, 0, [0], np.nan)]
 
@@ -95,22 +129,37 @@ class PSRONashResponse():
             self.add_agent_to_menagerie(training_agent, candidate_save_path)
             self.update_meta_game()
             self.update_meta_game_solution()
-            self.match_outcome_rolling_window = []
+            self.match_outcome_rolling_window.reset()
             self.statistics += [self.create_new_iteration_statistics(self.statistics[-1])]
             self.statistics[-1].meta_game_solution = self.meta_game_solution
         return self.menagerie
 
+    @property
+    def match_outcome_rolling_window(self):
+        return self._match_outcome_rolling_window
+
+    @match_outcome_rolling_window.setter
+    def match_outcome_rolling_window(self, match_outcomes):
+        if not isinstance(match_outcomes, RollingStatistics):
+            rolling_window = RollingStatistics(self.match_outcome_rolling_window_size)
+            rolling_window.extend(match_outcomes)
+            match_outcomes = rolling_window
+        self._match_outcome_rolling_window = match_outcomes
+
     def has_policy_converged(self):
-        current_winrate = (sum(self.match_outcome_rolling_window) \
-                           / self.match_outcome_rolling_window_size)
+        if self.convergence_confidence is not None:
+            if not self.match_outcome_rolling_window.is_full(): return False
+            current_winrate = self.match_outcome_rolling_window.lower_confidence_bound(self.convergence_confidence)
+        else:
+            # Episodes missing from a window which is not yet full count as losses
+            current_winrate = (self.match_outcome_rolling_window.sum \
+                               / self.match_outcome_rolling_window_size)
         return current_winrate >= self.threshold_best_response
 
     def update_rolling_winrates(self, episode_trajectory, training_agent_index):
         winner_index = extract_winner(episode_trajectory)
         victory = int(winner_index == training_agent_index)
-        if len(self.match_outcome_rolling_window) >= self.match_outcome_rolling_window_size:
-            self.match_outcome_rolling_window.pop(0)
-        self.match_outcome_rolling_window.append(victory)
+        self.match_outcome_rolling_window.push(victory)
 
     def update_meta_game_solution(self, update=False):
         self.logger.info(f'START: Solving metagame. Size: {len(self.menagerie)}')
@@ -144,6 +193,8 @@ class PSRONashResponse():
                                        benchmarking_episodes: int, task: Task):
         indices_to_fill = product(range(updated_meta_game.shape[0]),
                                   [updated_meta_game.shape[0] - 1])
+        if self.benchmarking_executor is None and self.benchmarking_num_workers > 1:
+            self.benchmarking_executor = ProcessPoolExecutor(max_workers=self.benchmarking_num_workers)
         for i, j in indices_to_fill:
             # TODO: maybe use regym.evaluation. benchmark on tasks?
             if i == j: updated_meta_game[j, j] = 0.5
@@ -151,24 +202,43 @@ class PSRONashResponse():
                 winrate_estimate = play_multiple_matches(task=task,
                                                          agent_vector=[policies[i],
                                                                        policies[j]],
-                                                         n_matches=benchmarking_episodes)[0]
+                                                         n_matches=benchmarking_episodes,
+                                                         num_workers=self.benchmarking_num_workers,
+                                                         executor=self.benchmarking_executor)[0]
                 updated_meta_game[i, j] = winrate_estimate
                 updated_meta_game[j, i] = 1 - winrate_estimate
         return updated_meta_game
 
     def add_agent_to_menagerie(self, training_agent, candidate_save_path=None):
-        if candidate_save_path is not None:
-            AgentHook(training_agent, save_path=candidate_save_path)
-        self.menagerie.append(training_agent.clone(training=False))
+        frozen_agent = freeze_agent(training_agent, half_precision=self.half_precision_menagerie)
+        if candidate_save_path is not None and self.checkpoint_store is not None:
+            self.checkpoint_store.save(frozen_agent, key=os.path.splitext(os.path.basename(candidate_save_path))[0])
+        elif candidate_save_path is not None:
+            AgentHook(frozen_agent, save_path=candidate_save_path, checkpoint_writer=self.checkpoint_writer)
+        self.menagerie.append(frozen_agent)
 
     def create_new_iteration_statistics(self, last_iteration_statistics):
         return self.IterationStatistics(len(self.statistics), last_iteration_statistics.total_elapsed_episodes,
                                         0, [0] * len(self.menagerie),
                                         self.meta_game_solution)
 
+    def shutdown_benchmarking_workers(self):
+        '''
+        Stops the processes used to benchmark metagame entries, which are
+        otherwise kept alive until the interpreter exits
+        '''
+        if self.benchmarking_executor is not None: self.benchmarking_executor.shutdown()
+        self.benchmarking_executor = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['benchmarking_executor'] = None  # Processes can't be pickled. Restarted when needed
+        return state
+
     def check_parameter_validity(self, task, threshold_best_response,
                                  benchmarking_episodes,
-                                 match_outcome_rolling_window_size):
+                                 match_outcome_rolling_window_size,
+                                 convergence_confidence):
         if task.env_type == EnvType.SINGLE_AGENT:
             raise ValueError('Task provided: {task.name} is singleagent. PSRO is a multiagent ' +
                              'meta algorithm. It only opperates on multiagent tasks')
@@ -180,6 +250,9 @@ class PSRONashResponse():
         if not(0 < match_outcome_rolling_window_size):
             raise ValueError('Parameter \'benchmarking_episodes\' corresponds to ' +
                              'the lenght of a list. It must be strictly positive')
+        if convergence_confidence is not None and not(0 < convergence_confidence < 1):
+            raise ValueError('Parameter \'convergence_confidence\' represents ' +
+                             'a probability. It must lie between (0, 1)')
 
     class IterationStatistics():
         def __init__(self, iteration_number: int,
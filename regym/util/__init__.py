@@ -1,2 +1,4 @@
-from .play_matches import play_single_match, play_multiple_matches
+from .play_matches import play_single_match, play_multiple_matches, match_process_pool
 from .play_matches import extract_winner, extract_cumulative_rewards
+from .rolling_statistics import RollingStatistics
+from .episode_summaries import EpisodeSummary, summarize_episode, CSVEpisodeSummarySink, SQLiteEpisodeSummarySink
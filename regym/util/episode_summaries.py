@@ -0,0 +1,112 @@
+'''
+Summaries of episodes (length, cumulative reward of each agent, winner and opponents),
+which can be streamed to a sink as episodes are run instead of keeping whole trajectories in memory.
+Sinks implement write(summary), flush() and close():
+
+    - CSVEpisodeSummarySink:    Appends one row per episode to a CSV file.
+    - SQLiteEpisodeSummarySink: Inserts one row per episode into a table of an SQLite database.
+'''
+import os
+import csv
+import json
+import sqlite3
+from collections import namedtuple
+from typing import List
+
+from .play_matches import extract_cumulative_rewards, extract_winner
+
+
+EpisodeSummary = namedtuple('EpisodeSummary', 'episode length returns winner training_agent_index opponents')
+
+DRAW = -1
+
+
+def summarize_episode(episode: int, trajectory: List, training_agent_index: int = None,
+                      opponents: List[str] = []) -> EpisodeSummary:
+    '''
+    :param episode: Episode number
+    :param trajectory: Trajectory of the episode
+    :param training_agent_index: Optional. Index of the agent being trained in the episode
+    :param opponents: Identifiers (i.e names) of the opponents of the agent being trained
+    :returns: EpisodeSummary of :param: trajectory. Its winner is the index of the agent
+              with the highest cumulative reward, or DRAW (-1) if several agents tie.
+    '''
+    returns = extract_cumulative_rewards(trajectory)
+    if not isinstance(returns, list): returns = [returns]
+    winner = extract_winner(trajectory, break_ties=lambda winners: winners[0] if len(winners) == 1 else DRAW)
+    return EpisodeSummary(episode=episode, length=len(trajectory), returns=[float(r) for r in returns],
+                          winner=winner, training_agent_index=training_agent_index,
+                          opponents=list(opponents))
+
+
+def opponent_names(agent_vector: List, training_agent_index: int) -> List[str]:
+    return [getattr(agent, 'name', str(agent)) for i, agent in enumerate(agent_vector) if i != training_agent_index]
+
+
+class CSVEpisodeSummarySink():
+
+    def __init__(self, path: str):
+        '''
+        Appends one row per EpisodeSummary to the CSV file at :param: path, writing
+        a header first if the file is new. Returns are written as a JSON list and
+        opponents as a ';' separated list.
+        '''
+        self.path = path
+        is_new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'a', newline='')
+        self.writer = csv.writer(self.file)
+        if is_new_file: self.writer.writerow(EpisodeSummary._fields)
+
+    def write(self, summary: EpisodeSummary):
+        self.writer.writerow([summary.episode, summary.length, json.dumps(summary.returns), summary.winner,
+                              '' if summary.training_agent_index is None else summary.training_agent_index,
+                              ';'.join(summary.opponents)])
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if not self.file.closed: self.file.close()
+
+    def __repr__(self):
+        return f'CSVEpisodeSummarySink: {self.path}'
+
+
+class SQLiteEpisodeSummarySink():
+
+    def __init__(self, path: str, table: str = 'episodes', commit_interval: int = 100):
+        '''
+        Inserts one row per EpisodeSummary into :param: table of the SQLite database at
+        :param: path, which is created if it does not exist. Returns and opponents
+        are stored as JSON lists.
+
+        :param commit_interval: Number of summaries inserted per transaction
+        '''
+        if not commit_interval > 0:
+            raise ValueError('Parameter \'commit_interval\' must be a strictly positive integer')
+        self.path, self.table, self.commit_interval = path, table, commit_interval
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(f'CREATE TABLE IF NOT EXISTS "{table}" (episode INTEGER, length INTEGER, returns TEXT, '
+                                'winner INTEGER, training_agent_index INTEGER, opponents TEXT)')
+        self.connection.commit()
+        self.pending_rows = []
+
+    def write(self, summary: EpisodeSummary):
+        self.pending_rows.append((summary.episode, summary.length, json.dumps(summary.returns), summary.winner,
+                                  summary.training_agent_index, json.dumps(summary.opponents)))
+        if len(self.pending_rows) >= self.commit_interval: self.flush()
+
+    def flush(self):
+        if len(self.pending_rows) == 0: return
+        self.connection.executemany(f'INSERT INTO "{self.table}" VALUES (?, ?, ?, ?, ?, ?)', self.pending_rows)
+        self.connection.commit()
+        self.pending_rows = []
+
+    def close(self):
+        if self.connection is None: return
+        self.flush()
+        self.connection.close()
+        self.connection = None
+
+    def __repr__(self):
+        return f'SQLiteEpisodeSummarySink: {self.path} (table {self.table})'
@@ -1,34 +1,95 @@
 from typing import List
+from contextlib import nullcontext
+from concurrent.futures import Executor, ProcessPoolExecutor
 import random
 import numpy as np
+import torch
 
 from regym.environments import Task
 
 
-def play_multiple_matches(task: Task, agent_vector: List, n_matches: int, keep_trajectories=False):
+def play_multiple_matches(task: Task, agent_vector: List, n_matches: int, keep_trajectories=False,
+                          keep_cumulative_rewards=False, num_workers: int = 1, seed: int = None,
+                          executor: Executor = None):
     '''
     Computes a winrate vector by making :param agent_vector: play in :param env:
     for :param n_matches:. If :param keep_trajectories: is True, a tuple is returned
     where the first element is the winrate vector and the second is the vector of
-    trajectories.
+    trajectories. If :param keep_cumulative_rewards: is True, the average cumulative
+    reward of each agent is appended to the returned tuple.
 
     :param task: regym Task containing an OpenAI Gym environment where the matches wll be run
     :param agent_vector: vector of agents capable of acting in :param env:
     :param n_matches: number of matches to be played
+    :param keep_cumulative_rewards: Whether to also return the average cumulative reward of each agent
+    :param num_workers: Number of processes across which matches are split. Each process plays
+                        its share of matches on its own copy of :param: task and :param: agent_vector,
+                        which must therefore be picklable. Matches are played in the calling process if 1.
+    :param seed: Optional. Seed of the random number generators of the i-th process is :param: seed + i.
+                 If None, it is drawn from numpy's global random number generator,
+                 so that matches played in parallel stay reproducible.
+    :param executor: Optional. Process pool (i.e a ProcessPoolExecutor of :param: num_workers
+                     processes) on which the matches are played if :param: num_workers > 1.
+                     Callers playing many matchups should create it once and pass it to every call,
+                     so that worker processes are only started once. If None, a pool is created
+                     and shut down within this call.
     :returns: Vector containing the winrate for each agent
     '''
-    winrates = np.zeros(task.num_agents)
+    if not num_workers > 0:
+        raise ValueError('Parameter \'num_workers\' must be a strictly positive integer')
+    num_workers = min(num_workers, n_matches)
+    if num_workers == 1:
+        win_counts, cumulative_rewards, trajectories = play_matches(task, agent_vector, n_matches, keep_trajectories)
+    else:
+        if seed is None: seed = np.random.randint(2 ** 31 - num_workers)
+        matches_per_worker = [n_matches // num_workers + int(i < n_matches % num_workers) for i in range(num_workers)]
+        with nullcontext(executor) if executor is not None else ProcessPoolExecutor(max_workers=num_workers) as pool:
+            futures = [pool.submit(play_matches, task, agent_vector, n, keep_trajectories, seed + i)
+                       for i, n in enumerate(matches_per_worker)]
+            results = [future.result() for future in futures]
+        win_counts = sum(result[0] for result in results)
+        cumulative_rewards = sum(result[1] for result in results)
+        trajectories = [trajectory for result in results for trajectory in result[2]]
+        task.total_episodes_run += n_matches
+
+    returns = [win_counts / n_matches]
+    if keep_trajectories: returns.append(trajectories)
+    if keep_cumulative_rewards: returns.append(cumulative_rewards / n_matches)
+    return returns[0] if len(returns) == 1 else tuple(returns)
+
+
+def match_process_pool(num_workers: int):
+    '''
+    :returns: Context manager yielding a ProcessPoolExecutor of :param: num_workers processes,
+              to be passed to consecutive calls to play_multiple_matches,
+              or yielding None if :param: num_workers is 1
+    '''
+    if not num_workers > 0:
+        raise ValueError('Parameter \'num_workers\' must be a strictly positive integer')
+    return ProcessPoolExecutor(max_workers=num_workers) if num_workers > 1 else nullcontext()
+
+
+def play_matches(task: Task, agent_vector: List, n_matches: int, keep_trajectories=False, seed: int = None):
+    '''
+    Plays :param: n_matches matches, seeding the random number generators
+    of python, numpy and torch with :param: seed if it is given.
+
+    :returns: Number of matches won by each agent, sum of the cumulative rewards
+              of each agent over all matches, trajectories (empty if not :param: keep_trajectories)
+    '''
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+        torch.manual_seed(seed)
+    win_counts = np.zeros(task.num_agents)
+    cumulative_rewards = np.zeros(task.num_agents)
     trajectories = []
     for episode in range(n_matches):
-        if keep_trajectories:
-            winner, trajectory = play_single_match(task, agent_vector, True)
-            trajectories.append(trajectory)
-        else:
-            winner = play_single_match(task, agent_vector, False)
-        winrates[winner] += 1
-    winrates /= n_matches
-    if len(trajectories) == 0: return winrates
-    else: return winrates, trajectories
+        trajectory = task.run_episode(agent_vector, training=False)
+        win_counts[extract_winner(trajectory)] += 1
+        cumulative_rewards += extract_cumulative_rewards(trajectory)
+        if keep_trajectories: trajectories.append(trajectory)
+    return win_counts, cumulative_rewards, trajectories
 
 
 def play_single_match(task, agent_vector, keep_trajectories=False):
@@ -51,6 +112,6 @@ def extract_cumulative_rewards(trajectory):
         cum_reward = sum(map(lambda experience: reward_vector(experience),
                              trajectory))
     else:
-        individal_agent_trajectory_reward = lambda t, agent_index: sum(map(lambda experience: reward_vector(experience)[agent_index], t))
-        cum_reward = [individal_agent_trajectory_reward(trajectory, i) for i in range(number_of_agents)]
+        # Single pass over the trajectory, accumulating the rewards of all agents at once
+        cum_reward = np.sum([reward_vector(experience) for experience in trajectory], axis=0).tolist()
     return cum_reward
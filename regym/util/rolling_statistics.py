@@ -0,0 +1,125 @@
+import math
+import numpy as np
+
+
+class RollingStatistics():
+
+    def __init__(self, window_size: int):
+        '''
+        Running statistics over the last :param: window_size values pushed,
+        (i.e match outcomes, 1 for a victory, 0 otherwise) kept in a ring buffer.
+        Pushing a value and computing the mean both take constant time,
+        regardless of :param: window_size.
+
+        :param window_size: Maximum number of values kept. Older values are overwritten.
+        '''
+        if not(0 < window_size):
+            raise ValueError('Parameter \'window_size\' must be strictly positive')
+        self.window_size = window_size
+        self.buffer = np.zeros(window_size)
+        self.reset()
+
+    def reset(self):
+        '''
+        Discards all values pushed so far
+        '''
+        self.next_index = 0
+        self.count = 0
+        self.sum = 0.0
+        self.sum_of_squares = 0.0
+
+    def push(self, value: float):
+        '''
+        Adds :param: value to the window, overwriting the oldest value if the window is full
+        '''
+        if self.count == self.window_size:
+            overwritten_value = self.buffer[self.next_index]
+            self.sum -= overwritten_value
+            self.sum_of_squares -= overwritten_value ** 2
+        else:
+            self.count += 1
+        self.buffer[self.next_index] = value
+        self.sum += value
+        self.sum_of_squares += value ** 2
+        self.next_index = (self.next_index + 1) % self.window_size
+
+    def extend(self, values):
+        for value in values: self.push(value)
+
+    @property
+    def mean(self) -> float:
+        '''
+        :returns: Mean of the values currently in the window, nan if it is empty
+        '''
+        if self.count == 0: return np.nan
+        return self.sum / self.count
+
+    @property
+    def variance(self) -> float:
+        '''
+        :returns: (Population) variance of the values currently in the window, nan if it is empty
+        '''
+        if self.count == 0: return np.nan
+        return max(self.sum_of_squares / self.count - self.mean ** 2, 0.0)
+
+    def is_full(self) -> bool:
+        return self.count == self.window_size
+
+    def confidence_interval(self, confidence: float = 0.95):
+        '''
+        Wilson score interval for the success probability underlying the values in
+        the window, treated as Bernoulli trials (i.e winrate from match outcomes).
+        Unlike a normal approximation, the interval stays inside [0, 1] and is
+        sensible for small windows and for winrates close to 0 or 1.
+
+        :param confidence: Probability with which the interval contains the true success probability
+        :returns: (lower bound, upper bound). (0, 1) if the window is empty
+        '''
+        if not(0 < confidence < 1):
+            raise ValueError('Parameter \'confidence\' must lie between (0, 1)')
+        if self.count == 0: return 0.0, 1.0
+        z = normal_quantile(0.5 + confidence / 2)
+        n, p = self.count, self.mean
+        center = (p + z ** 2 / (2 * n)) / (1 + z ** 2 / n)
+        half_width = (z / (1 + z ** 2 / n)) * math.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2))
+        return max(center - half_width, 0.0), min(center + half_width, 1.0)
+
+    def lower_confidence_bound(self, confidence: float = 0.95) -> float:
+        return self.confidence_interval(confidence)[0]
+
+    def upper_confidence_bound(self, confidence: float = 0.95) -> float:
+        return self.confidence_interval(confidence)[1]
+
+    def values(self) -> np.ndarray:
+        '''
+        :returns: Values currently in the window, from oldest to newest
+        '''
+        if self.count < self.window_size: return self.buffer[:self.count].copy()
+        return np.concatenate((self.buffer[self.next_index:], self.buffer[:self.next_index]))
+
+    def __array__(self, dtype=None, copy=None):
+        values = self.values()
+        return values if dtype is None else values.astype(dtype)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.values())
+
+    def __repr__(self):
+        return f'RollingStatistics: {self.count}/{self.window_size} values. Mean: {self.mean}'
+
+
+def normal_quantile(p: float) -> float:
+    '''
+    :returns: Quantile function (inverse cumulative distribution function)
+              of the standard normal distribution evaluated at :param: p,
+              found by bisection over math.erf
+    '''
+    low, high = -10.0, 10.0
+    for _ in range(100):
+        middle = (low + high) / 2
+        if 0.5 * (1 + math.erf(middle / math.sqrt(2))) < p: low = middle
+        else: high = middle
+    return (low + high) / 2